@@ -9,7 +9,7 @@ wb.open()
 
 # # #
 
-analyzer = LiteScopeAnalyzerDriver(wb.regs, "analyzer", debug=True)
+analyzer = LiteScopeAnalyzerDriver(wb.regs, "analyzer", debug=True, comm=wb)
 analyzer.configure_subsampler(1)
 analyzer.configure_group(1)
 analyzer.add_rising_edge_trigger("uartwishbonebridge_wishbone_stb")
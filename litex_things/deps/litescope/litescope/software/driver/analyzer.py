@@ -11,9 +11,10 @@ import csv
 
 
 class LiteScopeAnalyzerDriver:
-    def __init__(self, regs, name, config_csv=None, debug=False):
+    def __init__(self, regs, name, config_csv=None, debug=False, comm=None):
         self.regs = regs
         self.name = name
+        self.comm = comm
         self.config_csv = config_csv
         if self.config_csv is None:
             self.config_csv = name + ".csv"
@@ -110,22 +111,63 @@ class LiteScopeAnalyzerDriver:
         while not self.done():
             pass
 
-    def upload(self):
+    def show_progress(self, position, length):
+        sys.stdout.write("|{}>{}| {}%\r".format('=' * (20*position//length),
+                                                ' ' * (20-20*position//length),
+                                                100*position//length))
+        sys.stdout.flush()
+
+    def upload(self, burst=128, progress=None):
+        """Read the captured samples
+
+        When the driver was given a ``comm`` with a ``burst`` method (e.g. a
+        ``RemoteClient``), samples are read ``burst`` at a time, each round
+        trip acknowledging the previous sample and reading the next one for
+        the whole burst. Otherwise, or with ``burst=1``, one sample is read
+        per register access.
+
+        ``progress`` is called with the number of samples read and the total
+        number of samples (a progress bar is shown by default in debug mode).
+        """
         if self.debug:
             print("[uploading]...")
+        if progress is None and self.debug:
+            progress = self.show_progress
         length = self.storage_length.read()
-        for position in range(1, length + 1):
-            if self.debug:
-                sys.stdout.write("|{}>{}| {}%\r".format('=' * (20*position//length),
-                                                        ' ' * (20-20*position//length),
-                                                        100*position//length))
-                sys.stdout.flush()
-            self.data.append(self.storage_mem_data.read())
-            self.storage_mem_ready.write(1)
+        if burst > 1 and hasattr(self.comm, "burst"):
+            self.upload_burst(self.comm, length, burst, progress)
+        else:
+            for position in range(1, length + 1):
+                if progress is not None:
+                    progress(position, length)
+                self.data.append(self.storage_mem_data.read())
+                self.storage_mem_ready.write(1)
         if self.debug:
             print("")
         return self.data
 
+    def upload_burst(self, comm, length, burst, progress):
+        mem_data = self.storage_mem_data
+        data_addrs = [mem_data.addr + 4*i for i in range(mem_data.length)]
+        ready_addr = self.storage_mem_ready.addr
+        position = 0
+        while position < length:
+            n = min(burst, length - position)
+            transactions = []
+            for i in range(position, position + n):
+                # acknowledge the previous sample, then read this one
+                transactions.append((ready_addr, [1] if i > 0 else None, data_addrs))
+            for datas in comm.burst(transactions):
+                data = 0
+                for d in datas:
+                    data = (data << mem_data.data_width) | d
+                self.data.append(data)
+            position += n
+            if progress is not None:
+                progress(position, length)
+        if length:
+            self.storage_mem_ready.write(1)
+
     def save(self, filename, samplerate=None):
         if self.debug:
             print("[writing to " + filename + "]...")
@@ -138,6 +180,8 @@ class LiteScopeAnalyzerDriver:
             dump = PythonDump()
         elif ext == ".sr":
             dump = SigrokDump(samplerate=samplerate)
+        elif ext == ".mwav":
+            dump = WaveDump()
         else:
             raise NotImplementedError
         dump.add_from_layout(self.layouts[self.group], self.data)
@@ -154,4 +198,4 @@ class LiteScopeAnalyzerDriver:
         self.upload()
         min_idx = log2_int(getattr(self, name + "_o"))
         max_idx = min_idx + log2_int((getattr(self, name + "_m") >> min_idx) + 1)
-        return self.data[min_idx:max_idx][0]
+        return int(self.data[min_idx:max_idx][0])
@@ -3,3 +3,4 @@ from litescope.software.dump.csv import CSVDump
 from litescope.software.dump.python import PythonDump
 from litescope.software.dump.sigrok import SigrokDump
 from litescope.software.dump.vcd import VCDDump
+from litescope.software.dump.wave import WaveDump
@@ -1,33 +1,94 @@
+import numpy as np
+
+
 def dec2bin(d, width=0):
     if d == "x":
         return "x"*width
-    elif d == 0:
-        b = "0"
-    else:
-        b = ""
-        while d != 0:
-            b = "01"[d&1] + b
-            d = d >> 1
-    return b.zfill(width)
+    return format(d, "b").zfill(width)
+
+
+def _to_words(values, width):
+    # samples as rows of 64-bit words, least significant word first
+    nwords = max((width + 63)//64, 1)
+    if nwords == 1:
+        return np.array(values, dtype=np.uint64).reshape(-1, 1)
+    data = b"".join(int(v).to_bytes(8*nwords, "little") for v in values)
+    return np.frombuffer(data, dtype="<u8").reshape(-1, nwords)
+
+
+def _extract_bits(words, low, high):
+    width = high - low
+    if width > 64:
+        r = np.zeros(len(words), dtype=object)
+        for k in reversed(range(words.shape[1])):
+            r = r*2**64 + words[:, k].astype(object)
+        return (r >> low) & (2**width - 1)
+    k, offset = divmod(low, 64)
+    if k >= words.shape[1]:
+        return np.zeros(len(words), dtype=np.uint64)
+    r = words[:, k] >> np.uint64(offset)
+    if offset + width > 64 and k + 1 < words.shape[1]:
+        r |= words[:, k + 1] << np.uint64(64 - offset)
+    if width < 64:
+        r &= np.uint64(2**width - 1)
+    return r
+
+
+def _to_values(values, width):
+    if width > 64:
+        return np.array([int(v) % 2**width for v in values], dtype=object)
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        values = np.trunc(values).astype(np.int64)
+    if values.dtype.kind not in "biu":
+        return np.array([int(v) % 2**width for v in values], dtype=np.uint64)
+    values = values.astype(np.uint64)
+    if width < 64:
+        values &= np.uint64(2**width - 1)
+    return values
 
 
 def get_bits(values, low, high=None):
-    r = []
     if high is None:
         high = low + 1
-    for val in values:
-        t = (val >> low) & (2**(high - low) - 1)
-        r.append(t)
-    return r
+    array = np.asarray(values)
+    if array.dtype.kind in "bu" or array.dtype.kind == "i" and not (array < 0).any():
+        return _extract_bits(_to_words(array, high), low, high)
+    # negative or arbitrarily large integers, as Python ints
+    mask = 2**(high - low) - 1
+    r = [(int(v) >> low) & mask for v in values]
+    return np.array(r, dtype=np.uint64 if high - low <= 64 else object)
+
+
+def changes(values):
+    """Indices of the samples that differ from the previous one
+
+    The first sample is always included.
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(([0], np.flatnonzero(np.diff(values)) + 1))
 
 
 class DumpData(list):
+    """Raw samples of a capture, ``width`` bits each
+
+    Indexing or slicing returns bit fields as NumPy arrays. The samples are
+    converted to an array once and reused as long as the length does not
+    change, so the data is expected to be filled by appending samples.
+    """
     def __init__(self, width):
         self.width = width
+        self._words = None
+
+    def words(self):
+        if self._words is None or len(self._words) != len(self):
+            self._words = _to_words(self, self.width)
+        return self._words
 
     def __getitem__(self, key):
         if isinstance(key, int):
-            return get_bits(self, key)
+            return _extract_bits(self.words(), key, key + 1)
         elif isinstance(key, slice):
             if key.start != None:
                 start = key.start
@@ -41,16 +102,21 @@ class DumpData(list):
                 stop = self.width
             if key.step != None:
                 raise KeyError
-            return get_bits(self, start, stop)
+            return _extract_bits(self.words(), start, stop)
         else:
             raise KeyError
 
 
 class DumpVariable:
+    """Values of a variable, as a NumPy array
+
+    Values are stored modulo ``2**width``, as ``uint64`` up to 64 bits and
+    as Python integers above.
+    """
     def __init__(self, name, width, values=[]):
         self.width = width
         self.name = name
-        self.values = [int(v)%2**width for v in values]
+        self.values = _to_values(values, width)
 
     def __len__(self):
         return len(self.values)
@@ -67,10 +133,30 @@ class Dump:
         i = 0
         for s, n in layout:
             values = variable[i:i+n]
-            values2x = [values[j//2] for j in range(len(values)*2)]
-            self.add(DumpVariable(s, n, values2x))
+            self.add(DumpVariable(s, n, np.repeat(values, 2)))
             i += n
-        self.add(DumpVariable("scope_clk", 1, [1, 0]*(len(self)//2)))
+        self.add(DumpVariable("scope_clk", 1, np.tile([1, 0], len(self)//2)))
+
+    def value_changes(self):
+        """Value changes of all variables, ordered by sample then variable
+
+        Returns a list of ``(sample, variable number, value)``.
+        """
+        samples = []
+        numbers = []
+        values = []
+        for n, variable in enumerate(self.variables):
+            indices = changes(variable.values)
+            samples.append(indices)
+            numbers.append(np.full(len(indices), n))
+            values += variable.values[indices].tolist()
+        if not samples:
+            return []
+        samples = np.concatenate(samples)
+        numbers = np.concatenate(numbers)
+        order = np.argsort(samples, kind="stable")
+        return list(zip(samples[order].tolist(), numbers[order].tolist(),
+                        [values[i] for i in order.tolist()]))
 
     def __len__(self):
         l = 0
@@ -1,4 +1,6 @@
-from litescope.software.dump.common import Dump, dec2bin
+import numpy as np
+
+from litescope.software.dump.common import Dump, dec2bin, changes
 
 
 class CSVDump(Dump):
@@ -19,20 +21,21 @@ class CSVDump(Dump):
         return r
 
     def generate_dumpvars(self):
-        r  = ""
-        for i in range(len(self)):
-            for variable in self.variables:
-                try:
-                    variable.current_value = variable.values[i]
-                except:
-                    pass
-                if variable.current_value == "x":
-                    r += "x"
-                else:
-                    r += dec2bin(variable.current_value, variable.width)
-                r += ", "
-            r += "\n"
-        return r
+        length = len(self)
+        columns = []
+        for variable in self.variables:
+            if len(variable) == 0:
+                columns.append(["x"]*length)
+                continue
+            indices = changes(variable.values)
+            formatted = [dec2bin(v, variable.width)
+                         for v in variable.values[indices].tolist()]
+            # hold the last value after the end of shorter variables
+            counts = np.diff(np.append(indices, length))
+            columns.append(np.repeat(np.array(formatted, dtype=object), counts))
+        if not columns:
+            return "\n"*length
+        return "".join(", ".join(row) + ", \n" for row in zip(*columns))
 
     def write(self, filename):
         f = open(filename, "w")
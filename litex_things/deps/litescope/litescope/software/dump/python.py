@@ -11,7 +11,7 @@ class PythonDump(Dump):
         for variable in self.variables:
             r += "\"" + variable.name + "\""
             r += " : "
-            r += str(variable.values)
+            r += str(variable.values.tolist())
             r += ",\n"
         r += "}"
         return r
@@ -5,6 +5,8 @@ import zipfile
 import re
 from collections import OrderedDict
 
+import numpy as np
+
 from litescope.software.dump.common import Dump, DumpVariable
 
 
@@ -42,22 +44,11 @@ unitsize={}
 
     def write_data(self):
         data_bits = math.ceil(len(self.variables)/8)*8
-        data_len = 0
-        for variable in self.variables:
-            data_len = max(data_len, len(variable))
-        datas = []
-        for i in range(data_len):
-            data = 0
-            for j, variable in enumerate(reversed(self.variables)):
-                data = data << 1
-                try:
-                    data |= variable.values[i] & 0x1 # 1 bit probes
-                except:
-                    pass
-            datas.append(data)
+        bits = np.zeros((len(self), data_bits), dtype=np.uint8)
+        for i, variable in enumerate(self.variables):
+            bits[:len(variable), i] = variable.values & 1 # 1 bit probes
         f = open("logic-1-1", "wb")
-        for data in datas:
-            f.write(data.to_bytes(data_bits//8, "little"))
+        f.write(np.packbits(bits, axis=1, bitorder="little").tobytes())
         f.close()
 
     def zip(self, name):
@@ -96,7 +87,7 @@ unitsize={}
         probes = OrderedDict()
         f = open("metadata", "r")
         for l in f:
-            m = re.search("probe([0-9]+) = (\w+)", l, re.I)
+            m = re.search("probe([0-9]+)\s*=\s*(\w+)", l, re.I)
             if m is not None:
                 index = int(m.group(1))
                 name = m.group(2)
@@ -111,16 +102,14 @@ unitsize={}
         return probes
 
     def read_data(self, name, nprobes):
-        datas = []
+        nbytes = math.ceil(nprobes/8)
+        if nbytes == 0:
+            return np.zeros((0, 0), dtype=np.uint8)
         f = open("logic-1-1", "rb")
-        while True:
-            data = f.read(math.ceil(nprobes/8))
-            if data == bytes('', "utf-8"):
-                break
-            data = int.from_bytes(data, "little")
-            datas.append(data)
+        data = np.frombuffer(f.read(), dtype=np.uint8)
         f.close()
-        return datas
+        data = data[:len(data)//nbytes*nbytes].reshape(-1, nbytes)
+        return np.unpackbits(data, axis=1, bitorder="little")
 
     def read(self, filename):
         self.variables = []
@@ -133,7 +122,4 @@ unitsize={}
         shutil.rmtree(name)
 
         for k, v in probes.items():
-            probe_data = []
-            for data in datas:
-                probe_data.append((data >> (v-1)) & 0x1)
-            self.add(DumpVariable(k, 1, probe_data))
+            self.add(DumpVariable(k, 1, datas[:, v-1]))
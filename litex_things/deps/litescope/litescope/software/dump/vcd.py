@@ -20,27 +20,6 @@ class VCDDump(Dump):
         self.variables = [] if dump is None else dump.variables
         self.timescale = timescale
         self.comment = comment
-        self.cnt = -1
-
-    def change(self):
-        r = ""
-        c = ""
-        for v in self.variables:
-            try:
-                if v.values[self.cnt + 1] != v.current_value:
-                    c += "b"
-                    c += dec2bin(v.values[self.cnt + 1], v.width)
-                    c += " "
-                    c += v.code
-                    c += "\n"
-            except:
-                pass
-        if c != "":
-            r += "#"
-            r += str(self.cnt+1)
-            r += "\n"
-            r += c
-        return r
 
     def generate_date(self):
         now = datetime.datetime.now()
@@ -94,11 +73,15 @@ class VCDDump(Dump):
         return r
 
     def generate_valuechange(self):
-        r = ""
-        for i in range(len(self)):
-            r += self.change()
-            self.cnt += 1
-        return r
+        r = []
+        last_sample = None
+        for sample, n, value in self.value_changes():
+            if sample != last_sample:
+                r.append("#{}\n".format(sample))
+                last_sample = sample
+            v = self.variables[n]
+            r.append("b" + dec2bin(value, v.width) + " " + v.code + "\n")
+        return "".join(r)
 
     def __repr__(self):
         r = ""
@@ -0,0 +1,41 @@
+from migen.sim.wave import WaveFileWriter, WaveFileReader
+
+from litescope.software.dump.common import Dump, DumpVariable
+
+
+class WaveDump(Dump):
+    """Dump to the block-compressed waveform format of ``migen.sim.wave``
+
+    Sample ``n`` is recorded at time ``n``. ``read`` can load a range of
+    samples and a subset of the variables, decompressing only the parts of
+    the file they are stored in.
+    """
+    def __init__(self, dump=None, timescale="1ps", compression="zlib"):
+        Dump.__init__(self)
+        self.variables = [] if dump is None else dump.variables
+        self.timescale = timescale
+        self.compression = compression
+
+    def write(self, filename):
+        writer = WaveFileWriter(filename,
+            [(v.name, v.width) for v in self.variables],
+            timescale=self.timescale, compression=self.compression)
+        for sample, n, value in self.value_changes():
+            writer.advance(sample)
+            writer.change(n, value)
+        writer.advance(len(self))
+        writer.close()
+
+    def read(self, filename, names=None, start=0, stop=None):
+        with WaveFileReader(filename) as reader:
+            if stop is None:
+                stop = reader.end_time - 1
+            widths = dict(reader.signals)
+            changes = reader.read(names, start, stop)
+        self.variables = []
+        for name, name_changes in changes.items():
+            values = []
+            for (t, value), (t_next, _) in zip(name_changes,
+                                               name_changes[1:] + [(stop + 1, None)]):
+                values += [value]*(t_next - t)
+            self.add(DumpVariable(name, widths[name], values))
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from litex.tools.litex_client import RemoteClient
+from litex.tools.litex_server import RemoteServer
+from litex.tools.remote.csr_builder import CSRElements, CSRRegister
+
+from litescope.software.driver.analyzer import LiteScopeAnalyzerDriver
+
+
+class StorageComm:
+    # models the storage registers of an analyzer: length at 0x00, mem_ready
+    # at 0x04, 40-bit mem_data at 0x08-0x0c (32-bit CSRs)
+    def __init__(self, samples):
+        self.samples = list(samples)
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self, addr, length=None):
+        length_int = 1 if length is None else length
+        datas = [self.read_word(addr + 4*i) for i in range(length_int)]
+        return datas[0] if length is None else datas
+
+    def read_word(self, addr):
+        if addr == 0x00:
+            return len(self.samples)
+        elif addr == 0x08:
+            return self.samples[0] >> 32
+        elif addr == 0x0c:
+            return self.samples[0] & 0xffffffff
+        return 0
+
+    def write(self, addr, datas):
+        if addr == 0x04:
+            self.samples.pop(0)
+
+
+class TestDriver(unittest.TestCase):
+    def setUp(self):
+        self.samples = [(i*0x123456789) % 2**40 for i in range(300)]
+        self.comm = StorageComm(self.samples)
+        self.server = RemoteServer(self.comm, "localhost", 0)
+        self.server.open()
+        self.server.start(1)
+        self.client = RemoteClient(port=self.server.socket.getsockname()[1],
+                                   csr_csv=None, csr_data_width=32)
+        self.client.open()
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+        self.dir.cleanup()
+
+    def driver(self, comm=None):
+        regs = dict()
+        for name, addr, length in [("length", 0x00, 1),
+                                   ("mem_ready", 0x04, 1),
+                                   ("mem_data", 0x08, 2),
+                                   ("enable", 0x10, 1)]:
+            regs["analyzer_storage_" + name] = CSRRegister(
+                self.client.read, self.client.write,
+                name, addr, length, 32, "rw")
+        regs["analyzer_trigger_enable"] = regs["analyzer_storage_enable"]
+        config_csv = os.path.join(self.dir.name, "analyzer.csv")
+        with open(config_csv, "w") as f:
+            f.write("config,None,data_width,40\n")
+            f.write("signal,0,data,40\n")
+        return LiteScopeAnalyzerDriver(CSRElements(regs), "analyzer", config_csv, comm=comm)
+
+    def test_upload(self):
+        progress = []
+        data = self.driver(comm=self.client).upload(burst=64,
+            progress=lambda position, length: progress.append((position, length)))
+        self.assertEqual(list(data), self.samples)
+        # all the samples were acknowledged
+        self.assertEqual(self.client.read(0x00), 0)
+        self.assertEqual(progress, [(64, 300), (128, 300), (192, 300),
+                                    (256, 300), (300, 300)])
+
+    def test_upload_single(self):
+        # one round trip per register access, keep it short
+        del self.samples[20:]
+        for driver, burst in (self.driver(comm=self.client), 1), (self.driver(), 64):
+            self.comm.samples = list(self.samples)
+            with mock.patch.object(self.client, "burst") as client_burst:
+                data = driver.upload(burst=burst)
+            client_burst.assert_not_called()
+            self.assertEqual(list(data), self.samples)
+            # all the samples were acknowledged
+            self.assertEqual(self.client.read(0x00), 0)
@@ -3,6 +3,7 @@ import os
 from math import cos, sin
 
 from litescope.software.dump import *
+from litescope.software.dump.common import get_bits
 
 #TODO:
 # - find a way to check if files are generated corectly
@@ -37,3 +38,61 @@ class TestDump(unittest.TestCase):
         filename = "dump.vcd"
         VCDDump(dump).write(filename)
         os.remove(filename)
+
+    def test_wave(self):
+        filename = "dump.mwav"
+        WaveDump(dump).write(filename)
+        wave = WaveDump()
+        wave.read(filename)
+        self.assertEqual([(v.name, v.width, v.values.tolist()) for v in wave.variables],
+                         [(v.name, v.width, v.values.tolist() + [v.values[-1]]*(len(dump) - len(v)))
+                          for v in dump.variables])
+        wave.read(filename, names=["sin"], start=300, stop=399)
+        self.assertEqual(len(wave.variables), 1)
+        self.assertEqual(wave.variables[0].values.tolist(),
+                         dump.variables[4].values[300:400].tolist())
+        os.remove(filename)
+
+    def test_dump_data(self):
+        data = DumpData(100)
+        samples = [(3*i << 60) | (i << 90) | i for i in range(1000)]
+        data.extend(samples)
+        for low, high in (0, 8), (60, 70), (64, 100), (0, 100), (5, 6):
+            self.assertEqual(data[low:high].tolist(),
+                             [(s >> low) & (2**(high - low) - 1) for s in samples])
+        self.assertEqual(data[61].tolist(), [(s >> 61) & 1 for s in samples])
+
+    def test_get_bits(self):
+        samples = [5, 2**70 + 5, -1, -2**80 + 3]
+        for low, high in (0, 8), (1, 3), (60, 72), (0, 100):
+            self.assertEqual(get_bits(samples, low, high).tolist(),
+                             [(s >> low) & (2**(high - low) - 1) for s in samples])
+        self.assertEqual(get_bits([2**70 + 5], 0, 8).tolist(), [5])
+        self.assertEqual(get_bits([-1], 0, 8).tolist(), [255])
+        self.assertEqual(get_bits([-2, 3], 0).tolist(), [0, 1])
+
+    def test_changes(self):
+        d = Dump()
+        d.add(DumpVariable("a", 4, [1, 1, 2, 2, 2, 3]))
+        d.add(DumpVariable("b", 1, [0, 1, 1]))
+        self.assertEqual(d.value_changes(),
+                         [(0, 0, 1), (0, 1, 0), (1, 1, 1), (2, 0, 2), (5, 0, 3)])
+        self.assertEqual(CSVDump(d).generate_dumpvars(),
+                         "0001, 0, \n0001, 1, \n0010, 1, \n"
+                         "0010, 1, \n0010, 1, \n0011, 1, \n")
+        vcd = VCDDump(d)
+        vcd.finalize()
+        self.assertEqual(vcd.generate_valuechange(),
+                         "#0\nb0001 !\nb0 \"\n#1\nb1 \"\n#2\nb0010 !\n#5\nb0011 !\n")
+
+    def test_sigrok_read(self):
+        filename = "dump_bits.sr"
+        d = Dump()
+        for i in range(10):
+            d.add(DumpVariable("bit" + str(i), 1, [(j >> i) & 1 for j in range(300)]))
+        SigrokDump(d).write(filename)
+        r = SigrokDump()
+        r.read(filename)
+        os.remove(filename)
+        self.assertEqual([v.values.tolist() for v in r.variables],
+                         [v.values.tolist() for v in d.variables])
@@ -0,0 +1,103 @@
+import os
+import shutil
+import hashlib
+import tempfile
+
+
+def _sha256_file(filename):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.digest()
+
+
+class BuildCache:
+    """Content-addressed cache of build products
+
+    Entries are directories of ``directory`` named after the key of the
+    build, which hashes everything its products depend on: input files
+    and texts, and the executables of the tools. When the cache grows
+    over ``max_size`` bytes, the least recently used entries are removed.
+    """
+    def __init__(self, directory, max_size=2**30):
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self._tool_digests = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def tool_digest(self, name):
+        """Digest of the executable a tool name resolves to in the PATH"""
+        path = shutil.which(name)
+        if path is None:
+            return b"missing"
+        path = os.path.realpath(path)
+        st = os.stat(path)
+        cache_key = (path, st.st_size, st.st_mtime)
+        if cache_key not in self._tool_digests:
+            self._tool_digests[cache_key] = _sha256_file(path)
+        return self._tool_digests[cache_key]
+
+    def key(self, files=(), texts=(), tools=()):
+        h = hashlib.sha256()
+        for filename in files:
+            h.update(_sha256_file(filename))
+        for text in texts:
+            if isinstance(text, str):
+                text = text.encode("utf-8")
+            h.update(hashlib.sha256(text).digest())
+        for tool in tools:
+            h.update(tool.encode("utf-8"))
+            h.update(self.tool_digest(tool))
+        return h.hexdigest()
+
+    def restore(self, key, filenames):
+        """Copy the cached products of a build to the current directory
+
+        Returns False if the build is not in the cache.
+        """
+        entry = os.path.join(self.directory, key)
+        if not os.path.isdir(entry):
+            return False
+        for filename in filenames:
+            cached = os.path.join(entry, filename)
+            if os.path.exists(cached):
+                shutil.copyfile(cached, filename)
+        os.utime(entry)
+        return True
+
+    def store(self, key, filenames):
+        """Add the products of a build, from the current directory"""
+        entry = os.path.join(self.directory, key)
+        if os.path.isdir(entry):
+            return
+        # build the entry aside, so that concurrent builds never see it partially written
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        for filename in filenames:
+            if os.path.exists(filename):
+                shutil.copyfile(filename, os.path.join(tmp, filename))
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp)
+        self.evict()
+
+    def entries(self):
+        """(last use, size, path) of the entries, least recently used first"""
+        r = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            r.append((os.path.getmtime(path), size, path))
+        return sorted(r)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -3,13 +3,19 @@
 
 
 import os
+import re
 import sys
+import shlex
+import shutil
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from migen.fhdl.structure import _Fragment
 
 from litex.build.generic_platform import *
 from litex.build import tools
+from litex.build.cache import BuildCache
 from litex.build.lattice import common
 
 
@@ -65,6 +71,37 @@ def _run_script(script):
         raise OSError("Subprocess failed")
 
 
+def _run_command(command):
+    if sys.platform not in ("win32", "cygwin"):
+        command = shlex.split(command)
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def parse_nextpnr_fmax(log):
+    """Achieved and constrained frequencies (MHz) of each clock in a nextpnr log
+
+    Returns a {clock: (fmax, constraint)} dictionary, constraint being None
+    for unconstrained clocks. nextpnr reports the frequencies after
+    placement and after routing: the last report is used.
+    """
+    r = {}
+    for m in re.finditer(r"Max frequency for clock +'([^']+)': ([0-9.]+) MHz"
+                         r"(?: \((?:PASS|FAIL) at ([0-9.]+) MHz\))?", log):
+        constraint = float(m.group(3)) if m.group(3) is not None else None
+        r[m.group(1)] = (float(m.group(2)), constraint)
+    return r
+
+
+def _fmax_margin(fmax, target_fmax=None):
+    # Worst ratio of achieved to target frequency, None without any target
+    ratios = []
+    for clk, (achieved, constraint) in fmax.items():
+        target = target_fmax if target_fmax is not None else constraint
+        if target:
+            ratios.append(achieved/target)
+    return min(ratios) if ratios else None
+
+
 class LatticeIceStormToolchain:
     attr_translate = {
         "keep": ("keep", "true"),
@@ -90,6 +127,9 @@ class LatticeIceStormToolchain:
 
     special_overrides = common.lattice_ice40_special_overrides
 
+    # Products of a build restored from the build cache
+    build_products = [".blif", ".json", ".txt", ".tim", ".bin", ".rpt"]
+
     def __init__(self):
         # Variables within replacement fields should be backend-aware and
         # update their syntax accordingly. Currently, only {pnr_pkg_opts}
@@ -123,8 +163,11 @@ class LatticeIceStormToolchain:
         self.freq_constraints = dict()
 
     # platform.device should be of the form "ice40-{lp384, hx1k, etc}-{tq144, etc}"
+    # build_cache is a directory or a BuildCache, and defaults to $LITEX_BUILD_CACHE.
+    # seeds, seed_jobs and target_fmax select a nextpnr seed sweep, see run_seeds.
     def build(self, platform, fragment, build_dir="build", build_name="top",
-              toolchain_path=None, use_nextpnr=True, synth_opts="", run=True, **kwargs):
+              toolchain_path=None, use_nextpnr=True, synth_opts="", run=True,
+              build_cache=None, seeds=None, seed_jobs=None, target_fmax=None, **kwargs):
         os.makedirs(build_dir, exist_ok=True)
         cwd = os.getcwd()
         os.chdir(build_dir)
@@ -181,12 +224,135 @@ class LatticeIceStormToolchain:
                                freq_constraint=freq_constraint)
 
         if run:
-            _run_script(script)
+            extra_key = []
+            if use_nextpnr and seeds is not None:
+                if isinstance(seeds, int):
+                    seeds = range(1, seeds + 1)
+                seeds = list(seeds)
+                commands = [s.format(build_name=build_name, fail_stmt="",
+                                     pnr_pkg_opts=pnr_pkg_opts) for s in chosen_build_template]
+                run_build = lambda: self.run_seeds(commands, build_name, seeds, seed_jobs, target_fmax)
+                extra_key = ["seeds {} {}".format(seeds, target_fmax)]
+            else:
+                run_build = lambda: _run_script(script)
+            if build_cache is None:
+                build_cache = os.environ.get("LITEX_BUILD_CACHE")
+            if build_cache is None:
+                run_build()
+            else:
+                if not isinstance(build_cache, BuildCache):
+                    build_cache = BuildCache(build_cache)
+                key = self.build_key(build_cache, platform, v_output, build_name,
+                                     chosen_yosys_template, synth_opts, chosen_build_template,
+                                     extra_key,
+                                     pnr_pkg_opts=pnr_pkg_opts,
+                                     icetime_pkg_opts=icetime_pkg_opts,
+                                     freq_constraint=freq_constraint)
+                products = [build_name + ext for ext in self.build_products]
+                if build_cache.restore(key, products):
+                    print("Build products of {} restored from {}".format(build_name, build_cache.directory))
+                else:
+                    run_build()
+                    build_cache.store(key, products)
 
         os.chdir(cwd)
 
         return v_output.ns
 
+    def build_key(self, cache, platform, v_output, build_name, yosys_template, synth_opts,
+                  build_template, extra_key=(), **kwargs):
+        # Everything the build products depend on, except the paths of the sources
+        commands = [s.format(build_name=build_name, fail_stmt="", **kwargs)
+                    for s in build_template]
+        texts = [tools.strip_generated_banner(v_output.main_source)]
+        for filename, content in sorted(v_output.data_files.items()):
+            texts += [filename, content]
+        for ext in [".pcf", "_pre_pack.py"]:
+            if build_name + ext in " ".join(commands):
+                with open(build_name + ext) as f:
+                    texts.append(f.read())
+        texts += [s.format(build_name=build_name, read_files="", synth_opts=synth_opts)
+                  for s in yosys_template]
+        texts += commands
+        texts += extra_key
+        sources = sorted(platform.sources)
+        texts += [language + " " + library for filename, language, library in sources]
+        files = [filename for filename, language, library in sources]
+        for path in platform.verilog_include_paths:
+            for root, dirs, filenames in sorted(os.walk(path)):
+                files += [os.path.join(root, f) for f in sorted(filenames)]
+        return cache.key(files, texts, tools=[command.split()[0] for command in commands])
+
+    def run_seeds(self, commands, build_name, seeds, jobs=None, target_fmax=None):
+        """Run the build commands with a nextpnr run per seed
+
+        The nextpnr runs are done in parallel, by up to ``jobs`` processes
+        (one per CPU by default), and the one with the best worst-case
+        margin between the Fmax of its clocks and their constraints (or
+        ``target_fmax``, in MHz) is used for the rest of the build. Runs
+        are stopped as soon as one meets the targets of all its clocks.
+
+        Returns the seed that was used.
+        """
+        best = None
+        for command in commands:
+            if command.split()[0] == "nextpnr-ice40":
+                best = self._sweep(command, build_name, seeds, jobs, target_fmax)
+                name = "{}_seed{}".format(build_name, best)
+                shutil.copyfile(name + ".txt", build_name + ".txt")
+                shutil.copyfile(name + ".log", build_name + "_nextpnr.log")
+            elif _run_command(command).wait() != 0:
+                raise OSError("Subprocess failed")
+        return best
+
+    def _sweep(self, command, build_name, seeds, jobs, target_fmax):
+        asc = "--asc {}.txt".format(build_name)
+        if asc not in command:
+            raise ValueError("nextpnr command does not write {}.txt".format(build_name))
+        stop = threading.Event()
+        lock = threading.Lock()
+        procs = []
+
+        def run(seed):
+            name = "{}_seed{}".format(build_name, seed)
+            with lock:
+                if stop.is_set():
+                    return seed, None, None
+                proc = _run_command(command.replace(asc, "--asc {}.txt".format(name)) +
+                                    " --seed {} --log {}.log".format(seed, name))
+                procs.append(proc)
+            if proc.wait() != 0:
+                return seed, None, None
+            with open(name + ".log") as f:
+                fmax = parse_nextpnr_fmax(f.read())
+            margin = _fmax_margin(fmax, target_fmax)
+            if margin is not None and margin >= 1:
+                # stop before this worker picks up the next seed
+                with lock:
+                    stop.set()
+                    for proc in procs:
+                        if proc.poll() is None:
+                            proc.terminate()
+            return seed, fmax, margin
+
+        results = {}
+        best, best_margin = None, None
+        with ThreadPoolExecutor(jobs or os.cpu_count()) as pool:
+            for future in as_completed([pool.submit(run, seed) for seed in seeds]):
+                seed, fmax, margin = future.result()
+                if fmax is None:
+                    continue
+                results[seed] = fmax
+                if best is None or (margin is not None and (best_margin is None or margin > best_margin)):
+                    best, best_margin = seed, margin
+        if best is None:
+            raise OSError("nextpnr failed with every seed")
+        for seed in sorted(results):
+            print("Seed {}: {}".format(seed, ", ".join("{} {:.2f} MHz".format(clk, fmax)
+                for clk, (fmax, constraint) in sorted(results[seed].items()))))
+        print("Using seed {}".format(best))
+        return best
+
     def parse_device_string(self, device_str):
         # Arachne only understands packages based on the device size, but
         # LP for a given size supports packages that HX for the same size
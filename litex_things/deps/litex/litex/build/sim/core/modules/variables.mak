@@ -1,4 +1,4 @@
-CC = gcc
+CC = $(CCACHE) gcc
 CFLAGS = -Wall -O3 -ggdb -fPIC -Werror
 LDFLAGS = -levent -shared -fPIC
 
@@ -4,6 +4,8 @@
 
 import os
 import sys
+import shutil
+import hashlib
 import subprocess
 
 from migen.fhdl.structure import _Fragment
@@ -117,21 +119,60 @@ def _generate_sim_config(config):
     tools.write_to_file("sim_config.js", content)
 
 
-def _build_sim(build_name, sources, threads, coverage, opt_level="O3"):
+def _sim_digest(sources, make_args):
+    """Digest of everything the Verilated model and the sim modules are built from"""
+    h = hashlib.sha256()
+    files = [filename for filename, language, library in sources]
+    files += ["dut_init.cpp", "dut_header.h", "variables.mak"]
+    for root, dirs, filenames in os.walk(core_directory):
+        dirs.sort()
+        for f in sorted(filenames):
+            if f == "Makefile" or os.path.splitext(f)[1] in (".c", ".cpp", ".h", ".mak"):
+                files.append(os.path.join(root, f))
+    for filename in files:
+        with open(filename, "r", encoding="utf-8", errors="replace") as f:
+            contents = tools.strip_generated_banner(f.read())
+        h.update(filename.encode("utf-8") + b"\0")
+        h.update(hashlib.sha256(contents.encode("utf-8")).digest())
+    # a new version of Verilator needs a new model
+    verilator = shutil.which("verilator")
+    if verilator is not None:
+        st = os.stat(os.path.realpath(verilator))
+        h.update("{} {} {}".format(verilator, st.st_size, st.st_mtime).encode("utf-8"))
+    h.update(make_args.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _build_sim(build_name, sources, threads, coverage, opt_level="O3",
+               incremental=False, ccache=False, jobs=None):
     makefile = os.path.join(core_directory, 'Makefile')
     cc_srcs = []
     for filename, language, library in sources:
         cc_srcs.append("--cc " + filename + " ")
-    build_script_contents = """\
-rm -rf obj_dir/
-make -C . -f {} {} {} {} {}
-mkdir -p modules && cp obj_dir/*.so modules
-""".format(makefile,
-    "CC_SRCS=\"{}\"".format("".join(cc_srcs)),
-    "THREADS={}".format(threads) if int(threads) > 1 else "",
-    "COVERAGE=1" if coverage else "",
-    "OPT_LEVEL={}".format(opt_level),
-    )
+    make_args = " ".join(a for a in [
+        "CC_SRCS=\"{}\"".format("".join(cc_srcs)),
+        "THREADS={}".format(threads) if int(threads) > 1 else "",
+        "COVERAGE=1" if coverage else "",
+        "OPT_LEVEL={}".format(opt_level),
+        "CCACHE=ccache" if ccache else "",
+        "JOBS={}".format(jobs) if jobs else "",
+    ] if a)
+    make_cmd = "make -C . -f {} {}{}".format(makefile, "-j{} ".format(jobs) if jobs else "", make_args)
+    build_script_contents = "set -e\n"
+    if incremental:
+        # keep obj_dir, and only run make when its inputs changed since the last build
+        stamp = "obj_dir/build_" + build_name + ".stamp"
+        digest = _sim_digest(sources, make_args)
+        build_script_contents += """\
+if [ "$(cat {stamp} 2>/dev/null)" != "{digest}" ]; then
+    rm -f {stamp}
+    {make_cmd}
+    echo {digest} > {stamp}
+fi
+""".format(stamp=stamp, digest=digest, make_cmd=make_cmd)
+    else:
+        build_script_contents += "rm -rf obj_dir/\n" + make_cmd + "\n"
+    build_script_contents += "mkdir -p modules && cp obj_dir/*.so modules\n"
     build_script_file = "build_" + build_name + ".sh"
     tools.write_to_file(build_script_file, build_script_contents, force_unix=True)
 
@@ -171,7 +212,8 @@ class SimVerilatorToolchain:
     def build(self, platform, fragment, build_dir="build", build_name="dut",
             toolchain_path=None, serial="console", build=True, run=True, threads=1,
             verbose=True, sim_config=None, coverage=False, opt_level="O0",
-            trace=False, trace_start=0, trace_end=-1):
+            trace=False, trace_start=0, trace_end=-1,
+            incremental=False, ccache=False, jobs=None):
 
         # create build directory
         os.makedirs(build_dir, exist_ok=True)
@@ -201,7 +243,8 @@ class SimVerilatorToolchain:
                 _generate_sim_config(sim_config)
 
             # build
-            _build_sim(build_name, platform.sources, threads, coverage, opt_level)
+            _build_sim(build_name, platform.sources, threads, coverage, opt_level,
+                incremental, ccache, jobs)
 
         # run
         if run:
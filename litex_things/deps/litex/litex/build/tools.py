@@ -32,6 +32,28 @@ def write_to_file(filename, contents, force_unix=False):
         f.write(contents)
 
 
+def write_to_file_if_changed(filename, contents, force_unix=False):
+    """Write contents to filename, unless it already has them
+
+    Unchanged files keep their mtime, so that they do not trigger rebuilds.
+    Banners from generated_banner, which change at each run, are ignored.
+    Returns True if the file was written.
+    """
+    def strip(s):
+        for line_comment in "//", "#":
+            s = strip_generated_banner(s, line_comment)
+        return s
+    try:
+        with open(filename, "r") as f:
+            previous = f.read()
+    except (OSError, UnicodeDecodeError):
+        previous = None
+    if previous is not None and strip(previous) == strip(contents):
+        return False
+    write_to_file(filename, contents, force_unix)
+    return True
+
+
 def arch_bits():
     return struct.calcsize("P")*8
 
@@ -129,6 +151,14 @@ def generated_banner(line_comment="//"):
     return r
 
 
+def strip_generated_banner(contents, line_comment="//"):
+    """Remove the banner of generated_banner, which changes at each run"""
+    banner = line_comment + "-"*80 + "\n" + line_comment + " Auto-generated by "
+    if contents.startswith(banner):
+        contents = contents.split("\n", 3)[3]
+    return contents
+
+
 def deprecated_warning(msg):
     print("[WARNING] Deprecated, please update " + msg)
     time.sleep(2) # annoy user to force update :)
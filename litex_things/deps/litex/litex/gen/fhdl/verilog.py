@@ -11,9 +11,8 @@
 
 # License: BSD
 
-from functools import partial
 from operator import itemgetter
-import collections
+import collections.abc
 
 from migen.fhdl.structure import *
 from migen.fhdl.structure import _Operator, _Slice, _Assign, _Fragment
@@ -130,9 +129,9 @@ def _printexpr(ns, node):
 (_AT_BLOCKING, _AT_NONBLOCKING, _AT_SIGNAL) = range(3)
 
 
-def _printnode(ns, at, level, node, target_filter=None):
+def _printnode(ns, at, level, node, write, target_filter=None):
     if target_filter is not None and target_filter not in list_targets(node):
-        return ""
+        return
     elif isinstance(node, _Assign):
         if at == _AT_BLOCKING:
             assignment = " = "
@@ -142,34 +141,31 @@ def _printnode(ns, at, level, node, target_filter=None):
             assignment = " = "
         else:
             assignment = " <= "
-        return "\t"*level + _printexpr(ns, node.l)[0] + assignment + _printexpr(ns, node.r)[0] + ";\n"
-    elif isinstance(node, collections.Iterable):
-        return "".join(_printnode(ns, at, level, n, target_filter) for n in node)
+        write("\t"*level + _printexpr(ns, node.l)[0] + assignment + _printexpr(ns, node.r)[0] + ";\n")
+    elif isinstance(node, collections.abc.Iterable):
+        for n in node:
+            _printnode(ns, at, level, n, write, target_filter)
     elif isinstance(node, If):
-        r = "\t"*level + "if (" + _printexpr(ns, node.cond)[0] + ") begin\n"
-        r += _printnode(ns, at, level + 1, node.t, target_filter)
+        write("\t"*level + "if (" + _printexpr(ns, node.cond)[0] + ") begin\n")
+        _printnode(ns, at, level + 1, node.t, write, target_filter)
         if node.f:
-            r += "\t"*level + "end else begin\n"
-            r += _printnode(ns, at, level + 1, node.f, target_filter)
-        r += "\t"*level + "end\n"
-        return r
+            write("\t"*level + "end else begin\n")
+            _printnode(ns, at, level + 1, node.f, write, target_filter)
+        write("\t"*level + "end\n")
     elif isinstance(node, Case):
         if node.cases:
-            r = "\t"*level + "case (" + _printexpr(ns, node.test)[0] + ")\n"
+            write("\t"*level + "case (" + _printexpr(ns, node.test)[0] + ")\n")
             css = [(k, v) for k, v in node.cases.items() if isinstance(k, Constant)]
             css = sorted(css, key=lambda x: x[0].value)
             for choice, statements in css:
-                r += "\t"*(level + 1) + _printexpr(ns, choice)[0] + ": begin\n"
-                r += _printnode(ns, at, level + 2, statements, target_filter)
-                r += "\t"*(level + 1) + "end\n"
+                write("\t"*(level + 1) + _printexpr(ns, choice)[0] + ": begin\n")
+                _printnode(ns, at, level + 2, statements, write, target_filter)
+                write("\t"*(level + 1) + "end\n")
             if "default" in node.cases:
-                r += "\t"*(level + 1) + "default: begin\n"
-                r += _printnode(ns, at, level + 2, node.cases["default"], target_filter)
-                r += "\t"*(level + 1) + "end\n"
-            r += "\t"*level + "endcase\n"
-            return r
-        else:
-            return ""
+                write("\t"*(level + 1) + "default: begin\n")
+                _printnode(ns, at, level + 2, node.cases["default"], write, target_filter)
+                write("\t"*(level + 1) + "end\n")
+            write("\t"*level + "endcase\n")
     elif isinstance(node, Display):
         s = "\"" + node.s + "\""
         for arg in node.args:
@@ -178,9 +174,9 @@ def _printnode(ns, at, level, node, target_filter=None):
                 s += ns.get_name(arg)
             else:
                 s += str(arg)
-        return "\t"*level + "$display(" + s + ");\n"
+        write("\t"*level + "$display(" + s + ");\n")
     elif isinstance(node, Finish):
-        return "\t"*level + "$finish;\n"
+        write("\t"*level + "$finish;\n")
     else:
         raise TypeError("Node of unrecognized type: "+str(type(node)))
 
@@ -221,56 +217,55 @@ def _printattr(attr, attr_translate):
 
 
 def _printheader(f, ios, name, ns, attr_translate,
-                 reg_initialization):
+                 reg_initialization, write):
     sigs = list_signals(f) | list_special_ios(f, True, True, True)
     special_outs = list_special_ios(f, False, True, True)
     inouts = list_special_ios(f, False, False, True)
     targets = list_targets(f) | special_outs
     wires = _list_comb_wires(f) | special_outs
-    r = "module " + name + "(\n"
+    write("module " + name + "(\n")
     firstp = True
     for sig in sorted(ios, key=lambda x: x.duid):
         if not firstp:
-            r += ",\n"
+            write(",\n")
         firstp = False
         attr = _printattr(sig.attr, attr_translate)
         if attr:
-            r += "\t" + attr
+            write("\t" + attr)
         sig.type = "wire"
         if sig in inouts:
             sig.direction = "inout"
-            r += "\tinout " + _printsig(ns, sig)
+            write("\tinout " + _printsig(ns, sig))
         elif sig in targets:
             sig.direction = "output"
             if sig in wires:
-                r += "\toutput " + _printsig(ns, sig)
+                write("\toutput " + _printsig(ns, sig))
             else:
                 sig.type = "reg"
-                r += "\toutput reg " + _printsig(ns, sig)
+                write("\toutput reg " + _printsig(ns, sig))
         else:
             sig.direction = "input"
-            r += "\tinput " + _printsig(ns, sig)
-    r += "\n);\n\n"
+            write("\tinput " + _printsig(ns, sig))
+    write("\n);\n\n")
     for sig in sorted(sigs - ios, key=lambda x: x.duid):
         attr = _printattr(sig.attr, attr_translate)
         if attr:
-            r += attr + " "
+            write(attr + " ")
         if sig in wires:
-            r += "wire " + _printsig(ns, sig) + ";\n"
+            write("wire " + _printsig(ns, sig) + ";\n")
         else:
             if reg_initialization:
-                r += "reg " + _printsig(ns, sig) + " = " + _printexpr(ns, sig.reset)[0] + ";\n"
+                write("reg " + _printsig(ns, sig) + " = " + _printexpr(ns, sig.reset)[0] + ";\n")
             else:
-                r += "reg " + _printsig(ns, sig) + ";\n"
-    r += "\n"
-    return r
+                write("reg " + _printsig(ns, sig) + ";\n")
+    write("\n")
 
 
 def _printcomb_simulation(f, ns,
             display_run,
             dummy_signal,
-            blocking_assign):
-    r = ""
+            blocking_assign,
+            write):
     if f.comb:
         if dummy_signal:
             # Generate a dummy event to get the simulator
@@ -278,10 +273,10 @@ def _printcomb_simulation(f, ns,
             syn_off = "// synthesis translate_off\n"
             syn_on = "// synthesis translate_on\n"
             dummy_s = Signal(name_override="dummy_s")
-            r += syn_off
-            r += "reg " + _printsig(ns, dummy_s) + ";\n"
-            r += "initial " + ns.get_name(dummy_s) + " <= 1'd0;\n"
-            r += syn_on
+            write(syn_off)
+            write("reg " + _printsig(ns, dummy_s) + ";\n")
+            write("initial " + ns.get_name(dummy_s) + " <= 1'd0;\n")
+            write(syn_on)
 
 
         from collections import defaultdict
@@ -298,76 +293,71 @@ def _printcomb_simulation(f, ns,
         for n, (t, stmts) in enumerate(target_stmt_map.items()):
             assert isinstance(t, Signal)
             if len(stmts) == 1 and isinstance(stmts[0], _Assign):
-                r += "assign " + _printnode(ns, _AT_BLOCKING, 0, stmts[0])
+                write("assign ")
+                _printnode(ns, _AT_BLOCKING, 0, stmts[0], write)
             else:
                 if dummy_signal:
                     dummy_d = Signal(name_override="dummy_d")
-                    r += "\n" + syn_off
-                    r += "reg " + _printsig(ns, dummy_d) + ";\n"
-                    r += syn_on
+                    write("\n" + syn_off)
+                    write("reg " + _printsig(ns, dummy_d) + ";\n")
+                    write(syn_on)
 
-                r += "always @(*) begin\n"
+                write("always @(*) begin\n")
                 if display_run:
-                    r += "\t$display(\"Running comb block #" + str(n) + "\");\n"
+                    write("\t$display(\"Running comb block #" + str(n) + "\");\n")
                 if blocking_assign:
-                    r += "\t" + ns.get_name(t) + " = " + _printexpr(ns, t.reset)[0] + ";\n"
-                    r += _printnode(ns, _AT_BLOCKING, 1, stmts, t)
+                    write("\t" + ns.get_name(t) + " = " + _printexpr(ns, t.reset)[0] + ";\n")
+                    _printnode(ns, _AT_BLOCKING, 1, stmts, write, t)
                 else:
-                    r += "\t" + ns.get_name(t) + " <= " + _printexpr(ns, t.reset)[0] + ";\n"
-                    r += _printnode(ns, _AT_NONBLOCKING, 1, stmts, t)
+                    write("\t" + ns.get_name(t) + " <= " + _printexpr(ns, t.reset)[0] + ";\n")
+                    _printnode(ns, _AT_NONBLOCKING, 1, stmts, write, t)
                 if dummy_signal:
-                    r += syn_off
-                    r += "\t" + ns.get_name(dummy_d) + " = " + ns.get_name(dummy_s) + ";\n"
-                    r += syn_on
-                r += "end\n"
-    r += "\n"
-    return r
+                    write(syn_off)
+                    write("\t" + ns.get_name(dummy_d) + " = " + ns.get_name(dummy_s) + ";\n")
+                    write(syn_on)
+                write("end\n")
+    write("\n")
 
 
-def _printcomb_regular(f, ns, blocking_assign):
-    r = ""
+def _printcomb_regular(f, ns, blocking_assign, write):
     if f.comb:
         groups = group_by_targets(f.comb)
 
         for n, g in enumerate(groups):
             if len(g[1]) == 1 and isinstance(g[1][0], _Assign):
-                r += "assign " + _printnode(ns, _AT_BLOCKING, 0, g[1][0])
+                write("assign ")
+                _printnode(ns, _AT_BLOCKING, 0, g[1][0], write)
             else:
-                r += "always @(*) begin\n"
+                write("always @(*) begin\n")
                 if blocking_assign:
                     for t in g[0]:
-                        r += "\t" + ns.get_name(t) + " = " + _printexpr(ns, t.reset)[0] + ";\n"
-                    r += _printnode(ns, _AT_BLOCKING, 1, g[1])
+                        write("\t" + ns.get_name(t) + " = " + _printexpr(ns, t.reset)[0] + ";\n")
+                    _printnode(ns, _AT_BLOCKING, 1, g[1], write)
                 else:
                     for t in g[0]:
-                        r += "\t" + ns.get_name(t) + " <= " + _printexpr(ns, t.reset)[0] + ";\n"
-                    r += _printnode(ns, _AT_NONBLOCKING, 1, g[1])
-                r += "end\n"
-    r += "\n"
-    return r
+                        write("\t" + ns.get_name(t) + " <= " + _printexpr(ns, t.reset)[0] + ";\n")
+                    _printnode(ns, _AT_NONBLOCKING, 1, g[1], write)
+                write("end\n")
+    write("\n")
 
 
-def _printsync(f, ns):
-    r = ""
+def _printsync(f, ns, write):
     for k, v in sorted(f.sync.items(), key=itemgetter(0)):
-        r += "always @(posedge " + ns.get_name(f.clock_domains[k].clk) + ") begin\n"
-        r += _printnode(ns, _AT_SIGNAL, 1, v)
-        r += "end\n\n"
-    return r
+        write("always @(posedge " + ns.get_name(f.clock_domains[k].clk) + ") begin\n")
+        _printnode(ns, _AT_SIGNAL, 1, v, write)
+        write("end\n\n")
 
 
-def _printspecials(overrides, specials, ns, add_data_file, attr_translate):
-    r = ""
+def _printspecials(overrides, specials, ns, add_data_file, attr_translate, write):
     for special in sorted(specials, key=lambda x: x.duid):
         if hasattr(special, "attr"):
             attr = _printattr(special.attr, attr_translate)
             if attr:
-                r += attr + " "
+                write(attr + " ")
         pr = call_special_classmethod(overrides, special, "emit_verilog", ns, add_data_file)
         if pr is None:
             raise NotImplementedError("Special " + str(special) + " failed to implement emit_verilog")
-        r += pr
-    return r
+        write(pr)
 
 
 def convert(f, ios=None, name="top",
@@ -378,7 +368,8 @@ def convert(f, ios=None, name="top",
   reg_initialization=True,
   dummy_signal=True,
   blocking_assign=False,
-  regular_comb=True):
+  regular_comb=True,
+  streaming=False):
     r = ConvOutput()
     if not isinstance(f, _Fragment):
         f = f.get_fragment()
@@ -416,21 +407,31 @@ def convert(f, ios=None, name="top",
     ns.clock_domains = f.clock_domains
     r.ns = ns
 
-    src = generated_banner("//")
-    src += _printheader(f, ios, name, ns, attr_translate,
-                        reg_initialization=reg_initialization)
-    if regular_comb:
-        src += _printcomb_regular(f, ns,
-                      blocking_assign=blocking_assign)
+    def emit(write):
+        write(generated_banner("//"))
+        _printheader(f, ios, name, ns, attr_translate,
+                     reg_initialization=reg_initialization,
+                     write=write)
+        if regular_comb:
+            _printcomb_regular(f, ns,
+                          blocking_assign=blocking_assign,
+                          write=write)
+        else:
+            _printcomb_simulation(f, ns,
+                          display_run=display_run,
+                          dummy_signal=dummy_signal,
+                          blocking_assign=blocking_assign,
+                          write=write)
+        _printsync(f, ns, write)
+        _printspecials(special_overrides, f.specials - lowered_specials,
+            ns, r.add_data_file, attr_translate, write)
+        write("endmodule\n")
+
+    if streaming:
+        r.set_main_source(emit)
     else:
-        src += _printcomb_simulation(f, ns,
-                      display_run=display_run,
-                      dummy_signal=dummy_signal,
-                      blocking_assign=blocking_assign)
-    src += _printsync(f, ns)
-    src += _printspecials(special_overrides, f.specials - lowered_specials,
-        ns, r.add_data_file, attr_translate)
-    src += "endmodule\n"
-    r.set_main_source(src)
+        chunks = []
+        emit(chunks.append)
+        r.set_main_source("".join(chunks))
 
     return r
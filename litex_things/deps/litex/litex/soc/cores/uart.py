@@ -244,9 +244,9 @@ class UARTStub(Module, AutoCSR):
 
 
 class UARTWishboneBridge(WishboneStreamingBridge):
-    def __init__(self, pads, clk_freq, baudrate=115200):
+    def __init__(self, pads, clk_freq, baudrate=115200, rx_fifo_depth=16):
         self.submodules.phy = RS232PHY(pads, clk_freq, baudrate)
-        WishboneStreamingBridge.__init__(self, self.phy, clk_freq)
+        WishboneStreamingBridge.__init__(self, self.phy, clk_freq, rx_fifo_depth)
 
 
 def UARTPads():
@@ -9,11 +9,14 @@
 
 
 import os
+import time
 import subprocess
 import struct
 import shutil
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-from litex.build.tools import write_to_file
+from litex.build.tools import write_to_file_if_changed
 from litex.soc.integration import cpu_interface, soc_core, soc_sdram
 
 from litedram import sdram_init
@@ -41,7 +44,7 @@ class Builder:
     def __init__(self, soc, output_dir=None,
                  compile_software=True, compile_gateware=True,
                  gateware_toolchain_path=None,
-                 csr_json=None, csr_csv=None):
+                 csr_json=None, csr_csv=None, jobs=None):
         self.soc = soc
         if output_dir is None:
             output_dir = "soc_{}_{}".format(
@@ -55,6 +58,10 @@ class Builder:
         self.gateware_toolchain_path = gateware_toolchain_path
         self.csr_csv = csr_csv
         self.csr_json = csr_json
+        # Maximum number of compilation jobs run at once
+        self.jobs = jobs if jobs is not None else (os.cpu_count() or 1)
+        # (stage, seconds) of the last build
+        self.timings = []
 
         self.software_packages = []
         for name in soc_software_packages:
@@ -101,29 +108,29 @@ class Builder:
         define("BUILDINC_DIRECTORY", buildinc_dir)
         for name, src_dir in self.software_packages:
             define(name.upper() + "_DIRECTORY", src_dir)
-        write_to_file(
+        write_to_file_if_changed(
             os.path.join(generated_dir, "variables.mak"),
             "".join(variables_contents))
-        write_to_file(
+        write_to_file_if_changed(
             os.path.join(generated_dir, "output_format.ld"),
             cpu_interface.get_linker_output_format(self.soc.cpu))
-        write_to_file(
+        write_to_file_if_changed(
             os.path.join(generated_dir, "regions.ld"),
             cpu_interface.get_linker_regions(memory_regions))
-        write_to_file(
+        write_to_file_if_changed(
             os.path.join(generated_dir, "mem.h"),
             cpu_interface.get_mem_header(memory_regions, flash_boot_address, shadow_base))
-        write_to_file(
+        write_to_file_if_changed(
             os.path.join(generated_dir, "csr.h"),
             cpu_interface.get_csr_header(csr_regions, constants))
-        write_to_file(
+        write_to_file_if_changed(
             os.path.join(generated_dir, "git.h"),
             cpu_interface.get_git_header()
         )
 
         if isinstance(self.soc, soc_sdram.SoCSDRAM):
             if hasattr(self.soc, "sdram"):
-                write_to_file(
+                write_to_file_if_changed(
                     os.path.join(generated_dir, "sdram_phy.h"),
                     sdram_init.get_sdram_phy_c_header(
                         self.soc.sdram.controller.settings.phy,
@@ -145,27 +152,52 @@ class Builder:
         if csr_json is not None:
             csr_dir = os.path.dirname(os.path.realpath(csr_json))
             os.makedirs(csr_dir, exist_ok=True)
-            write_to_file(csr_json, cpu_interface.get_csr_json(csr_regions, constants, memory_regions))
+            write_to_file_if_changed(csr_json, cpu_interface.get_csr_json(csr_regions, constants, memory_regions))
 
         if csr_csv is not None:
             csr_dir = os.path.dirname(os.path.realpath(csr_csv))
             os.makedirs(csr_dir, exist_ok=True)
-            write_to_file(csr_csv, cpu_interface.get_csr_csv(csr_regions, constants, memory_regions))
+            write_to_file_if_changed(csr_csv, cpu_interface.get_csr_csv(csr_regions, constants, memory_regions))
 
     def _prepare_software(self):
         for name, src_dir in self.software_packages:
             dst_dir = os.path.join(self.output_dir, "software", name)
             os.makedirs(dst_dir, exist_ok=True)
 
+    @contextmanager
+    def _timed(self, stage):
+        start = time.time()
+        yield
+        elapsed = time.time() - start
+        self.timings.append((stage, elapsed))
+        print("[BUILDER] {}: {:.1f}s".format(stage, elapsed))
+
+    def _make_packages(self, packages):
+        # Split the jobs between the packages built at the same time
+        workers = min(self.jobs, len(packages))
+        make_jobs = max(self.jobs//workers, 1)
+        def make(package):
+            name, src_dir = package
+            dst_dir = os.path.join(self.output_dir, "software", name)
+            makefile = os.path.join(src_dir, "Makefile")
+            with self._timed("software package " + name):
+                subprocess.check_call(["make", "-C", dst_dir, "-f", makefile,
+                                       "-j{}".format(make_jobs)])
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(make, packages))
+
     def _generate_software(self, compile_bios=True):
-         for name, src_dir in self.software_packages:
-            if name == "bios" and not compile_bios:
-                pass
-            else:
-                dst_dir = os.path.join(self.output_dir, "software", name)
-                makefile = os.path.join(src_dir, "Makefile")
-                if self.compile_software:
-                    subprocess.check_call(["make", "-C", dst_dir, "-f", makefile])
+        if not self.compile_software:
+            return
+        packages = [(name, src_dir) for name, src_dir in self.software_packages
+                    if name != "bios" or compile_bios]
+        # Libraries do not depend on each other, and are built before the
+        # packages that link against them.
+        libraries = [p for p in packages if p[0].startswith("lib")]
+        others = [p for p in packages if not p[0].startswith("lib")]
+        for stage in libraries, others:
+            if stage:
+                self._make_packages(stage)
 
     def _initialize_rom(self):
         bios_file = os.path.join(self.output_dir, "software", "bios","bios.bin")
@@ -173,17 +205,22 @@ class Builder:
         self.soc.initialize_rom(bios_data)
 
     def build(self, toolchain_path=None, **kwargs):
-        self.soc.finalize()
+        self.timings = []
+        with self._timed("SoC finalization"):
+            self.soc.finalize()
 
         os.makedirs(self.output_dir, exist_ok=True)
 
         if self.soc.cpu_type is not None:
             self._prepare_software()
-            self._generate_includes()
-            self._generate_software(not self.soc.integrated_rom_initialized)
+            with self._timed("includes"):
+                self._generate_includes()
+            with self._timed("software"):
+                self._generate_software(not self.soc.integrated_rom_initialized)
             if self.soc.integrated_rom_size and self.compile_software:
                 if not self.soc.integrated_rom_initialized:
-                    self._initialize_rom()
+                    with self._timed("ROM initialization"):
+                        self._initialize_rom()
 
         self._generate_csr_map(self.csr_json, self.csr_csv)
 
@@ -192,8 +229,9 @@ class Builder:
 
         if "run" not in kwargs:
             kwargs["run"] = self.compile_gateware
-        vns = self.soc.build(build_dir=os.path.join(self.output_dir, "gateware"),
-                             toolchain_path=toolchain_path, **kwargs)
+        with self._timed("gateware"):
+            vns = self.soc.build(build_dir=os.path.join(self.output_dir, "gateware"),
+                                 toolchain_path=toolchain_path, **kwargs)
         return vns
 
 
@@ -216,6 +254,9 @@ def builder_args(parser):
     parser.add_argument("--csr-json", default=None,
                         help="store CSR map in JSON format into the "
                              "specified file")
+    parser.add_argument("--jobs", default=None, type=int,
+                        help="maximum number of software compilation jobs "
+                             "(default: number of CPUs)")
 
 
 def builder_argdict(args):
@@ -224,5 +265,6 @@ def builder_argdict(args):
         "compile_software": not args.no_compile_software,
         "compile_gateware": not args.no_compile_gateware,
         "gateware_toolchain_path": args.gateware_toolchain_path,
-        "csr_csv": args.csr_csv
+        "csr_csv": args.csr_csv,
+        "jobs": args.jobs
     }
@@ -12,16 +12,29 @@ from litex.soc.interconnect import stream
 
 
 class WishboneStreamingBridge(Module):
+    """Wishbone master driven by a byte stream
+
+    Commands are a command byte (write or read), a length in words (up to
+    255), a big-endian word address, then the data words for writes. Reads
+    reply with the data words. Received bytes are buffered in a FIFO of
+    ``rx_fifo_depth`` bytes, so that the host can send the next commands
+    while a read reply is being sent.
+    """
     cmds = {
         "write": 0x01,
         "read": 0x02
     }
 
-    def __init__(self, phy, clk_freq):
+    def __init__(self, phy, clk_freq, rx_fifo_depth=16):
         self.wishbone = wishbone.Interface()
 
         # # #
 
+        rx_fifo = stream.SyncFIFO([("data", 8)], rx_fifo_depth)
+        self.submodules += rx_fifo
+        self.comb += phy.source.connect(rx_fifo.sink)
+        source = rx_fifo.source
+
         byte_counter = Signal(3, reset_less=True)
         byte_counter_reset = Signal()
         byte_counter_ce = Signal()
@@ -32,7 +45,7 @@ class WishboneStreamingBridge(Module):
                 byte_counter.eq(byte_counter + 1)
             )
 
-        word_counter = Signal(3, reset_less=True)
+        word_counter = Signal(8, reset_less=True)
         word_counter_reset = Signal()
         word_counter_ce = Signal()
         self.sync += \
@@ -56,11 +69,11 @@ class WishboneStreamingBridge(Module):
         tx_data_ce = Signal()
 
         self.sync += [
-            If(cmd_ce, cmd.eq(phy.source.data)),
-            If(length_ce, length.eq(phy.source.data)),
-            If(address_ce, address.eq(Cat(phy.source.data, address[0:24]))),
+            If(cmd_ce, cmd.eq(source.data)),
+            If(length_ce, length.eq(source.data)),
+            If(address_ce, address.eq(Cat(source.data, address[0:24]))),
             If(rx_data_ce,
-                data.eq(Cat(phy.source.data, data[0:24]))
+                data.eq(Cat(source.data, data[0:24]))
             ).Elif(tx_data_ce,
                 data.eq(self.wishbone.dat_r)
             )
@@ -69,15 +82,13 @@ class WishboneStreamingBridge(Module):
         fsm = ResetInserter()(FSM(reset_state="IDLE"))
         timer = WaitTimer(clk_freq//10)
         self.submodules += fsm, timer
-        self.comb += [
-            fsm.reset.eq(timer.done),
-            phy.source.ready.eq(1)
-        ]
+        self.comb += fsm.reset.eq(timer.done)
         fsm.act("IDLE",
-            If(phy.source.valid,
+            source.ready.eq(1),
+            If(source.valid,
                 cmd_ce.eq(1),
-                If((phy.source.data == self.cmds["write"]) |
-                   (phy.source.data == self.cmds["read"]),
+                If((source.data == self.cmds["write"]) |
+                   (source.data == self.cmds["read"]),
                     NextState("RECEIVE_LENGTH")
                 ),
                 byte_counter_reset.eq(1),
@@ -85,13 +96,15 @@ class WishboneStreamingBridge(Module):
             )
         )
         fsm.act("RECEIVE_LENGTH",
-            If(phy.source.valid,
+            source.ready.eq(1),
+            If(source.valid,
                 length_ce.eq(1),
                 NextState("RECEIVE_ADDRESS")
             )
         )
         fsm.act("RECEIVE_ADDRESS",
-            If(phy.source.valid,
+            source.ready.eq(1),
+            If(source.valid,
                 address_ce.eq(1),
                 byte_counter_ce.eq(1),
                 If(byte_counter == 3,
@@ -105,7 +118,8 @@ class WishboneStreamingBridge(Module):
             )
         )
         fsm.act("RECEIVE_DATA",
-            If(phy.source.valid,
+            source.ready.eq(1),
+            If(source.valid,
                 rx_data_ce.eq(1),
                 byte_counter_ce.eq(1),
                 If(byte_counter == 3,
@@ -159,7 +173,10 @@ class WishboneStreamingBridge(Module):
             )
         )
 
-        self.comb += timer.wait.eq(~fsm.ongoing("IDLE"))
+        # reset when no byte was received or sent for 100ms
+        self.comb += timer.wait.eq(~fsm.ongoing("IDLE") &
+                                   ~(source.valid & source.ready) &
+                                   ~(phy.sink.valid & phy.sink.ready))
 
         self.comb += phy.sink.last.eq((byte_counter == 3) & (word_counter == length - 1))
 
@@ -167,6 +167,33 @@ int serialboot(void)
 					uart_write(SFL_ACK_SUCCESS);
 				break;
 			}
+			case SFL_CMD_LOAD_RLE: {
+				/* Control byte c < 0x80: c+1 literal bytes follow,
+				 * c >= 0x80: the next byte is repeated c-0x80+3 times */
+				char *writepointer;
+				int n;
+
+				failed = 0;
+				writepointer = (char *)(
+					 ((unsigned long)frame.payload[0] << 24)
+					|((unsigned long)frame.payload[1] << 16)
+					|((unsigned long)frame.payload[2] <<  8)
+					|((unsigned long)frame.payload[3] <<  0));
+				i = 4;
+				while(i < frame.length) {
+					n = frame.payload[i++];
+					if(n < 0x80) {
+						for(n++;(n > 0) && (i < frame.length);n--)
+							*(writepointer++) = frame.payload[i++];
+					} else if(i < frame.length) {
+						for(n -= 0x80-3;n > 0;n--)
+							*(writepointer++) = frame.payload[i];
+						i++;
+					}
+				}
+				uart_write(SFL_ACK_SUCCESS);
+				break;
+			}
 			case SFL_CMD_JUMP: {
 				unsigned long addr;
 
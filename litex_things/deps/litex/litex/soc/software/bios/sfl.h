@@ -20,6 +20,7 @@ struct sfl_frame {
 #define SFL_CMD_LOAD		0x01
 #define SFL_CMD_JUMP		0x02
 #define SFL_CMD_LOAD_NO_CRC	0x03
+#define SFL_CMD_LOAD_RLE	0x04
 
 /* Replies */
 #define SFL_ACK_SUCCESS		'K'
@@ -3,11 +3,15 @@
 # License: BSD
 
 import socket
+import asyncio
+from collections import deque
 
 from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
 from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
 from litex.tools.remote.etherbone import EtherboneIPC
-from litex.tools.remote.csr_builder import CSRBuilder
+from litex.tools.remote.etherbone import etherbone_packet_header_length
+from litex.tools.remote.etherbone import etherbone_record_header_length, record_payload_length
+from litex.tools.remote.csr_builder import CSRBuilder, AsyncCSRRegister
 
 
 class RemoteClient(EtherboneIPC, CSRBuilder):
@@ -24,6 +28,7 @@ class RemoteClient(EtherboneIPC, CSRBuilder):
         if hasattr(self, "socket"):
             return
         self.socket = socket.create_connection((self.host, self.port), 5.0)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.socket.settimeout(5.0)
 
     def close(self):
@@ -42,12 +47,11 @@ class RemoteClient(EtherboneIPC, CSRBuilder):
         # send packet
         packet = EtherbonePacket()
         packet.records = [record]
-        packet.encode()
-        self.send_packet(self.socket, packet[:])
+        self.send_packet(self.socket, packet.to_bytes())
 
         # receive response
-        packet = EtherbonePacket(self.receive_packet(self.socket))
-        packet.decode()
+        packet = EtherbonePacket()
+        packet.from_bytes(self.receive_packet(self.socket))
         datas = packet.records.pop().writes.get_datas()
         if self.debug:
             for i, data in enumerate(datas):
@@ -62,9 +66,144 @@ class RemoteClient(EtherboneIPC, CSRBuilder):
 
         packet = EtherbonePacket()
         packet.records = [record]
-        packet.encode()
-        self.send_packet(self.socket, packet)
+        self.send_packet(self.socket, packet.to_bytes())
 
         if self.debug:
             for i, data in enumerate(datas):
                 print("write {:08x} @ {:08x}".format(data, addr + 4*i))
+
+    def burst(self, transactions):
+        """Run several transactions in a single round trip
+
+        Each transaction is a ``(write_addr, write_datas, read_addrs)`` tuple
+        (``write_datas`` and ``read_addrs`` may be ``None``) and becomes one
+        record of a single Etherbone packet; the writes of a record are
+        performed before its reads. The server replies with one packet per
+        record that reads.
+
+        Returns the list of values read by each transaction.
+        """
+        packet = EtherbonePacket()
+        for write_addr, write_datas, read_addrs in transactions:
+            record = EtherboneRecord()
+            if write_datas:
+                record.writes = EtherboneWrites(base_addr=write_addr, datas=write_datas)
+                record.wcount = len(record.writes)
+            if read_addrs:
+                record.reads = EtherboneReads(addrs=read_addrs)
+                record.rcount = len(record.reads)
+            packet.records.append(record)
+        self.send_packet(self.socket, packet.to_bytes())
+
+        r = []
+        for write_addr, write_datas, read_addrs in transactions:
+            if not read_addrs:
+                r.append([])
+                continue
+            packet = EtherbonePacket()
+            packet.from_bytes(self.receive_packet(self.socket))
+            datas = packet.records.pop().writes.get_datas()
+            if self.debug:
+                for addr, data in zip(read_addrs, datas):
+                    print("read {:08x} @ {:08x}".format(data, addr))
+            r.append(datas)
+        return r
+
+
+class AsyncRemoteClient(EtherboneIPC, CSRBuilder):
+    """asyncio variant of RemoteClient
+
+    ``read`` and ``write`` are coroutines. Each request is sent as soon as
+    it is issued, without waiting for the replies to the previous ones, so
+    concurrent reads (e.g. with ``asyncio.gather``) overlap their round
+    trips. Replies are matched to reads in request order. The ``read`` and
+    ``write`` methods of the registers in ``regs`` are coroutines too.
+    """
+    register_class = AsyncCSRRegister
+
+    def __init__(self, host="localhost", port=1234, csr_csv="csr.csv", csr_data_width=None, debug=False):
+        if csr_csv is not None:
+            CSRBuilder.__init__(self, self, csr_csv, csr_data_width)
+        else:
+            assert csr_data_width is not None
+        self.host = host
+        self.port = port
+        self.debug = debug
+        self.pending = deque()
+
+    async def open(self):
+        if hasattr(self, "writer"):
+            return
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.receiver = asyncio.ensure_future(self._receive_replies())
+
+    async def close(self):
+        if not hasattr(self, "writer"):
+            return
+        self.receiver.cancel()
+        try:
+            await self.receiver
+        except asyncio.CancelledError:
+            pass
+        self.writer.close()
+        del self.reader
+        del self.writer
+
+    async def _receive_replies(self):
+        header_length = etherbone_packet_header_length + etherbone_record_header_length
+        try:
+            while True:
+                header = await self.reader.readexactly(header_length)
+                payload = await self.reader.readexactly(
+                    record_payload_length(*header[header_length-2:]))
+                packet = EtherbonePacket()
+                packet.from_bytes(header + payload)
+                future = self.pending.popleft()
+                if not future.cancelled():
+                    future.set_result(packet.records.pop().writes.get_datas())
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            # also on cancellation by close(), so that no read waits forever
+            while self.pending:
+                future = self.pending.popleft()
+                if not future.cancelled():
+                    future.set_exception(ConnectionError("Connection closed"))
+
+    async def read(self, addr, length=None):
+        length_int = 1 if length is None else length
+        record = EtherboneRecord()
+        record.reads = EtherboneReads(addrs=[addr + 4*j for j in range(length_int)])
+        record.rcount = len(record.reads)
+
+        packet = EtherbonePacket()
+        packet.records = [record]
+        future = asyncio.Future()
+        self.pending.append(future)
+        self.writer.write(packet.to_bytes())
+
+        datas = await future
+        if self.debug:
+            for i, data in enumerate(datas):
+                print("read {:08x} @ {:08x}".format(data, addr + 4*i))
+        return datas[0] if length is None else datas
+
+    async def write(self, addr, datas):
+        datas = datas if isinstance(datas, list) else [datas]
+        record = EtherboneRecord()
+        record.writes = EtherboneWrites(base_addr=addr, datas=[d for d in datas])
+        record.wcount = len(record.writes)
+
+        packet = EtherbonePacket()
+        packet.records = [record]
+        self.writer.write(packet.to_bytes())
+        await self.writer.drain()
+
+        if self.debug:
+            for i, data in enumerate(datas):
+                print("write {:08x} @ {:08x}".format(data, addr + 4*i))
+
+    async def read_register(self, name):
+        """Read the CSR register ``name`` (as in ``regs``)"""
+        return await getattr(self.regs, name).read()
@@ -11,9 +11,58 @@ import sys
 import socket
 import time
 import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneWrites
 from litex.tools.remote.etherbone import EtherboneIPC
+from litex.tools.remote.etherbone import etherbone_magic, etherbone_packet_header_length
+from litex.tools.remote.etherbone import etherbone_record_header_length, record_payload_length
+
+
+def coalesce_reads(addrs, max_length=255):
+    """Group addresses into runs of consecutive words
+
+    Returns a list of ``(base, length)`` runs of at most ``max_length`` words.
+    """
+    runs = []
+    for addr in addrs:
+        if runs:
+            base, length = runs[-1]
+            if addr == base + 4*length and length < max_length:
+                runs[-1] = (base, length + 1)
+                continue
+        runs.append((addr, 1))
+    return runs
+
+
+class ClientStats:
+    """Traffic counters of a client connection"""
+    def __init__(self, addr):
+        self.addr = addr
+        self.start_time = time.time()
+        self.records = 0
+        self.reads = 0
+        self.writes = 0
+        self.busy_time = 0.0
+        self.max_latency = 0.0
+
+    def update(self, reads, writes, latency):
+        self.records += 1
+        self.reads += reads
+        self.writes += writes
+        self.busy_time += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def __repr__(self):
+        elapsed = time.time() - self.start_time
+        words = self.reads + self.writes
+        return ("{}:{}: {} records, {} reads, {} writes in {:.1f}s, "
+                "{:.0f} words/s while busy, latency {:.2f}ms avg / {:.2f}ms max").format(
+            self.addr[0], self.addr[1], self.records, self.reads, self.writes, elapsed,
+            words/self.busy_time if self.busy_time else 0,
+            1e3*self.busy_time/self.records if self.records else 0,
+            1e3*self.max_latency)
 
 
 class RemoteServer(EtherboneIPC):
@@ -21,7 +70,8 @@ class RemoteServer(EtherboneIPC):
         self.comm = comm
         self.bind_ip = bind_ip
         self.bind_port = bind_port
-        self.lock = False
+        self.lock = threading.Lock()
+        self.clients = {}
 
     def open(self):
         if hasattr(self, "socket"):
@@ -45,54 +95,60 @@ class RemoteServer(EtherboneIPC):
         self.socket.close()
         del self.socket
 
+    def _read(self, addrs):
+        datas = []
+        for base, length in coalesce_reads(addrs):
+            if length == 1:
+                datas.append(self.comm.read(base))
+            else:
+                datas += self.comm.read(base, length=length)
+        return datas
+
+    def _execute(self, record):
+        # the lock serializes the accesses of all the clients to the board
+        with self.lock:
+            if record.writes is not None:
+                self.comm.write(record.writes.base_addr, record.writes.get_datas())
+            if record.reads is None:
+                return None
+            datas = self._read(record.reads.get_addrs())
+        reply = EtherboneRecord()
+        reply.writes = EtherboneWrites(base_addr=record.reads.base_ret_addr, datas=datas)
+        reply.wcount = len(reply.writes)
+        packet = EtherbonePacket()
+        packet.records = [reply]
+        return packet.to_bytes()
+
+    def _serve_client(self, client_socket, addr):
+        stats = self.clients[addr] = ClientStats(addr)
+        try:
+            for data in self.receive_records(client_socket):
+                start = time.perf_counter()
+                packet = EtherbonePacket()
+                packet.from_bytes(data)
+                record = packet.records.pop()
+                reply = self._execute(record)
+                stats.update(record.rcount, record.wcount, time.perf_counter() - start)
+                if reply is not None:
+                    self.send_packet(client_socket, reply)
+        except (OSError, ValueError):
+            pass
+        finally:
+            del self.clients[addr]
+            print("Disconnect: {}".format(stats))
+
     def _serve_thread(self):
         while True:
-            client_socket, addr = self.socket.accept()
+            try:
+                client_socket, addr = self.socket.accept()
+            except (AttributeError, OSError):
+                # server closed
+                return
             print("Connected with " + addr[0] + ":" + str(addr[1]))
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             try:
-                while True:
-                    try:
-                        packet = self.receive_packet(client_socket)
-                        if packet == 0:
-                            break
-                    except:
-                        break
-                    packet = EtherbonePacket(packet)
-                    packet.decode()
-
-                    record = packet.records.pop()
-
-                    # wait for lock
-                    while self.lock:
-                        time.sleep(0.01)
-
-                    # set lock
-                    self.lock = True
-
-                    # handle writes:
-                    if record.writes != None:
-                        self.comm.write(record.writes.base_addr, record.writes.get_datas())
-
-                    # handle reads
-                    if record.reads != None:
-                        reads = []
-                        for addr in record.reads.get_addrs():
-                            reads.append(self.comm.read(addr))
-
-                        record = EtherboneRecord()
-                        record.writes = EtherboneWrites(datas=reads)
-                        record.wcount = len(record.writes)
-
-                        packet = EtherbonePacket()
-                        packet.records = [record]
-                        packet.encode()
-                        self.send_packet(client_socket, packet)
-
-                    # release lock
-                    self.lock = False
-
+                self._serve_client(client_socket, addr)
             finally:
-                print("Disconnect")
                 client_socket.close()
 
     def start(self, nthreads):
@@ -102,6 +158,173 @@ class RemoteServer(EtherboneIPC):
             self.serve_thread.start()
 
 
+class AsyncRemoteServer(RemoteServer):
+    """RemoteServer multiplexing its clients on an asyncio event loop
+
+    Clients may send several requests without waiting for the replies. The
+    records received from all the clients are queued and executed in
+    batches of up to ``max_batch`` records by a single I/O worker thread,
+    so the ``comm`` backend is never accessed concurrently. The replies are
+    sent back to each client in request order.
+    """
+    def __init__(self, comm, bind_ip, bind_port=1234, max_batch=256):
+        RemoteServer.__init__(self, comm, bind_ip, bind_port)
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def _execute_batch(self, records):
+        # The reads of runs of read-only records are concatenated in arrival
+        # order, so consecutive addresses can be coalesced across records
+        # while every word is still read as many times as it is requested.
+        results = [None]*len(records)
+        with self.lock:
+            i = 0
+            while i < len(records):
+                if records[i].writes is not None:
+                    record = records[i]
+                    self.comm.write(record.writes.base_addr, record.writes.get_datas())
+                    if record.reads is not None:
+                        results[i] = self._read(record.reads.get_addrs())
+                    i += 1
+                    continue
+                j = i
+                while j < len(records) and records[j].writes is None:
+                    j += 1
+                addrs = []
+                for record in records[i:j]:
+                    if record.reads is not None:
+                        addrs += record.reads.get_addrs()
+                datas = self._read(addrs)
+                offset = 0
+                for k in range(i, j):
+                    if records[k].reads is not None:
+                        n = len(records[k].reads.addrs)
+                        results[k] = datas[offset:offset + n]
+                        offset += n
+                i = j
+        return results
+
+    async def _io_worker(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [(await self.queue.get())]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            records = [record for record, future in batch]
+            try:
+                results = await loop.run_in_executor(self.executor,
+                    self._execute_batch, records)
+            except Exception as e:
+                for record, future in batch:
+                    future.set_exception(e)
+            else:
+                for (record, future), result in zip(batch, results):
+                    future.set_result(result)
+
+    async def _receive_record(self, reader, header):
+        # returns the packet header in effect and the record, see
+        # EtherboneIPC.receive_records
+        magic = etherbone_magic.to_bytes(2, "big")
+        start = await reader.readexactly(2)
+        while start == magic:
+            header = start + (await reader.readexactly(etherbone_packet_header_length - 2))
+            start = await reader.readexactly(2)
+        if header is None:
+            raise ValueError("Etherbone stream does not start with a packet header")
+        counts = await reader.readexactly(etherbone_record_header_length - 2)
+        payload = await reader.readexactly(record_payload_length(*counts))
+        return header, start + counts + payload
+
+    async def _send_replies(self, writer, pending, stats):
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            record, future, start = item
+            try:
+                datas = await future
+            except Exception as e:
+                print("Error: {}".format(e))
+                writer.close()
+                return
+            stats.update(record.rcount, record.wcount, time.perf_counter() - start)
+            if datas is not None:
+                reply = EtherboneRecord()
+                reply.writes = EtherboneWrites(base_addr=record.reads.base_ret_addr, datas=datas)
+                reply.wcount = len(reply.writes)
+                packet = EtherbonePacket()
+                packet.records = [reply]
+                writer.write(packet.to_bytes())
+
+    async def _handle_client(self, reader, writer):
+        addr = writer.get_extra_info("peername")[:2]
+        print("Connected with " + addr[0] + ":" + str(addr[1]))
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stats = self.clients[addr] = ClientStats(addr)
+        pending = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send_replies(writer, pending, stats))
+        header = None
+        try:
+            while True:
+                header, data = await self._receive_record(reader, header)
+                packet = EtherbonePacket()
+                packet.from_bytes(header + data)
+                record = packet.records.pop()
+                future = asyncio.Future()
+                pending.put_nowait((record, future, time.perf_counter()))
+                self.queue.put_nowait((record, future))
+        except (asyncio.IncompleteReadError, OSError, ValueError):
+            pass
+        finally:
+            pending.put_nowait(None)
+            try:
+                await sender
+            except OSError:
+                pass
+            writer.close()
+            del self.clients[addr]
+            print("Disconnect: {}".format(stats))
+
+    async def _serve(self):
+        self.queue = asyncio.Queue()
+        server = await asyncio.start_server(self._handle_client, sock=self.socket)
+        try:
+            await self._io_worker()
+        finally:
+            server.close()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(self._serve())
+        self.started.set()
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        # let the client handlers finish on their cancellation
+        all_tasks = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+        tasks = all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+
+    def start(self, nthreads=None):
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+        self.serve_thread = threading.Thread(target=self._run)
+        self.serve_thread.daemon = True
+        self.serve_thread.start()
+        self.started.wait()
+
+    def close(self):
+        if hasattr(self, "loop"):
+            self.loop.call_soon_threadsafe(self.task.cancel)
+            self.serve_thread.join()
+            del self.loop
+        RemoteServer.close(self)
+
+
 def main():
     print("LiteX remote server")
     parser = argparse.ArgumentParser()
@@ -110,6 +333,8 @@ def main():
                         help="Host bind address")
     parser.add_argument("--bind-port", default=1234,
                         help="Host bind port")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="Serve clients from an asyncio event loop, batching their requests")
 
     # UART arguments
     parser.add_argument("--uart", action="store_true",
@@ -118,6 +343,10 @@ def main():
                         help="Set UART port")
     parser.add_argument("--uart-baudrate", default=115200,
                         help="Set UART baudrate")
+    parser.add_argument("--uart-pipelined", action="store_true",
+                        help="Pipeline UART commands (needs a bridge with a receive FIFO)")
+    parser.add_argument("--uart-fifo-depth", default=16,
+                        help="Depth of the receive FIFO of the UART bridge")
 
     # UDP arguments
     parser.add_argument("--udp", action="store_true",
@@ -153,7 +382,9 @@ def main():
         uart_port = args.uart_port
         uart_baudrate = int(float(args.uart_baudrate))
         print("[CommUART] port: {} / baudrate: {} / ".format(uart_port, uart_baudrate), end="")
-        comm = CommUART(uart_port, uart_baudrate)
+        comm = CommUART(uart_port, uart_baudrate,
+                        pipelined=args.uart_pipelined,
+                        rx_fifo_depth=int(args.uart_fifo_depth))
     elif args.udp:
         from litex.tools.remote.comm_udp import CommUDP
         udp_ip = args.udp_ip
@@ -185,7 +416,10 @@ def main():
         parser.print_help()
         exit()
 
-    server = RemoteServer(comm, args.bind_ip, int(args.bind_port))
+    if args.asyncio:
+        server = AsyncRemoteServer(comm, args.bind_ip, int(args.bind_port))
+    else:
+        server = RemoteServer(comm, args.bind_ip, int(args.bind_port))
     server.open()
     server.start(4)
     try:
@@ -193,6 +427,8 @@ def main():
         while True: time.sleep(100)
     except KeyboardInterrupt:
         pass
+    if hasattr(comm, "stats"):
+        print(comm.stats)
 
 if __name__ == "__main__":
     main()
@@ -209,6 +209,10 @@ def main():
                         help="cycle to end VCD tracing")
     parser.add_argument("--opt-level", default="O3",
                         help="compilation optimization level")
+    parser.add_argument("--incremental", action="store_true",
+                        help="keep the Verilated model and only rebuild it when its sources changed")
+    parser.add_argument("--ccache", action="store_true",
+                        help="compile the simulation through ccache")
     args = parser.parse_args()
 
     soc_kwargs = soc_sdram_argdict(args)
@@ -248,12 +252,14 @@ def main():
     builder = Builder(soc, **builder_kwargs)
     vns = builder.build(run=False, threads=args.threads, sim_config=sim_config,
         opt_level=args.opt_level,
-        trace=args.trace, trace_start=int(args.trace_start), trace_end=int(args.trace_end))
+        trace=args.trace, trace_start=int(args.trace_start), trace_end=int(args.trace_end),
+        incremental=args.incremental, ccache=args.ccache, jobs=builder.jobs)
     if args.with_analyzer:
         soc.analyzer.export_csv(vns, "analyzer.csv")
     builder.build(build=False, threads=args.threads, sim_config=sim_config,
         opt_level=args.opt_level,
-        trace=args.trace, trace_start=int(args.trace_start), trace_end=int(args.trace_end))
+        trace=args.trace, trace_start=int(args.trace_start), trace_end=int(args.trace_end),
+        incremental=args.incremental, ccache=args.ccache, jobs=builder.jobs)
 
 
 if __name__ == "__main__":
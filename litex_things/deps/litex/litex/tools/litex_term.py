@@ -8,11 +8,14 @@
 import sys
 import signal
 import os
+import re
 import time
 import serial
 import threading
 import argparse
 import json
+import binascii
+from collections import deque
 
 
 if sys.platform == "win32":
@@ -59,6 +62,7 @@ sfl_cmd_abort       = b"\x00"
 sfl_cmd_load        = b"\x01"
 sfl_cmd_load_no_crc = b"\x03"
 sfl_cmd_jump        = b"\x02"
+sfl_cmd_load_rle    = b"\x04"
 
 # Replies
 sfl_ack_success  = b"K"
@@ -67,47 +71,9 @@ sfl_ack_unknown  = b"U"
 sfl_ack_error    = b"E"
 
 
-crc16_table = [
-    0x0000, 0x1021, 0x2042, 0x3063, 0x4084, 0x50A5, 0x60C6, 0x70E7,
-    0x8108, 0x9129, 0xA14A, 0xB16B, 0xC18C, 0xD1AD, 0xE1CE, 0xF1EF,
-    0x1231, 0x0210, 0x3273, 0x2252, 0x52B5, 0x4294, 0x72F7, 0x62D6,
-    0x9339, 0x8318, 0xB37B, 0xA35A, 0xD3BD, 0xC39C, 0xF3FF, 0xE3DE,
-    0x2462, 0x3443, 0x0420, 0x1401, 0x64E6, 0x74C7, 0x44A4, 0x5485,
-    0xA56A, 0xB54B, 0x8528, 0x9509, 0xE5EE, 0xF5CF, 0xC5AC, 0xD58D,
-    0x3653, 0x2672, 0x1611, 0x0630, 0x76D7, 0x66F6, 0x5695, 0x46B4,
-    0xB75B, 0xA77A, 0x9719, 0x8738, 0xF7DF, 0xE7FE, 0xD79D, 0xC7BC,
-    0x48C4, 0x58E5, 0x6886, 0x78A7, 0x0840, 0x1861, 0x2802, 0x3823,
-    0xC9CC, 0xD9ED, 0xE98E, 0xF9AF, 0x8948, 0x9969, 0xA90A, 0xB92B,
-    0x5AF5, 0x4AD4, 0x7AB7, 0x6A96, 0x1A71, 0x0A50, 0x3A33, 0x2A12,
-    0xDBFD, 0xCBDC, 0xFBBF, 0xEB9E, 0x9B79, 0x8B58, 0xBB3B, 0xAB1A,
-    0x6CA6, 0x7C87, 0x4CE4, 0x5CC5, 0x2C22, 0x3C03, 0x0C60, 0x1C41,
-    0xEDAE, 0xFD8F, 0xCDEC, 0xDDCD, 0xAD2A, 0xBD0B, 0x8D68, 0x9D49,
-    0x7E97, 0x6EB6, 0x5ED5, 0x4EF4, 0x3E13, 0x2E32, 0x1E51, 0x0E70,
-    0xFF9F, 0xEFBE, 0xDFDD, 0xCFFC, 0xBF1B, 0xAF3A, 0x9F59, 0x8F78,
-    0x9188, 0x81A9, 0xB1CA, 0xA1EB, 0xD10C, 0xC12D, 0xF14E, 0xE16F,
-    0x1080, 0x00A1, 0x30C2, 0x20E3, 0x5004, 0x4025, 0x7046, 0x6067,
-    0x83B9, 0x9398, 0xA3FB, 0xB3DA, 0xC33D, 0xD31C, 0xE37F, 0xF35E,
-    0x02B1, 0x1290, 0x22F3, 0x32D2, 0x4235, 0x5214, 0x6277, 0x7256,
-    0xB5EA, 0xA5CB, 0x95A8, 0x8589, 0xF56E, 0xE54F, 0xD52C, 0xC50D,
-    0x34E2, 0x24C3, 0x14A0, 0x0481, 0x7466, 0x6447, 0x5424, 0x4405,
-    0xA7DB, 0xB7FA, 0x8799, 0x97B8, 0xE75F, 0xF77E, 0xC71D, 0xD73C,
-    0x26D3, 0x36F2, 0x0691, 0x16B0, 0x6657, 0x7676, 0x4615, 0x5634,
-    0xD94C, 0xC96D, 0xF90E, 0xE92F, 0x99C8, 0x89E9, 0xB98A, 0xA9AB,
-    0x5844, 0x4865, 0x7806, 0x6827, 0x18C0, 0x08E1, 0x3882, 0x28A3,
-    0xCB7D, 0xDB5C, 0xEB3F, 0xFB1E, 0x8BF9, 0x9BD8, 0xABBB, 0xBB9A,
-    0x4A75, 0x5A54, 0x6A37, 0x7A16, 0x0AF1, 0x1AD0, 0x2AB3, 0x3A92,
-    0xFD2E, 0xED0F, 0xDD6C, 0xCD4D, 0xBDAA, 0xAD8B, 0x9DE8, 0x8DC9,
-    0x7C26, 0x6C07, 0x5C64, 0x4C45, 0x3CA2, 0x2C83, 0x1CE0, 0x0CC1,
-    0xEF1F, 0xFF3E, 0xCF5D, 0xDF7C, 0xAF9B, 0xBFBA, 0x8FD9, 0x9FF8,
-    0x6E17, 0x7E36, 0x4E55, 0x5E74, 0x2E93, 0x3EB2, 0x0ED1, 0x1EF0
-]
-
-
 def crc16(l):
-    crc = 0
-    for d in l:
-        crc = crc16_table[((crc >> 8) ^ d) & 0xff] ^ (crc << 8)
-    return crc & 0xffff
+    # CRC-16/XMODEM, as computed by the BIOS
+    return binascii.crc_hqx(bytes(l), 0)
 
 
 class SFLFrame:
@@ -126,8 +92,122 @@ class SFLFrame:
         return packet
 
 
+def sfl_load_frames(data, address, cmd=sfl_cmd_load):
+    """Encode the frames loading data at address
+
+    Returns a list of (number of bytes loaded, encoded frame) tuples.
+    """
+    view = memoryview(data)
+    frames = []
+    for offset in range(0, len(view), sfl_payload_length):
+        frame = SFLFrame()
+        frame.cmd = cmd
+        frame.payload = (address + offset).to_bytes(4, "big") + view[offset:offset + sfl_payload_length]
+        frames.append((len(frame.payload) - 4, frame.encode()))
+    return frames
+
+
+def _rle_segments(data):
+    # (offset, length, is_run) segments of data, with runs of 3 to 130 bytes
+    pos = 0
+    for match in re.finditer(rb"(.)\1{2,}", data, re.DOTALL):
+        start, end = match.span()
+        if start > pos:
+            yield pos, start - pos, False
+        while end - start >= 3:
+            length = min(end - start, 130)
+            yield start, length, True
+            start += length
+        pos = start
+    if pos < len(data):
+        yield pos, len(data) - pos, False
+
+
+def sfl_rle_frames(data, address):
+    """Encode compressed frames loading data at address
+
+    The payload of a sfl_cmd_load_rle frame is the address followed by
+    run-length encoded data: a control byte c < 0x80 is followed by c + 1
+    literal bytes, and c >= 0x80 by a byte repeated c - 0x80 + 3 times.
+
+    Returns a list of (number of bytes loaded, encoded frame) tuples.
+    """
+    data = bytes(data)
+    frames = []
+    max_length = sfl_payload_length
+    payload = bytearray()
+    frame_offset = 0
+    offset = 0
+    for segment, length, run in _rle_segments(data):
+        while length:
+            space = max_length - len(payload)
+            if space < 2:
+                frames.append((frame_offset, offset, payload))
+                payload = bytearray()
+                frame_offset = offset
+                continue
+            if run:
+                n = length
+                payload += bytes([0x80 + n - 3, data[segment]])
+            else:
+                n = min(length, 128, space - 1)
+                payload.append(n - 1)
+                payload += data[segment:segment + n]
+            segment += n
+            offset += n
+            length -= n
+    if payload:
+        frames.append((frame_offset, offset, payload))
+    r = []
+    for start, end, payload in frames:
+        frame = SFLFrame()
+        frame.cmd = sfl_cmd_load_rle
+        frame.payload = (address + start).to_bytes(4, "big") + payload
+        r.append((end - start, frame.encode()))
+    return r
+
+
+def sfl_send_frames(port, frames, window=1, acked=True, progress=None):
+    """Send encoded frames, with up to window frames awaiting their reply
+
+    Frames the BIOS received with a CRC error are sent again once the
+    frames already in flight have been answered. Without acked, the
+    frames are sent without waiting for any reply. progress is called
+    with the number of bytes loaded by each frame once it is done.
+
+    Returns sfl_ack_success, or the first unexpected reply.
+    """
+    if not acked:
+        for length, frame in frames:
+            port.write(frame)
+            if progress is not None:
+                progress(length)
+        return sfl_ack_success
+    queue = deque(range(len(frames)))
+    pending = deque()
+    while queue or pending:
+        out = bytearray()
+        while queue and len(pending) < window:
+            i = queue.popleft()
+            out += frames[i][1]
+            pending.append(i)
+        if out:
+            port.write(bytes(out))
+        reply = port.read()
+        i = pending.popleft()
+        if reply == sfl_ack_success:
+            if progress is not None:
+                progress(frames[i][0])
+        elif reply == sfl_ack_crcerror:
+            queue.appendleft(i)
+        else:
+            return reply
+    return sfl_ack_success
+
+
 class LiteXTerm:
-    def __init__(self, serial_boot, kernel_image, kernel_address, json_images, no_crc):
+    def __init__(self, serial_boot, kernel_image, kernel_address, json_images, no_crc,
+                 window=1, compress=False):
         self.serial_boot = serial_boot
         assert not (kernel_image is not None and json_images is not None)
         self.mem_regions = {}
@@ -140,6 +220,8 @@ class LiteXTerm:
             self.boot_address = self.mem_regions[list(self.mem_regions.keys())[-1]]
             f.close()
         self.no_crc = no_crc
+        self.window = window
+        self.compress = compress
 
         self.reader_alive = False
         self.writer_alive = False
@@ -196,28 +278,37 @@ class LiteXTerm:
         with open(filename, "rb") as f:
             data = f.read()
         print("[LXTERM] Uploading {} to 0x{:08x} ({} bytes)...".format(filename, address, len(data)))
-        current_address = address
-        position = 0
         length = len(data)
-        start = time.time()
-        while len(data):
+        position = 0
+        def progress(n):
+            nonlocal position
+            position += n
             sys.stdout.write("|{}>{}| {}%\r".format('=' * (20*position//length),
                                                     ' ' * (20-20*position//length),
                                                     100*position//length))
             sys.stdout.flush()
-            frame = SFLFrame()
-            frame_data = data[:sfl_payload_length]
-            frame.cmd = sfl_cmd_load if not self.no_crc else sfl_cmd_load_no_crc
-            frame.payload = current_address.to_bytes(4, "big")
-            frame.payload += frame_data
-            if self.send_frame(frame) == 0:
+        cmd = sfl_cmd_load if not self.no_crc else sfl_cmd_load_no_crc
+        start = time.time()
+        frames = None
+        if self.compress:
+            frames = sfl_rle_frames(data, address)
+            # Older BIOSes do not know compressed frames: send the first one alone
+            reply = sfl_send_frames(self.port, frames[:1], progress=progress)
+            if reply == sfl_ack_success:
+                frames = frames[1:]
+            elif reply == sfl_ack_unknown:
+                print("[LXTERM] Compressed frames not supported by the device, sending uncompressed frames.")
+                frames = None
+            else:
+                print("[LXTERM] Got unknown reply '{}' from the device, aborting.".format(reply))
                 return
-            current_address += len(frame_data)
-            position += len(frame_data)
-            try:
-                data = data[sfl_payload_length:]
-            except:
-                data = []
+        if frames is None:
+            frames = sfl_load_frames(data, address, cmd)
+        acked = self.compress or not self.no_crc
+        reply = sfl_send_frames(self.port, frames, self.window, acked, progress)
+        if reply != sfl_ack_success:
+            print("[LXTERM] Got unknown reply '{}' from the device, aborting.".format(reply))
+            return
         end = time.time()
         elapsed = end - start
         print("[LXTERM] Upload complete ({0:.1f}KB/s).".format(length/(elapsed*1024)))
@@ -334,12 +425,15 @@ def _get_args():
     parser.add_argument("--kernel-adr", default="0x40000000", help="kernel address")
     parser.add_argument("--images", default=None, help="json description of the images to load to memory")
     parser.add_argument("--no-crc", default=False, action='store_true', help="disable CRC check (speedup serialboot)")
+    parser.add_argument("--window", default=1, help="number of frames sent ahead of their acknowledgement (speedup serialboot)")
+    parser.add_argument("--compress", default=False, action='store_true', help="send run-length encoded frames (speedup serialboot)")
     return parser.parse_args()
 
 
 def main():
     args = _get_args()
-    term = LiteXTerm(args.serial_boot, args.kernel, args.kernel_adr, args.images, args.no_crc)
+    term = LiteXTerm(args.serial_boot, args.kernel, args.kernel_adr, args.images, args.no_crc,
+                     int(args.window), args.compress)
     term.open(args.port, int(float(args.speed)))
     term.console.configure()
     term.start()
@@ -3,17 +3,66 @@
 
 import serial
 import struct
+import time
+from collections import deque
+
+
+class LinkStats:
+    """Traffic counters of a serial link"""
+    def __init__(self, baudrate):
+        # 8N1: 10 bits per byte in each direction
+        self.link_rate = baudrate/10
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.busy_time = 0.0
+
+    def update(self, written, read, elapsed):
+        self.bytes_written += written
+        self.bytes_read += read
+        self.busy_time += elapsed
+
+    def rates(self):
+        """Achieved bytes/s written and read while busy"""
+        if not self.busy_time:
+            return 0.0, 0.0
+        return self.bytes_written/self.busy_time, self.bytes_read/self.busy_time
+
+    def __repr__(self):
+        tx_rate, rx_rate = self.rates()
+        return ("{} bytes written, {} bytes read in {:.1f}s: "
+                "{:.0f} bytes/s tx, {:.0f} bytes/s rx ({:.0f}% of the {:.0f} bytes/s link rate)").format(
+            self.bytes_written, self.bytes_read, self.busy_time, tx_rate, rx_rate,
+            100*max(tx_rate, rx_rate)/self.link_rate, self.link_rate)
 
 
 class CommUART:
+    """Access a Wishbone bus through a UARTWishboneBridge
+
+    By default, commands are limited to 8 words and only one read is in
+    flight at a time, which works with any version of the bridge.
+
+    With ``pipelined=True``, the commands of a transfer are packed into
+    as few serial writes as possible, use the full 255-word length field,
+    and reads are sent without waiting for the replies of the previous
+    ones. The bridge buffers the commands it receives while it is sending
+    a reply in a FIFO: ``rx_fifo_depth`` must not exceed the depth of that
+    FIFO (see ``WishboneStreamingBridge``), which bounds the number of
+    bytes sent ahead of a pending reply.
+
+    Traffic counters are kept in ``stats``.
+    """
     msg_type = {
         "write": 0x01,
         "read":  0x02
     }
-    def __init__(self, port, baudrate=115200, debug=False):
+    def __init__(self, port, baudrate=115200, debug=False, pipelined=False, rx_fifo_depth=16):
         self.port = port
         self.baudrate = str(baudrate)
         self.debug = debug
+        self.pipelined = pipelined
+        self.rx_fifo_depth = rx_fifo_depth if pipelined else 0
+        self.max_length = 255 if pipelined else 8
+        self.stats = LinkStats(baudrate)
         self.port = serial.serial_for_url(port, baudrate)
 
     def open(self):
@@ -27,11 +76,11 @@ class CommUART:
         self.port.close()
         del self.port
 
-    def _read(self, length):
-        r = bytes()
-        while len(r) < length:
-            r += self.port.read(length - len(r))
-        return r
+    def _readinto(self, buf):
+        view = memoryview(buf)
+        pos = 0
+        while pos < len(view):
+            pos += self.port.readinto(view[pos:])
 
     def _write(self, data):
         remaining = len(data)
@@ -45,33 +94,96 @@ class CommUART:
         if self.port.inWaiting() > 0:
             self.port.read(self.port.inWaiting())
 
+    def _write_commands(self, addr, datas):
+        commands = []
+        for offset in range(0, len(datas), self.max_length):
+            chunk = datas[offset:offset + self.max_length]
+            commands.append((struct.pack(">BBI{}I".format(len(chunk)),
+                self.msg_type["write"], len(chunk), addr//4 + offset, *chunk), 0))
+        return commands
+
+    def _read_commands(self, addrs):
+        # consecutive words are read by a single command
+        commands = []
+        i = 0
+        while i < len(addrs):
+            length = 1
+            while (i + length < len(addrs) and length < self.max_length and
+                   addrs[i + length] == addrs[i] + 4*length):
+                length += 1
+            commands.append((struct.pack(">BBI", self.msg_type["read"], length, addrs[i]//4), length))
+            i += length
+        return commands
+
+    def _transfer(self, commands):
+        # Commands are (bytes, number of words read) pairs. They are sent in
+        # order, and a command is only sent once at most rx_fifo_depth bytes
+        # follow the oldest read that has not been answered yet. Returns the
+        # values read.
+        if not self.pipelined:
+            self._flush()
+        start = time.perf_counter()
+        total = 4*sum(length for command, length in commands)
+        replies = bytearray(total)
+        view = memoryview(replies)
+        received = 0
+        pending = deque()  # (bytes sent up to the read, reply length in bytes)
+        out = bytearray()
+        sent = 0
+        for command, length in commands:
+            while pending and sent + len(command) - pending[0][0] > self.rx_fifo_depth:
+                if out:
+                    self._write(out)
+                    out = bytearray()
+                _, reply_length = pending.popleft()
+                self._readinto(view[received:received + reply_length])
+                received += reply_length
+            out += command
+            sent += len(command)
+            if length:
+                pending.append((sent, 4*length))
+        if out:
+            self._write(out)
+        self._readinto(view[received:])
+        self.stats.update(sent, total, time.perf_counter() - start)
+        return list(struct.unpack(">{}I".format(total//4), replies))
+
     def read(self, addr, length=None):
-        self._flush()
-        data = []
         length_int = 1 if length is None else length
-        self._write([self.msg_type["read"], length_int])
-        self._write(list((addr//4).to_bytes(4, byteorder="big")))
-        for i in range(length_int):
-            value = int.from_bytes(self._read(4), "big")
-            if self.debug:
-                print("read {:08x} @ {:08x}".format(value, addr + 4*i))
-            if length is None:
-                return value
-            data.append(value)
-        return data
+        addrs = [addr + 4*i for i in range(length_int)]
+        datas = self._transfer(self._read_commands(addrs))
+        if self.debug:
+            for addr, value in zip(addrs, datas):
+                print("read {:08x} @ {:08x}".format(value, addr))
+        return datas[0] if length is None else datas
 
     def write(self, addr, data):
-        self._flush()
         data = data if isinstance(data, list) else [data]
-        length = len(data)
+        self._transfer(self._write_commands(addr, data))
+        if self.debug:
+            for i, value in enumerate(data):
+                print("write {:08x} @ {:08x}".format(value, addr + 4*i))
+
+    def burst(self, transactions):
+        """Run several transactions in a single transfer
+
+        Each transaction is a ``(write_addr, write_datas, read_addrs)`` tuple
+        (``write_datas`` and ``read_addrs`` may be ``None``), whose writes are
+        performed before its reads, as with ``RemoteClient.burst``.
+
+        Returns the list of values read by each transaction.
+        """
+        commands = []
+        for write_addr, write_datas, read_addrs in transactions:
+            if write_datas:
+                commands += self._write_commands(write_addr, write_datas)
+            if read_addrs:
+                commands += self._read_commands(read_addrs)
+        datas = self._transfer(commands)
+        r = []
         offset = 0
-        while length:
-            size = min(length, 8)
-            self._write([self.msg_type["write"], size])
-            self._write(list(((addr+offset)//4).to_bytes(4, byteorder="big")))
-            for i, value in enumerate(data[offset:offset+size]):
-                self._write(list(value.to_bytes(4, byteorder="big")))
-                if self.debug:
-                    print("write {:08x} @ {:08x}".format(value, addr + offset, 4*i))
-            offset += size
-            length -= size
+        for write_addr, write_datas, read_addrs in transactions:
+            n = len(read_addrs) if read_addrs else 0
+            r.append(datas[offset:offset + n])
+            offset += n
+        return r
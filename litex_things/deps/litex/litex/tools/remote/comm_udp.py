@@ -37,12 +37,11 @@ class CommUDP:
 
         packet = EtherbonePacket()
         packet.records = [record]
-        packet.encode()
-        self.tx_socket.sendto(bytes(packet), (self.server, self.port))
+        self.tx_socket.sendto(packet.to_bytes(), (self.server, self.port))
 
         datas, dummy = self.rx_socket.recvfrom(8192)
-        packet = EtherbonePacket(datas)
-        packet.decode()
+        packet = EtherbonePacket()
+        packet.from_bytes(datas)
         datas = packet.records.pop().writes.get_datas()
         if self.debug:
             for i, value in enumerate(datas):
@@ -58,8 +57,7 @@ class CommUDP:
 
         packet = EtherbonePacket()
         packet.records = [record]
-        packet.encode()
-        self.tx_socket.sendto(bytes(packet), (self.server, self.port))
+        self.tx_socket.sendto(packet.to_bytes(), (self.server, self.port))
 
         if self.debug:
             for i, value in enumerate(datas):
@@ -1,9 +1,18 @@
 # This file is Copyright (c) 2019 Sean Cross <sean@xobs.io>
 # License: BSD
 
-import usb.core
+import array
+import struct
 import time
 
+try:
+    import usb.core
+    USBError = usb.core.USBError
+except ImportError:
+    # pyusb is only needed to talk to real devices (see LoopbackDevice)
+    usb = None
+    USBError = IOError
+
 # Wishbone USB Protocol Bridge
 # ============================
 #
@@ -50,21 +59,43 @@ import time
 # We reuse these two 16-bit values as a single 32-bit ADDRESS packet.  Note that
 # USB is big endian.
 #
-# Finally, the last two bytes indicate the length of the transaction.  Since
-# we only support 32-bit reads and writes, this is always 4.  On big endian
-# USB, this has the value {04, 00}.
+# Finally, the last two bytes indicate the length of the transaction in bytes,
+# {04, 00} for a single 32-bit word.  Recent bridges accept longer transfers:
+# consecutive words are then read or written at incrementing addresses, in
+# packets of up to 64 bytes.  Older bridges always transfer a single word, so
+# a read of more than one word returns only 4 bytes, which is how CommUSB
+# detects them.
 
 class CommUSB:
-    def __init__(self, vid=None, pid=None, max_retries=10, debug=False):
+    """Access a Wishbone bus through the USB Wishbone bridge
+
+    Transfers of several words are split in bursts of up to ``max_burst``
+    words per control request (4096 bytes, the largest control transfer
+    Linux accepts). ``burst=None`` checks whether the bridge supports them
+    with a two-word read at ``probe_addr`` the first time it is needed, and
+    falls back to one request per word if it does not.
+
+    ``device`` can be passed instead of a vid/pid pair to use an object with
+    pyusb's ``ctrl_transfer`` method, such as a ``LoopbackDevice``.
+    """
+    def __init__(self, vid=None, pid=None, max_retries=10, debug=False,
+                 device=None, burst=None, max_burst=1024, probe_addr=0):
         self.vid = vid
         self.pid = pid
         self.debug = debug
         self.max_retries = max_retries
         self.MAX_RECURSION_COUNT = 5
+        self.device = device
+        self.burst = burst
+        self.max_burst = max_burst
+        self.probe_addr = probe_addr
 
     def open(self):
         if hasattr(self, "dev"):
             return
+        if self.device is not None:
+            self.dev = self.device
+            return True
         for t in range(self.max_retries):
             args = {}
             if self.vid is not None:
@@ -87,68 +118,122 @@ class CommUSB:
             return
         del self.dev
 
+    def _burst_supported(self):
+        if self.burst is None:
+            values = self.usb_read_burst(self.probe_addr, 2)
+            if values is None:
+                return False
+            self.burst = len(values) == 2
+            if self.debug:
+                print("burst transfers {}supported".format("" if self.burst else "not "))
+        return self.burst
+
     def read(self, addr, length=None):
         data = []
         length_int = 1 if length is None else length
-        for i in range(length_int):
-            value = self.usb_read(addr)
+        chunk = self.max_burst if length_int > 1 and self._burst_supported() else 1
+        while len(data) < length_int:
+            n = min(chunk, length_int - len(data))
+            values = self.usb_read_burst(addr + 4*len(data), n) or []
             # Note that sometimes, the value ends up as None when the device
             # disconnects during a transaction.  Paper over this fact by
             # replacing it with a sentinal.
-            if value is None:
-                value = 0xffffffff
-            if self.debug:
-                print("read {:08x} @ {:08x}".format(value, addr))
-            if length is None:
-                return value
-            data.append(value)
-        return data
+            data += values[:n] + [0xffffffff]*(n - len(values))
+        if self.debug:
+            for i, value in enumerate(data):
+                print("read {:08x} @ {:08x}".format(value, addr + 4*i))
+        return data[0] if length is None else data
 
-    def usb_read(self, addr, depth=0):
+    def _ctrl_transfer(self, bmRequestType, addr, data_or_wLength, depth=0):
         try:
-            value = self.dev.ctrl_transfer(bmRequestType=0xc3,
+            value = self.dev.ctrl_transfer(bmRequestType=bmRequestType,
                         bRequest=0x00,
                         wValue=addr & 0xffff,
                         wIndex=(addr >> 16) & 0xffff,
-                        data_or_wLength=4)
+                        data_or_wLength=data_or_wLength,
+                        timeout=None)
             if value is None:
                 raise TypeError
-            return int.from_bytes(value, byteorder="little")
-        except usb.core.USBError as e:
+            return value
+        except USBError as e:
             if e.errno == 13:
                 print("Access Denied. Maybe try using sudo?")
-            self.close()
-            self.open()
-            if depth < self.MAX_RECURSION_COUNT:
-                return self.usb_read(addr, depth+1)
         except TypeError:
-            self.close()
-            self.open()
-            if depth < self.MAX_RECURSION_COUNT:
-                return self.usb_read(addr, depth+1)
+            pass
+        self.close()
+        self.open()
+        if depth < self.MAX_RECURSION_COUNT:
+            return self._ctrl_transfer(bmRequestType, addr, data_or_wLength, depth+1)
+
+    def usb_read_burst(self, addr, length):
+        """Read up to ``length`` consecutive words in a single request"""
+        value = self._ctrl_transfer(0xc3, addr, 4*length)
+        if value is None:
+            return None
+        value = bytes(value)
+        return list(struct.unpack("<{}I".format(len(value)//4), value[:len(value)//4*4]))
+
+    def usb_read(self, addr):
+        values = self.usb_read_burst(addr, 1)
+        return values[0] if values else None
 
     def write(self, addr, data):
         data = data if isinstance(data, list) else [data]
-        length = len(data)
-        for i, value in enumerate(data):
-            self.usb_write(addr, value)
-            if self.debug:
+        chunk = self.max_burst if len(data) > 1 and self._burst_supported() else 1
+        for offset in range(0, len(data), chunk):
+            self.usb_write_burst(addr + 4*offset, data[offset:offset + chunk])
+        if self.debug:
+            for i, value in enumerate(data):
                 print("write {:08x} @ {:08x}".format(value, addr + 4*i))
 
-    def usb_write(self, addr, value, depth=0):
-        try:
-            value = self.dev.ctrl_transfer(bmRequestType=0x43, bRequest=0x00,
-                    wValue=addr & 0xffff,
-                    wIndex=(addr >> 16) & 0xffff,
-                    data_or_wLength=bytes([(value >> 0) & 0xff,
-                                           (value >> 8) & 0xff,
-                                           (value >> 16) & 0xff,
-                                           (value >> 24) & 0xff]
-                                          ), timeout=None)
-        except usb.core.USBError as e:
-            if e.errno == 13:
-                print("Access Denied. Maybe try using sudo?")
-            self.close()
-            self.open()
-            if depth < self.MAX_RECURSION_COUNT:
-                return self.usb_write(addr, value, depth+1)
+    def usb_write_burst(self, addr, values):
+        """Write consecutive words in a single request"""
+        return self._ctrl_transfer(0x43, addr, struct.pack("<{}I".format(len(values)), *values))
+
+    def usb_write(self, addr, value):
+        return self.usb_write_burst(addr, [value])
+
+
+class LoopbackDevice:
+    """Stand-in for a USB device with a Wishbone bridge
+
+    Answers the control requests of CommUSB from ``mem``, a dictionary of
+    words indexed by byte address, so that it can be used without hardware.
+    ``burst=False`` behaves like the bridges of older bitstreams, which
+    transfer a single word per request. Each request takes ``latency``
+    seconds plus the time needed to transfer its data at ``byte_rate``
+    bytes/s, as a rough model of the USB round trips, and is counted in
+    ``transfers``.
+    """
+    def __init__(self, burst=True, latency=0.0, byte_rate=None):
+        self.burst = burst
+        self.latency = latency
+        self.byte_rate = byte_rate
+        self.mem = {}
+        self.transfers = 0
+
+    def _wait(self, length):
+        delay = self.latency
+        if self.byte_rate:
+            delay += length/self.byte_rate
+        if delay:
+            time.sleep(delay)
+
+    def ctrl_transfer(self, bmRequestType, bRequest, wValue=0, wIndex=0,
+                      data_or_wLength=None, timeout=None):
+        addr = (wIndex << 16) | wValue
+        self.transfers += 1
+        if bmRequestType == 0xc3:
+            length = max(data_or_wLength//4, 1) if self.burst else 1
+            data = struct.pack("<{}I".format(length),
+                *[self.mem.get(addr + 4*i, 0) for i in range(length)])
+            self._wait(len(data))
+            return array.array("B", data)
+        elif bmRequestType == 0x43:
+            data = bytes(data_or_wLength)
+            length = len(data)//4 if self.burst else 1
+            for i, value in enumerate(struct.unpack("<{}I".format(length), data[:4*length])):
+                self.mem[addr + 4*i] = value
+            self._wait(len(data))
+            return len(data)
+        raise ValueError("unsupported request type 0x{:02x}".format(bmRequestType))
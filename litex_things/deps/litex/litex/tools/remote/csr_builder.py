@@ -32,9 +32,18 @@ class CSRRegister:
         self.mode = mode
 
     def read(self):
-        if self.mode not in ["rw", "ro"]:
-            raise KeyError(self.name + "register not readable")
-        datas = self.readfn(self.addr, length=self.length)
+        self._check_mode("ro", "readable")
+        return self._from_datas(self.readfn(self.addr, length=self.length))
+
+    def write(self, value):
+        self._check_mode("wo", "writable")
+        self.writefn(self.addr, self._to_datas(value))
+
+    def _check_mode(self, mode, what):
+        if self.mode not in ["rw", mode]:
+            raise KeyError(self.name + "register not " + what)
+
+    def _from_datas(self, datas):
         if isinstance(datas, int):
             return datas
         else:
@@ -44,13 +53,22 @@ class CSRRegister:
                 data |= datas[i]
             return data
 
-    def write(self, value):
-        if self.mode not in ["rw", "wo"]:
-            raise KeyError(self.name + "register not writable")
+    def _to_datas(self, value):
         datas = []
         for i in range(self.length):
             datas.append((value >> ((self.length-1-i)*self.data_width)) & (2**self.data_width-1))
-        self.writefn(self.addr, datas)
+        return datas
+
+
+class AsyncCSRRegister(CSRRegister):
+    """CSRRegister with coroutine ``readfn``, ``writefn``, ``read`` and ``write``"""
+    async def read(self):
+        self._check_mode("ro", "readable")
+        return self._from_datas(await self.readfn(self.addr, length=self.length))
+
+    async def write(self, value):
+        self._check_mode("wo", "writable")
+        await self.writefn(self.addr, self._to_datas(value))
 
 
 class CSRMemoryRegion:
@@ -60,6 +78,8 @@ class CSRMemoryRegion:
 
 
 class CSRBuilder:
+    register_class = CSRRegister
+
     def __init__(self, comm, csr_csv, csr_data_width=None):
         self.items = self.get_csr_items(csr_csv)
         self.constants = self.build_constants()
@@ -98,7 +118,7 @@ class CSRBuilder:
             if group == "csr_register":
                 addr = int(addr.replace("0x", ""), 16)
                 length = int(length)
-                d[name] = CSRRegister(readfn, writefn, name, addr, length, self.csr_data_width, mode)
+                d[name] = self.register_class(readfn, writefn, name, addr, length, self.csr_data_width, mode)
         return CSRElements(d)
 
     def build_constants(self):
@@ -62,12 +62,46 @@ def get_field_data(field, datas):
     return (v >> field.offset) & (2**field.width-1)
 
 
+# Packets are encoded and decoded with struct, a whole header or word list
+# per call. Packet objects are still lists of bytes for compatibility, filled
+# or read in a single operation.
+
+_packet_header = struct.Struct(">HBBxxxx")
+_record_header = struct.Struct(">BBBB")
+
+# flag bits of the first byte of a record header
+_record_flags = [(name, field.offset) for name, field in
+                 sorted(etherbone_record_header_fields.items()) if field.byte == 0]
+
+
+def _words(n):
+    return struct.Struct(">{}I".format(n))
+
+
+_words_structs = [_words(n) for n in range(257)]
+
+
+def _pack_words(words):
+    try:
+        s = _words_structs[len(words)]
+    except IndexError:
+        s = _words(len(words))
+    return s.pack(*words)
+
+
+def _unpack_words(data, offset, n):
+    try:
+        s = _words_structs[n]
+    except IndexError:
+        s = _words(n)
+    return s.unpack_from(data, offset)
+
+
 class Packet(list):
     def __init__(self, init=[]):
         self.ongoing = False
         self.done = False
-        for data in init:
-            self.append(data)
+        self.extend(init)
 
 
 class EtherboneWrite:
@@ -90,43 +124,39 @@ class EtherboneWrites(Packet):
     def __init__(self, init=[], base_addr=0, datas=[]):
         Packet.__init__(self, init)
         self.base_addr = base_addr
-        self.writes = []
+        self.datas = list(datas)
         self.encoded = init != []
-        for data in datas:
-            self.add(EtherboneWrite(data))
+
+    @property
+    def writes(self):
+        return [EtherboneWrite(data) for data in self.datas]
+
+    @writes.setter
+    def writes(self, writes):
+        self.datas = [write.data for write in writes]
 
     def add(self, write):
-        self.writes.append(write)
+        self.datas.append(write.data)
 
     def get_datas(self):
-        datas = []
-        for write in self.writes:
-            datas.append(write.data)
-        return datas
+        return list(self.datas)
+
+    def to_bytes(self):
+        return _pack_words([self.base_addr] + self.datas)
 
     def encode(self):
         if self.encoded:
             raise ValueError
-        for byte in split_bytes(self.base_addr, 4):
-            self.append(byte)
-        for write in self.writes:
-            for byte in split_bytes(write.data, 4):
-                self.append(byte)
+        self.extend(self.to_bytes())
         self.encoded = True
 
     def decode(self):
         if not self.encoded:
             raise ValueError
-        base_addr = []
-        for i in range(4):
-            base_addr.append(self.pop(0))
-        self.base_addr = merge_bytes(base_addr)
-        self.writes = []
-        while len(self) != 0:
-            write = []
-            for i in range(4):
-                write.append(self.pop(0))
-            self.writes.append(EtherboneWrite(merge_bytes(write)))
+        words = _unpack_words(bytes(self), 0, len(self)//4)
+        self.base_addr = words[0]
+        self.datas = list(words[1:])
+        del self[:]
         self.encoded = False
 
     def __repr__(self):
@@ -142,43 +172,39 @@ class EtherboneReads(Packet):
     def __init__(self, init=[], base_ret_addr=0, addrs=[]):
         Packet.__init__(self, init)
         self.base_ret_addr = base_ret_addr
-        self.reads = []
+        self.addrs = list(addrs)
         self.encoded = init != []
-        for addr in addrs:
-            self.add(EtherboneRead(addr))
+
+    @property
+    def reads(self):
+        return [EtherboneRead(addr) for addr in self.addrs]
+
+    @reads.setter
+    def reads(self, reads):
+        self.addrs = [read.addr for read in reads]
 
     def add(self, read):
-        self.reads.append(read)
+        self.addrs.append(read.addr)
 
     def get_addrs(self):
-        addrs = []
-        for read in self.reads:
-            addrs.append(read.addr)
-        return addrs
+        return list(self.addrs)
+
+    def to_bytes(self):
+        return _pack_words([self.base_ret_addr] + self.addrs)
 
     def encode(self):
         if self.encoded:
             raise ValueError
-        for byte in split_bytes(self.base_ret_addr, 4):
-            self.append(byte)
-        for read in self.reads:
-            for byte in split_bytes(read.addr, 4):
-                self.append(byte)
+        self.extend(self.to_bytes())
         self.encoded = True
 
     def decode(self):
         if not self.encoded:
             raise ValueError
-        base_ret_addr = []
-        for i in range(4):
-            base_ret_addr.append(self.pop(0))
-        self.base_ret_addr = merge_bytes(base_ret_addr)
-        self.reads = []
-        while len(self) != 0:
-            read = []
-            for i in range(4):
-                read.append(self.pop(0))
-            self.reads.append(EtherboneRead(merge_bytes(read)))
+        words = _unpack_words(bytes(self), 0, len(self)//4)
+        self.base_ret_addr = words[0]
+        self.addrs = list(words[1:])
+        del self[:]
         self.encoded = False
 
     def __repr__(self):
@@ -206,68 +232,53 @@ class EtherboneRecord(Packet):
         self.rcount = 0
         self.encoded = init != []
 
+    def from_bytes(self, data, offset=0):
+        """Decode the record at ``offset`` in ``data``, return the offset after it"""
+        flags, self.byte_enable, self.wcount, self.rcount = \
+            _record_header.unpack_from(data, offset)
+        for name, bit in _record_flags:
+            setattr(self, name, (flags >> bit) & 1)
+        offset += _record_header.size
+        self.writes = None
+        if self.wcount:
+            words = _unpack_words(data, offset, self.wcount + 1)
+            self.writes = EtherboneWrites(base_addr=words[0])
+            self.writes.datas = list(words[1:])
+            offset += 4*(self.wcount + 1)
+        self.reads = None
+        if self.rcount:
+            words = _unpack_words(data, offset, self.rcount + 1)
+            self.reads = EtherboneReads(base_ret_addr=words[0])
+            self.reads.addrs = list(words[1:])
+            offset += 4*(self.rcount + 1)
+        self.encoded = False
+        return offset
 
-    def get_writes(self):
-        if self.wcount == 0:
-            return None
-        else:
-            writes = []
-            for i in range((self.wcount+1)*4):
-                writes.append(self.pop(0))
-            return EtherboneWrites(writes)
-
-    def get_reads(self):
-        if self.rcount == 0:
-            return None
-        else:
-            reads = []
-            for i in range((self.rcount+1)*4):
-                reads.append(self.pop(0))
-            return EtherboneReads(reads)
+    def to_bytes(self):
+        data = b""
+        if self.writes is not None:
+            self.wcount = len(self.writes.datas)
+            data += self.writes.to_bytes()
+        if self.reads is not None:
+            self.rcount = len(self.reads.addrs)
+            data += self.reads.to_bytes()
+        flags = 0
+        for name, bit in _record_flags:
+            flags |= getattr(self, name) << bit
+        return _record_header.pack(flags, self.byte_enable, self.wcount, self.rcount) + data
 
     def decode(self):
         if not self.encoded:
             raise ValueError
-        header = []
-        for byte in self[:etherbone_record_header.length]:
-            header.append(self.pop(0))
-        for k, v in sorted(etherbone_record_header.fields.items()):
-            setattr(self, k, get_field_data(v, header))
-        self.writes = self.get_writes()
-        if self.writes is not None:
-            self.writes.decode()
-        self.reads = self.get_reads()
-        if self.reads is not None:
-            self.reads.decode()
-        self.encoded = False
-
-    def set_writes(self, writes):
-        self.wcount = len(writes.writes)
-        writes.encode()
-        for byte in writes:
-            self.append(byte)
-
-    def set_reads(self, reads):
-        self.rcount = len(reads.reads)
-        reads.encode()
-        for byte in reads:
-            self.append(byte)
+        data = bytes(self)
+        offset = self.from_bytes(data)
+        # leave the following records
+        self[:] = data[offset:]
 
     def encode(self):
         if self.encoded:
             raise ValueError
-        if self.writes is not None:
-            self.set_writes(self.writes)
-        if self.reads is not None:
-            self.set_reads(self.reads)
-        header = 0
-        for k, v in sorted(etherbone_record_header.fields.items()):
-            value = merge_bytes(split_bytes(getattr(self, k),
-                                            math.ceil(v.width/8)),
-                                            "little")
-            header += (value << v.offset+(v.byte*8))
-        for d in split_bytes(header, etherbone_record_header.length):
-            self.insert(0, d)
+        self[:0] = self.to_bytes()
         self.encoded = True
 
     def __repr__(self, n=0):
@@ -300,44 +311,50 @@ class EtherbonePacket(Packet):
         self.pr = 0
         self.pf = 0
 
+    def from_bytes(self, data):
+        """Decode a packet from ``data`` (any bytes-like object)"""
+        magic, flags, sizes = _packet_header.unpack_from(data)
+        self.magic = magic
+        self.version = flags >> 4
+        self.nr = (flags >> 2) & 1
+        self.pr = (flags >> 1) & 1
+        self.pf = flags & 1
+        self.addr_size = sizes >> 4
+        self.port_size = sizes & 0xf
+        self.records = []
+        offset = _packet_header.size
+        while offset < len(data):
+            record = EtherboneRecord()
+            offset = record.from_bytes(data, offset)
+            self.records.append(record)
+        self.encoded = False
+
+    def to_bytes(self):
+        flags = (self.version << 4) | (self.nr << 2) | (self.pr << 1) | self.pf
+        sizes = (self.addr_size << 4) | self.port_size
+        return b"".join([_packet_header.pack(self.magic, flags, sizes)] +
+                        [record.to_bytes() for record in self.records])
+
     def get_records(self):
         records = []
-        done = False
-        payload = self
-        while len(payload) != 0:
-            record = EtherboneRecord(payload)
-            record.decode()
+        data = bytes(self)
+        offset = 0
+        while offset < len(data):
+            record = EtherboneRecord()
+            offset = record.from_bytes(data, offset)
             records.append(record)
-            payload = record[:]
         return records
 
     def decode(self):
         if not self.encoded:
             raise ValueError
-        header = []
-        for byte in self[:etherbone_packet_header.length]:
-            header.append(self.pop(0))
-        for k, v in sorted(etherbone_packet_header.fields.items()):
-            setattr(self, k, get_field_data(v, header))
-        self.records = self.get_records()
-        self.encoded = False
-
-    def set_records(self, records):
-        for record in records:
-            record.encode()
-            for byte in record:
-                self.append(byte)
+        self.from_bytes(bytes(self))
+        del self[:]
 
     def encode(self):
         if self.encoded:
             raise ValueError
-        self.set_records(self.records)
-        header = 0
-        for k, v in sorted(etherbone_packet_header.fields.items()):
-            value = merge_bytes(split_bytes(getattr(self, k), math.ceil(v.width/8)), "little")
-            header += (value << v.offset+(v.byte*8))
-        for d in split_bytes(header, etherbone_packet_header.length):
-            self.insert(0, d)
+        self[:] = self.to_bytes()
         self.encoded = True
 
     def __repr__(self):
@@ -354,26 +371,69 @@ class EtherbonePacket(Packet):
         return r
 
 
+def record_payload_length(wcount, rcount):
+    # writes and reads each start with a base address
+    length = 0
+    if wcount:
+        length += 4*(wcount + 1)
+    if rcount:
+        length += 4*(rcount + 1)
+    return length
+
+
 class EtherboneIPC:
     def send_packet(self, socket, packet):
         socket.sendall(bytes(packet))
 
+    def _receive(self, socket, length):
+        data = bytes()
+        while len(data) < length:
+            chunk = socket.recv(length - len(data))
+            if len(chunk) == 0:
+                return None
+            data += chunk
+        return data
+
     def receive_packet(self, socket):
         header_length = etherbone_packet_header_length + etherbone_record_header_length
-        packet = bytes()
-        while len(packet) < header_length:
-            chunk = socket.recv(header_length - len(packet))
-            if len(chunk) == 0:
-                return 0
-            else:
-                packet += chunk
+        packet = self._receive(socket, header_length)
+        if packet is None:
+            return 0
         wcount, rcount = struct.unpack(">BB", packet[header_length-2:])
-        counts = wcount + rcount
-        packet_size = header_length + 4*(counts + 1)
-        while len(packet) < packet_size:
-            chunk = socket.recv(packet_size - len(packet))
-            if len(chunk) == 0:
-                return 0
-            else:
-                packet += chunk
-        return packet
+        payload = self._receive(socket, record_payload_length(wcount, rcount))
+        if payload is None:
+            return 0
+        return packet + payload
+
+    def receive_records(self, socket):
+        """Receive the records of a stream of packets
+
+        Packets may hold several records. Since the stream carries no packet
+        length, a record is told apart from the header of the next packet by
+        its first bytes: the packet magic is not a valid record header
+        (reserved flag bit 3 set). Each record is yielded as a single-record
+        packet, as ``receive_packet`` would return it, until the connection
+        is closed.
+        """
+        magic = etherbone_magic.to_bytes(2, "big")
+        header = None
+        while True:
+            start = self._receive(socket, 2)
+            while start == magic:
+                rest = self._receive(socket, etherbone_packet_header_length - 2)
+                if rest is None:
+                    return
+                header = start + rest
+                start = self._receive(socket, 2)
+            if start is None:
+                return
+            if header is None:
+                raise ValueError("Etherbone stream does not start with a packet header")
+            counts = self._receive(socket, etherbone_record_header_length - 2)
+            if counts is None:
+                return
+            wcount, rcount = struct.unpack(">BB", counts)
+            payload = self._receive(socket, record_payload_length(wcount, rcount))
+            if payload is None:
+                return
+            yield header + start + counts + payload
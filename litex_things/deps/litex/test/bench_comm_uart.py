@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+# CommUART throughput: python3 -m test.bench_comm_uart [--port /dev/ttyUSBx --addr 0x...]
+#
+# Without a port, runs against the Python model of the bridge from
+# test.test_comm_uart, which has no notion of link rate: the figures then
+# only compare the number of round trips of both modes.
+
+import argparse
+
+from litex.tools.remote.comm_uart import CommUART
+
+
+def run(comm, addr, length):
+    values = list(range(length))
+    comm.write(addr, values)
+    assert comm.read(addr, length=length) == values
+    # scattered single-word accesses, as when polling CSRs
+    transactions = [(None, None, [addr + 8*i]) for i in range(length//2)]
+    assert comm.burst(transactions) == [[2*i] for i in range(length//2)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", default=None, help="UART port of the bridge")
+    parser.add_argument("--baudrate", default=115200, help="UART baudrate")
+    parser.add_argument("--addr", default="0x10000000", help="Base address of a RAM on the bus")
+    parser.add_argument("--length", default=1024, help="Number of words to transfer")
+    parser.add_argument("--fifo-depth", default=16, help="Depth of the receive FIFO of the bridge")
+    args = parser.parse_args()
+
+    for pipelined in False, True:
+        if args.port is None:
+            from test.test_comm_uart import BridgeModel
+            model = BridgeModel()
+            model.start()
+            port = model.url
+        else:
+            port = args.port
+        comm = CommUART(port, int(float(args.baudrate)),
+                        pipelined=pipelined, rx_fifo_depth=int(args.fifo_depth))
+        try:
+            run(comm, int(args.addr, 0), int(args.length))
+        finally:
+            comm.close()
+        print("{}: {}".format("pipelined" if pipelined else "default  ", comm.stats))
+
+
+if __name__ == "__main__":
+    main()
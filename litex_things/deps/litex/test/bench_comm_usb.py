@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# CommUSB throughput: python3 -m test.bench_comm_usb [--vid 0x... --pid 0x... --addr 0x...]
+#
+# Without a vid/pid, runs against a LoopbackDevice that takes --latency
+# seconds per control request and transfers --byte-rate bytes/s, a rough
+# model of a full speed device behind libusb.
+
+import argparse
+import time
+
+from litex.tools.remote.comm_usb import CommUSB, LoopbackDevice
+
+
+def run(comm, addr, length):
+    values = list(range(length))
+    start = time.perf_counter()
+    comm.write(addr, values)
+    assert comm.read(addr, length=length) == values
+    return 2*4*length/(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vid", default=None, help="USB vendor ID of the device")
+    parser.add_argument("--pid", default=None, help="USB product ID of the device")
+    parser.add_argument("--addr", default="0x10000000", help="Base address of a RAM on the bus")
+    parser.add_argument("--length", default=4096, help="Number of words to transfer")
+    parser.add_argument("--latency", default=1e-3, help="Round trip time of the loopback device (s)")
+    parser.add_argument("--byte-rate", default=1e6, help="Data rate of the loopback device (bytes/s)")
+    args = parser.parse_args()
+
+    for burst in False, True:
+        if args.vid is None:
+            device = LoopbackDevice(latency=float(args.latency), byte_rate=float(args.byte_rate))
+            comm = CommUSB(device=device, burst=burst)
+        else:
+            comm = CommUSB(vid=int(args.vid, 0), pid=int(args.pid, 0), burst=burst)
+        comm.open()
+        try:
+            rate = run(comm, int(args.addr, 0), int(args.length))
+        finally:
+            comm.close()
+        print("{}: {:.0f} bytes/s".format("burst     " if burst else "word/word ", rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+# Etherbone codec microbenchmark: python3 -m test.bench_etherbone
+
+import timeit
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
+from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+
+
+def make_packet(n):
+    record = EtherboneRecord()
+    record.writes = EtherboneWrites(base_addr=0x1000, datas=list(range(n)))
+    record.reads = EtherboneReads(addrs=[4*i for i in range(n)])
+    packet = EtherbonePacket()
+    packet.records = [record]
+    return packet
+
+
+def main():
+    for n in 1, 64, 255:
+        packet = make_packet(n)
+        data = packet.to_bytes()
+        def encode():
+            make_packet(n).to_bytes()
+        def decode():
+            EtherbonePacket().from_bytes(data)
+        def legacy_decode():
+            EtherbonePacket(data).decode()
+        for name, fn in ("encode", encode), ("decode", decode), ("list decode", legacy_decode):
+            number, total = timeit.Timer(fn).autorange()
+            print("{:3d} words, {:12s}: {:8.2f} us".format(n, name, 1e6*total/number))
+
+
+if __name__ == "__main__":
+    main()
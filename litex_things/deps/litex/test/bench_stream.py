@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# Stream/packet elaboration and simulation time: python3 -m test.bench_stream [--packets N]
+#
+# Runs the gearbox test, then loops packets through a Packetizer, 32 to 8
+# and 8 to 32-bit Converters and a Depacketizer.
+
+import argparse
+import random
+import time
+
+from migen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.stream_packet import Header, HeaderField, Packetizer, Depacketizer
+from litex.soc.interconnect.stream_sim import Packet, PacketStreamer, PacketLogger
+
+from test.test_gearbox import GearboxDUT, data_generator, data_checker
+
+
+_header = Header({
+    "dst":    HeaderField(0, 0, 16),
+    "src":    HeaderField(2, 0, 16),
+    "length": HeaderField(4, 0, 32)},
+    length=8)
+_user_description = stream.EndpointDescription([("data", 32)], _header.get_layout())
+_wire_description = stream.EndpointDescription([("data", 32)])
+
+
+class PacketDUT(Module):
+    def __init__(self):
+        self.submodules.streamer = PacketStreamer(_user_description)
+        self.submodules.packetizer = Packetizer(_user_description, _wire_description, _header)
+        self.submodules.down = stream.Converter(32, 8)
+        self.submodules.up = stream.Converter(8, 32)
+        self.submodules.depacketizer = Depacketizer(_wire_description, _user_description, _header)
+        self.submodules.logger = PacketLogger(_user_description)
+        self.submodules.pipeline = stream.Pipeline(self.streamer, self.packetizer, self.down,
+                                                   self.up, self.depacketizer, self.logger)
+
+
+def packet_loopback(n_packets):
+    prng = random.Random(42)
+    dut = PacketDUT()
+    packets = [Packet([prng.randrange(2**32) for i in range(prng.randrange(1, 32))])
+               for n in range(n_packets)]
+    received = []
+
+    def generator():
+        for packet in packets:
+            yield from dut.streamer.send_blocking(packet)
+
+    def checker():
+        for packet in packets:
+            yield from dut.logger.receive()
+            received.append(list(dut.logger.packet))
+
+    run_simulation(dut, [generator(), checker(), dut.streamer.generator(), dut.logger.generator()])
+    assert received == [list(p) for p in packets]
+
+
+def gearbox(n_words):
+    prng = random.Random(42)
+    dut = GearboxDUT()
+    datas = [prng.randrange(2**20) for i in range(n_words)]
+    run_simulation(dut, [data_generator(dut, dut.gearbox0, datas),
+                         data_checker(dut, dut.gearbox1, datas)])
+    assert dut.errors == 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packets", default=50, type=int, help="number of packets")
+    parser.add_argument("--words", default=512, type=int, help="number of gearbox words")
+    args = parser.parse_args()
+
+    for name, fn, n in ("gearbox", gearbox, args.words), ("packets", packet_loopback, args.packets):
+        start = time.perf_counter()
+        fn(n)
+        print("{}: {:.2f}s".format(name, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from migen import *
+
+from litex.build.generic_platform import Pins
+from litex.build.lattice import LatticePlatform
+from litex.build.cache import BuildCache
+
+
+_io = [
+    ("clk12", 0, Pins("35")),
+    ("user_led", 0, Pins("39")),
+]
+
+# Stand-ins for the tools, logging their runs to $STUB_LOG
+_stub_tools = {
+    "yosys": "cat top.ys top.v > top.json\necho report > top.rpt",
+    "nextpnr-ice40": "cat top.json top.pcf top_pre_pack.py > top.txt",
+    "icepack": "cat \"$1\" > \"$2\"",
+}
+
+
+class Platform(LatticePlatform):
+    def __init__(self):
+        LatticePlatform.__init__(self, "ice40-up5k-sg48", _io, toolchain="icestorm")
+
+
+class Blinky(Module):
+    def __init__(self, platform, width):
+        self.clock_domains.cd_sys = ClockDomain("sys", reset_less=True)
+        self.comb += self.cd_sys.clk.eq(platform.request("clk12"))
+        counter = Signal(width)
+        self.sync += counter.eq(counter + 1)
+        self.comb += platform.request("user_led").eq(counter[-1])
+
+
+class TestBuildCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        # builds change directory
+        self.addCleanup(os.chdir, os.getcwd())
+        self.bin_dir = os.path.join(self.tmp, "bin")
+        os.mkdir(self.bin_dir)
+        for name, command in _stub_tools.items():
+            self.write_tool(name, command)
+        self.log = os.path.join(self.tmp, "log")
+        environ = dict(os.environ)
+        self.addCleanup(os.environ.update, environ)
+        self.addCleanup(os.environ.clear)
+        os.environ["PATH"] = self.bin_dir + os.pathsep + os.environ["PATH"]
+        os.environ["STUB_LOG"] = self.log
+        os.environ.pop("LITEX_BUILD_CACHE", None)
+
+    def write_tool(self, name, command):
+        filename = os.path.join(self.bin_dir, name)
+        with open(filename, "w") as f:
+            f.write("#!/bin/sh\necho {} >> \"$STUB_LOG\"\n{}\n".format(name, command))
+        os.chmod(filename, 0o755)
+
+    def runs(self):
+        if not os.path.exists(self.log):
+            return 0
+        with open(self.log) as f:
+            return len(f.read().split())
+
+    def build(self, build_dir, width=24, **kwargs):
+        platform = Platform()
+        build_dir = os.path.join(self.tmp, build_dir)
+        platform.build(Blinky(platform, width), build_dir=build_dir, **kwargs)
+        with open(os.path.join(build_dir, "top.bin")) as f:
+            return f.read()
+
+    def test_hit(self):
+        cache = os.path.join(self.tmp, "cache")
+        bitstream = self.build("a", build_cache=cache)
+        self.assertEqual(self.runs(), 3)
+        self.assertEqual(self.build("b", build_cache=cache), bitstream)
+        self.assertEqual(self.runs(), 3)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "b", "top.rpt")))
+
+        os.environ["LITEX_BUILD_CACHE"] = cache
+        self.assertEqual(self.build("c"), bitstream)
+        self.assertEqual(self.runs(), 3)
+
+    def test_miss(self):
+        cache = os.path.join(self.tmp, "cache")
+        self.build("a", build_cache=cache)
+        self.build("b", width=20, build_cache=cache)
+        self.assertEqual(self.runs(), 6)
+        self.build("c", synth_opts="-dsp", build_cache=cache)
+        self.assertEqual(self.runs(), 9)
+        # a different version of a tool
+        self.write_tool("icepack", "cat \"$1\" > \"$2\"\necho v2 >> \"$2\"")
+        self.assertTrue(self.build("d", build_cache=cache).endswith("v2\n"))
+        self.assertEqual(self.runs(), 12)
+
+    def test_lru(self):
+        cache = BuildCache(os.path.join(self.tmp, "cache"), max_size=2000)
+        os.chdir(self.tmp)
+        for i, key in enumerate("abc"):
+            with open("top.bin", "w") as f:
+                f.write(key*800)
+            cache.store(key, ["top.bin"])
+            os.utime(os.path.join(cache.directory, key), (i, i))
+            if key == "b":
+                # using "a" makes "b" the least recently used entry
+                self.assertTrue(cache.restore("a", ["top.bin"]))
+        self.assertEqual([os.path.basename(path) for mtime, size, path in cache.entries()],
+                         ["c", "a"])
+        self.assertFalse(cache.restore("b", ["top.bin"]))
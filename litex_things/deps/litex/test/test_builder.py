@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from litex.build.tools import generated_banner, write_to_file_if_changed
+from litex.soc.integration.builder import Builder
+
+
+# Records when it starts and ends in the log of the build
+_makefile = """all:
+\techo start {name} >> ../log
+\tsleep 0.2
+\techo end {name} >> ../log
+"""
+
+
+class TestBuilder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test_write_if_changed(self):
+        filename = os.path.join(self.tmp, "csr.h")
+        self.assertTrue(write_to_file_if_changed(filename, generated_banner() + "#define A 1\n"))
+        os.utime(filename, (0, 0))
+        time.sleep(1)
+        # only the date in the banner changed
+        self.assertFalse(write_to_file_if_changed(filename, generated_banner() + "#define A 1\n"))
+        self.assertEqual(os.path.getmtime(filename), 0)
+        self.assertTrue(write_to_file_if_changed(filename, generated_banner() + "#define A 2\n"))
+        with open(filename) as f:
+            self.assertTrue(f.read().endswith("#define A 2\n"))
+
+    def test_parallel_packages(self):
+        builder = Builder(None, output_dir=os.path.join(self.tmp, "build"), jobs=4)
+        builder.software_packages = []
+        for name in "libfoo", "libbar", "app":
+            src_dir = os.path.join(self.tmp, name)
+            os.makedirs(src_dir)
+            with open(os.path.join(src_dir, "Makefile"), "w") as f:
+                f.write(_makefile.format(name=name))
+            builder.add_software_package(name, src_dir)
+        builder._prepare_software()
+        builder._generate_software()
+        with open(os.path.join(self.tmp, "build", "software", "log")) as f:
+            log = [tuple(line.split()) for line in f]
+        # both libraries are built at the same time, then the application
+        self.assertEqual(sorted(log[:2]), [("start", "libbar"), ("start", "libfoo")])
+        self.assertEqual(log[4:], [("start", "app"), ("end", "app")])
+        self.assertEqual(sorted(stage for stage, elapsed in builder.timings),
+                         ["software package app", "software package libbar",
+                          "software package libfoo"])
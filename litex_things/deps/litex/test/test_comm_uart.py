@@ -0,0 +1,181 @@
+import socket
+import struct
+import threading
+import unittest
+
+from migen import *
+
+from litex.soc.interconnect import stream, wishbone
+from litex.soc.interconnect.wishbonebridge import WishboneStreamingBridge
+from litex.tools.remote.comm_uart import CommUART
+
+
+class BridgeModel(threading.Thread):
+    """Model of a WishboneStreamingBridge on the other end of a TCP socket
+
+    Records the commands it receives and the largest number of bytes that
+    were waiting in its receive FIFO when it started sending a read reply.
+    """
+    def __init__(self, max_length=255):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.max_length = max_length
+        self.mem = {}
+        self.commands = []
+        self.max_fifo_level = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(("localhost", 0))
+        self.socket.listen(1)
+        self.url = "socket://localhost:{}".format(self.socket.getsockname()[1])
+
+    def _receive(self, conn, buf, n):
+        while len(buf) < n:
+            data = conn.recv(4096)
+            if not data:
+                raise EOFError
+            buf += data
+
+    def _drain(self, conn, buf):
+        # bytes sent by the host while the reply is being sent
+        conn.settimeout(0.005)
+        try:
+            while True:
+                data = conn.recv(4096)
+                if not data:
+                    break
+                buf += data
+        except socket.timeout:
+            pass
+        conn.settimeout(None)
+
+    def run(self):
+        conn, _ = self.socket.accept()
+        buf = bytearray()
+        try:
+            while True:
+                self._receive(conn, buf, 6)
+                cmd, length, addr = struct.unpack(">BBI", buf[:6])
+                del buf[:6]
+                self.commands.append((cmd, length, addr))
+                assert 0 < length <= self.max_length
+                if cmd == CommUART.msg_type["write"]:
+                    self._receive(conn, buf, 4*length)
+                    for i, data in enumerate(struct.unpack(">{}I".format(length), buf[:4*length])):
+                        self.mem[addr + i] = data
+                    del buf[:4*length]
+                else:
+                    self._drain(conn, buf)
+                    self.max_fifo_level = max(self.max_fifo_level, len(buf))
+                    datas = [self.mem.get(addr + i, 0) for i in range(length)]
+                    conn.sendall(struct.pack(">{}I".format(length), *datas))
+        except EOFError:
+            pass
+        finally:
+            conn.close()
+            self.socket.close()
+
+
+class TestCommUART(unittest.TestCase):
+    def comm(self, **kwargs):
+        model = BridgeModel()
+        model.start()
+        comm = CommUART(model.url, **kwargs)
+        self.addCleanup(model.join)
+        self.addCleanup(comm.close)
+        return model, comm
+
+    def test_read_write(self):
+        model, comm = self.comm()
+        comm.write(0x100, list(range(20)))
+        comm.write(0x200, 0x12345678)
+        self.assertEqual(comm.read(0x100, length=20), list(range(20)))
+        self.assertEqual(comm.read(0x200), 0x12345678)
+        # without pipelining, commands are limited to 8 words and are not
+        # sent while a reply is pending
+        self.assertEqual([length for cmd, length, addr in model.commands],
+                         [8, 8, 4, 1, 8, 8, 4, 1])
+        self.assertEqual(model.mem[0x40 + 19], 19)
+        self.assertEqual(model.max_fifo_level, 0)
+
+    def test_pipelined(self):
+        model, comm = self.comm(pipelined=True, rx_fifo_depth=16)
+        comm.write(0x1000, list(range(600)))
+        self.assertEqual(comm.read(0x1000, length=600), list(range(600)))
+        self.assertEqual([length for cmd, length, addr in model.commands],
+                         [255, 255, 90, 255, 255, 90])
+
+        transactions = [(0x2000 + 4*i, [i], [0x1000 + 8*i]) for i in range(50)]
+        self.assertEqual(comm.burst(transactions), [[2*i] for i in range(50)])
+        self.assertEqual(model.mem[0x800 + 49], 49)
+        self.assertGreater(model.max_fifo_level, 0)
+        self.assertLessEqual(model.max_fifo_level, 16)
+
+        self.assertEqual(comm.stats.bytes_read, 4*(600 + 50))
+        self.assertEqual(comm.stats.bytes_written, 4*600 + 6*6 + 50*(10 + 6))
+
+
+class _PHY:
+    def __init__(self):
+        self.source = stream.Endpoint([("data", 8)])
+        self.sink = stream.Endpoint([("data", 8)])
+
+
+class _BridgeDUT(Module):
+    def __init__(self, clk_freq=int(1e6), sram_size=1024):
+        self.phy = _PHY()
+        self.submodules.bridge = WishboneStreamingBridge(self.phy, clk_freq)
+        self.submodules.sram = wishbone.SRAM(sram_size)
+        self.comb += self.bridge.wishbone.connect(self.sram.bus)
+
+
+class TestWishboneStreamingBridge(unittest.TestCase):
+    def run_bridge(self, dut, data, n_words, gap):
+        received = []
+
+        def send():
+            for byte in data:
+                # the PHY does not wait for the bridge to be ready
+                yield dut.phy.source.valid.eq(1)
+                yield dut.phy.source.data.eq(byte)
+                yield
+                yield dut.phy.source.valid.eq(0)
+                for i in range(gap):
+                    yield
+
+        @passive
+        def receive():
+            while True:
+                yield dut.phy.sink.ready.eq(0)
+                for i in range(gap + 2):
+                    yield
+                yield dut.phy.sink.ready.eq(1)
+                yield
+                if (yield dut.phy.sink.valid):
+                    received.append((yield dut.phy.sink.data))
+
+        def wait():
+            for cycle in range(len(data)*(gap + 1) + 4*n_words*(gap + 3) + 1000):
+                if len(received) >= 4*n_words:
+                    break
+                yield
+
+        run_simulation(dut, [send(), receive(), wait()])
+        self.assertEqual(len(received), 4*n_words)
+        return list(struct.unpack(">{}I".format(n_words), bytes(received)))
+
+    def test_pipelined_commands(self):
+        dut = _BridgeDUT()
+        # a 20-word write, then two reads sent back to back
+        data = struct.pack(">BBI20I", 0x01, 20, 0x10, *range(20))
+        data += struct.pack(">BBI", 0x02, 20, 0x10)
+        data += struct.pack(">BBI", 0x02, 2, 0x12)
+        self.assertEqual(self.run_bridge(dut, data, 22, 8), list(range(20)) + [2, 3])
+
+    def test_max_length(self):
+        # the watchdog expires after 50 cycles without a byte, much less
+        # than the time taken by the frames
+        dut = _BridgeDUT(clk_freq=500, sram_size=4*256)
+        datas = [(0x01020304*i) & 0xffffffff for i in range(255)]
+        data = struct.pack(">BBI255I", 0x01, 255, 0, *datas)
+        data += struct.pack(">BBI", 0x02, 255, 0)
+        self.assertEqual(self.run_bridge(dut, data, 255, 10), datas)
@@ -0,0 +1,36 @@
+import unittest
+
+from litex.tools.remote.comm_usb import CommUSB, LoopbackDevice
+
+
+class TestCommUSB(unittest.TestCase):
+    def comm(self, **kwargs):
+        device = LoopbackDevice(**kwargs)
+        comm = CommUSB(device=device)
+        comm.open()
+        self.addCleanup(comm.close)
+        return device, comm
+
+    def test_burst(self):
+        device, comm = self.comm()
+        comm.write(0x1000, list(range(3000)))
+        comm.write(0x100, 0x12345678)
+        # one probe, then three bursts of at most 1024 words and one single write
+        self.assertEqual(device.transfers, 5)
+        self.assertTrue(comm.burst)
+        self.assertEqual(device.mem[0x1000 + 4*2999], 2999)
+        self.assertEqual(comm.read(0x1000, length=3000), list(range(3000)))
+        self.assertEqual(comm.read(0x100), 0x12345678)
+        self.assertEqual(device.transfers, 9)
+
+    def test_fallback(self):
+        device, comm = self.comm(burst=False)
+        comm.write(0x1000, list(range(20)))
+        self.assertFalse(comm.burst)
+        self.assertEqual(device.transfers, 21)
+        self.assertEqual(comm.read(0x1000, length=20), list(range(20)))
+        self.assertEqual(device.mem[0x1000 + 4*19], 19)
+
+
+if __name__ == "__main__":
+    unittest.main()
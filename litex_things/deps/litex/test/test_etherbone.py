@@ -0,0 +1,70 @@
+import unittest
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
+from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+
+
+# packet with one record writing 2 words and reading 3, with some flags set
+packet_bytes = bytes.fromhex(
+    "4e6f154400000000"                  # magic, version 1, nr, pf, 32-bit
+    "510f0203"                          # bca, cyc, wff, byte_enable, counts
+    "12345678deadbeef00000001"          # writes
+    "00000100000000100000002000000030") # reads
+
+
+class TestEtherbone(unittest.TestCase):
+    def packet(self):
+        record = EtherboneRecord()
+        record.writes = EtherboneWrites(base_addr=0x12345678, datas=[0xdeadbeef, 1])
+        record.reads = EtherboneReads(base_ret_addr=0x100, addrs=[0x10, 0x20, 0x30])
+        record.bca = 1
+        record.cyc = 1
+        record.wff = 1
+        packet = EtherbonePacket()
+        packet.records = [record]
+        packet.nr = 1
+        packet.pf = 1
+        return packet
+
+    def check(self, packet):
+        self.assertEqual((packet.magic, packet.version, packet.nr, packet.pr, packet.pf,
+                          packet.addr_size, packet.port_size), (0x4e6f, 1, 1, 0, 1, 4, 4))
+        self.assertEqual(len(packet.records), 1)
+        record = packet.records[0]
+        self.assertEqual((record.bca, record.rca, record.rff, record.cyc, record.wca,
+                          record.wff, record.byte_enable, record.wcount, record.rcount),
+                         (1, 0, 0, 1, 0, 1, 0xf, 2, 3))
+        self.assertEqual(record.writes.base_addr, 0x12345678)
+        self.assertEqual(record.writes.get_datas(), [0xdeadbeef, 1])
+        self.assertEqual(record.reads.base_ret_addr, 0x100)
+        self.assertEqual(record.reads.get_addrs(), [0x10, 0x20, 0x30])
+
+    def test_encode(self):
+        self.assertEqual(self.packet().to_bytes(), packet_bytes)
+        packet = self.packet()
+        packet.encode()
+        self.assertEqual(bytes(packet), packet_bytes)
+        self.assertEqual(packet[:], list(packet_bytes))
+
+    def test_decode(self):
+        packet = EtherbonePacket()
+        packet.from_bytes(memoryview(packet_bytes))
+        self.check(packet)
+        packet = EtherbonePacket(packet_bytes)
+        packet.decode()
+        self.check(packet)
+        self.assertEqual(len(packet), 0)
+
+    def test_multiple_records(self):
+        packet = EtherbonePacket()
+        for n in 1, 64, 255:
+            record = EtherboneRecord()
+            record.writes = EtherboneWrites(base_addr=n, datas=range(n))
+            record.reads = EtherboneReads(addrs=[4*i for i in range(n)])
+            packet.records.append(record)
+        decoded = EtherbonePacket()
+        decoded.from_bytes(packet.to_bytes())
+        self.assertEqual([(r.wcount, r.rcount, r.writes.base_addr) for r in decoded.records],
+                         [(1, 1, 1), (64, 64, 64), (255, 255, 255)])
+        self.assertEqual(decoded.records[2].writes.get_datas(), list(range(255)))
+        self.assertEqual(decoded.records[1].reads.get_addrs(), [4*i for i in range(64)])
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from litex.build.lattice.icestorm import LatticeIceStormToolchain, parse_nextpnr_fmax
+
+
+def _log(fmax, constraint=12.0):
+    r = ""
+    # reports after placement, then after routing
+    for scale in 1.1, 1.0:
+        r += "Info: Max frequency for clock 'clk12_$glb_clk': {:.2f} MHz (PASS at {:.2f} MHz)\n".format(
+            scale*fmax, constraint)
+        r += "Info: Max frequency for clock   'sys_clk': {:.2f} MHz\n".format(scale*fmax/2)
+    return r
+
+
+# Logs its arguments to $STUB_LOG and copies the canned log of its seed
+_fake_nextpnr = """#!/bin/sh
+echo "$@" >> "$STUB_LOG"
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --seed) seed=$2 ;;
+        --asc) asc=$2 ;;
+        --log) log=$2 ;;
+    esac
+    shift
+done
+[ -f "$CANNED_LOGS/$seed.log" ] || exit 1
+cp "$CANNED_LOGS/$seed.log" "$log"
+echo "placed with seed $seed" > "$asc"
+"""
+
+
+class TestSeedSweep(unittest.TestCase):
+    commands = [
+        "nextpnr-ice40 --up5k --package sg48 --pcf top.pcf --json top.json --asc top.txt --pre-pack top_pre_pack.py",
+        "icepack top.txt top.bin"
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        bin_dir = os.path.join(self.tmp, "bin")
+        self.canned = os.path.join(self.tmp, "canned")
+        os.mkdir(bin_dir)
+        os.mkdir(self.canned)
+        for name, contents in [("nextpnr-ice40", _fake_nextpnr),
+                               ("icepack", "#!/bin/sh\ncp \"$1\" \"$2\"\n")]:
+            with open(os.path.join(bin_dir, name), "w") as f:
+                f.write(contents)
+            os.chmod(os.path.join(bin_dir, name), 0o755)
+        environ = dict(os.environ)
+        self.addCleanup(os.environ.update, environ)
+        self.addCleanup(os.environ.clear)
+        os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+        os.environ["STUB_LOG"] = os.path.join(self.tmp, "runs")
+        os.environ["CANNED_LOGS"] = self.canned
+
+    def can(self, seed, fmax):
+        with open(os.path.join(self.canned, "{}.log".format(seed)), "w") as f:
+            f.write(_log(fmax))
+
+    def runs(self):
+        with open(os.environ["STUB_LOG"]) as f:
+            return [line.split() for line in f]
+
+    def test_parse(self):
+        self.assertEqual(parse_nextpnr_fmax(_log(20.0)),
+                         {"clk12_$glb_clk": (20.0, 12.0), "sys_clk": (10.0, None)})
+
+    def test_best(self):
+        for seed, fmax in (1, 9.5), (2, 11.8), (3, 10.0):
+            self.can(seed, fmax)
+        toolchain = LatticeIceStormToolchain()
+        # seed 4 fails to route
+        self.assertEqual(toolchain.run_seeds(self.commands, "top", range(1, 5), jobs=4), 2)
+        self.assertEqual(len(self.runs()), 4)
+        with open("top.bin") as f:
+            self.assertEqual(f.read(), "placed with seed 2\n")
+        self.assertTrue(os.path.exists("top_nextpnr.log"))
+
+    def test_early_stop(self):
+        for seed, fmax in (1, 9.5), (2, 12.5), (3, 20.0):
+            self.can(seed, fmax)
+        toolchain = LatticeIceStormToolchain()
+        # with one worker, seed 2 stops the sweep before seed 3 is started
+        self.assertEqual(toolchain.run_seeds(self.commands, "top", [1, 2, 3], jobs=1), 2)
+        self.assertEqual([run[run.index("--seed") + 1] for run in self.runs()], ["1", "2"])
+
+        os.remove(os.environ["STUB_LOG"])
+        self.assertEqual(toolchain.run_seeds(self.commands, "top", [1, 2, 3], jobs=1,
+                                             target_fmax=15.0), 3)
+
+    def test_all_failed(self):
+        toolchain = LatticeIceStormToolchain()
+        with self.assertRaises(OSError):
+            toolchain.run_seeds(self.commands, "top", [1, 2], jobs=2)
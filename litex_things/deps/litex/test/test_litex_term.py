@@ -0,0 +1,103 @@
+import random
+import unittest
+
+from litex.tools.litex_term import *
+
+
+class BIOSModel:
+    """Serial port with the serial boot loop of the BIOS on the other end
+
+    Frames whose number is in crc_errors are received corrupted once.
+    """
+    def __init__(self, rle=True, crc_errors=()):
+        self.rle = rle
+        self.crc_errors = set(crc_errors)
+        self.mem = bytearray(1 << 16)
+        self.frames = 0
+        self.replies = b""
+        self.max_in_flight = 0
+
+    def write(self, data):
+        data = bytes(data)
+        written = len(data)
+        while data:
+            length = data[0]
+            frame, data = data[:4 + length], data[4 + length:]
+            self.frames += 1
+            self.replies += self._execute(frame)
+            self.max_in_flight = max(self.max_in_flight, len(self.replies))
+        return written
+
+    def read(self, size=1):
+        reply, self.replies = self.replies[:size], self.replies[size:]
+        return reply
+
+    def _execute(self, frame):
+        length, crc, cmd, payload = frame[0], frame[1:3], frame[3:4], frame[4:]
+        if self.frames in self.crc_errors:
+            self.crc_errors.remove(self.frames)
+            return sfl_ack_crcerror
+        if cmd != sfl_cmd_load_no_crc and int.from_bytes(crc, "big") != crc16(frame[3:]):
+            return sfl_ack_crcerror
+        addr = int.from_bytes(payload[:4], "big")
+        if cmd in (sfl_cmd_load, sfl_cmd_load_no_crc):
+            self.mem[addr:addr + length - 4] = payload[4:]
+            return sfl_ack_success if cmd == sfl_cmd_load else b""
+        if cmd == sfl_cmd_load_rle and self.rle:
+            i = 4
+            while i < length:
+                c = payload[i]
+                if c < 0x80:
+                    self.mem[addr:addr + c + 1] = payload[i + 1:i + c + 2]
+                    addr += c + 1
+                    i += c + 2
+                else:
+                    self.mem[addr:addr + c - 0x80 + 3] = payload[i + 1:i + 2]*(c - 0x80 + 3)
+                    addr += c - 0x80 + 3
+                    i += 2
+            return sfl_ack_success
+        return sfl_ack_unknown
+
+
+class TestSerialBoot(unittest.TestCase):
+    data = random.Random(0).getrandbits(8*3000).to_bytes(3000, "little") + bytes(5000) + b"abc"*1000
+
+    def test_stop_and_wait(self):
+        port = BIOSModel(crc_errors=[3])
+        frames = sfl_load_frames(self.data, 0x100)
+        self.assertEqual(sfl_send_frames(port, frames), sfl_ack_success)
+        self.assertEqual(port.mem[0x100:0x100 + len(self.data)], self.data)
+        self.assertEqual(port.frames, len(frames) + 1)
+        self.assertEqual(port.max_in_flight, 1)
+
+    def test_window(self):
+        port = BIOSModel(crc_errors=[3, 10])
+        frames = sfl_load_frames(self.data, 0x100)
+        loaded = []
+        self.assertEqual(sfl_send_frames(port, frames, window=8, progress=loaded.append),
+                         sfl_ack_success)
+        self.assertEqual(port.mem[0x100:0x100 + len(self.data)], self.data)
+        self.assertEqual(port.frames, len(frames) + 2)
+        self.assertEqual(port.max_in_flight, 8)
+        self.assertEqual(sum(loaded), len(self.data))
+
+    def test_no_crc(self):
+        port = BIOSModel()
+        frames = sfl_load_frames(self.data, 0, cmd=sfl_cmd_load_no_crc)
+        self.assertEqual(sfl_send_frames(port, frames, acked=False), sfl_ack_success)
+        self.assertEqual(port.mem[:len(self.data)], self.data)
+
+    def test_rle(self):
+        port = BIOSModel(crc_errors=[2])
+        frames = sfl_rle_frames(self.data, 0x10)
+        # only the zeros compress
+        self.assertEqual(len(frames), len(sfl_load_frames(self.data[:3000] + self.data[8000:], 0)) + 1)
+        self.assertEqual(sum(length for length, frame in frames), len(self.data))
+        self.assertEqual(sfl_send_frames(port, frames, window=4), sfl_ack_success)
+        self.assertEqual(port.mem[0x10:0x10 + len(self.data)], self.data)
+
+        port = BIOSModel(rle=False)
+        self.assertEqual(sfl_send_frames(port, frames[:1]), sfl_ack_unknown)
+
+    def test_crc16(self):
+        self.assertEqual(crc16(b"123456789"), 0x31c3)
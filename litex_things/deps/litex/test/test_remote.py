@@ -0,0 +1,198 @@
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from litex.tools.litex_client import RemoteClient, AsyncRemoteClient
+from litex.tools.litex_server import RemoteServer, AsyncRemoteServer, coalesce_reads
+from litex.tools.remote.etherbone import EtherboneRecord, EtherboneReads, EtherboneWrites
+
+
+class MemoryComm:
+    def __init__(self):
+        self.mem = {}
+        self.reads = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self, addr, length=None):
+        self.reads.append((addr, length))
+        length_int = 1 if length is None else length
+        datas = [self.mem.get(addr + 4*i, 0) for i in range(length_int)]
+        return datas[0] if length is None else datas
+
+    def write(self, addr, datas):
+        for i, data in enumerate(datas):
+            self.mem[addr + 4*i] = data
+
+
+class CountingComm(MemoryComm):
+    # every word read returns the next value of a counter, like a FIFO
+    def __init__(self):
+        MemoryComm.__init__(self)
+        self.count = 0
+
+    def read(self, addr, length=None):
+        self.reads.append((addr, length))
+        length_int = 1 if length is None else length
+        datas = list(range(self.count + 1, self.count + 1 + length_int))
+        self.count += length_int
+        return datas[0] if length is None else datas
+
+
+def read_record(addrs):
+    record = EtherboneRecord()
+    record.reads = EtherboneReads(addrs=addrs)
+    record.rcount = len(record.reads)
+    return record
+
+
+def run_async(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestRemote(unittest.TestCase):
+    server_class = RemoteServer
+
+    def setUp(self):
+        self.comm = MemoryComm()
+        self.server = self.server_class(self.comm, "localhost", 0)
+        self.server.open()
+        self.server.start(4)
+        self.port = self.server.socket.getsockname()[1]
+
+    def tearDown(self):
+        self.server.close()
+
+    def client(self):
+        client = RemoteClient(port=self.port, csr_csv=None, csr_data_width=32)
+        client.open()
+        self.addCleanup(client.close)
+        return client
+
+    def test_coalesce_reads(self):
+        self.assertEqual(coalesce_reads([0, 4, 8, 16, 20, 20, 0]),
+                         [(0, 3), (16, 2), (20, 1), (0, 1)])
+        self.assertEqual(coalesce_reads([4*i for i in range(300)]),
+                         [(0, 255), (4*255, 45)])
+
+    def test_read_write(self):
+        client = self.client()
+        client.write(0x100, list(range(10)))
+        self.assertEqual(client.read(0x100, length=10), list(range(10)))
+        self.assertEqual(client.read(0x104), 1)
+        # the 10 consecutive words were read at once
+        self.assertIn((0x100, 10), self.comm.reads)
+
+    def test_burst(self):
+        client = self.client()
+        replies = client.burst([(0x0, [1, 2], [0x0, 0x4]),
+                                (0x8, [3], None),
+                                (0x0, [4], [0x0, 0x4, 0x8])])
+        self.assertEqual(replies, [[1, 2], [], [4, 2, 3]])
+        stats = list(self.server.clients.values())
+        self.assertEqual(len(stats), 1)
+        self.assertEqual((stats[0].records, stats[0].reads, stats[0].writes), (3, 5, 4))
+
+    def test_repeated_reads(self):
+        self.comm = CountingComm()
+        self.server.comm = self.comm
+        replies = self.client().burst([(0, None, [0x10, 0x10, 0x10]), (0, None, [0x10])])
+        self.assertEqual(replies, [[1, 2, 3], [4]])
+
+    def test_concurrent_clients(self):
+        errors = []
+        def run(n):
+            client = self.client()
+            base = 0x1000*n
+            for i in range(50):
+                client.write(base, [i, i + n])
+                if client.read(base, length=2) != [i, i + n]:
+                    errors.append(n)
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class TestAsyncRemote(TestRemote):
+    server_class = AsyncRemoteServer
+
+    def test_async_client(self):
+        self.client().write(0x0, list(range(64)))
+        async def run():
+            client = AsyncRemoteClient(port=self.port, csr_csv=None, csr_data_width=32)
+            await client.open()
+            try:
+                datas = await asyncio.gather(*[client.read(4*i) for i in range(64)])
+                await client.write(0x100, [1, 2])
+                datas += await client.read(0x100, length=2)
+            finally:
+                await client.close()
+            return datas
+        datas = run_async(run())
+        self.assertEqual(datas, list(range(64)) + [1, 2])
+        # the overlapping reads were merged into fewer backend accesses
+        self.assertLess(len(self.comm.reads), 64)
+
+    def test_batch_order(self):
+        self.server.comm = CountingComm()
+        write = EtherboneRecord()
+        write.writes = EtherboneWrites(base_addr=0x0, datas=[0])
+        write.wcount = 1
+        records = [read_record([0x10, 0x10, 0x10]), read_record([0x14, 0x8]),
+                   read_record([0xc]), write, read_record([0x10])]
+        self.assertEqual(self.server._execute_batch(records),
+                         [[1, 2, 3], [4, 5], [6], None, [7]])
+        # each word is read once per request, consecutive ones at once
+        self.assertEqual(self.server.comm.reads,
+                         [(0x10, None), (0x10, None), (0x10, 2), (0x8, 2), (0x10, None)])
+
+    def test_async_registers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csr_csv = os.path.join(tmpdir, "csr.csv")
+            with open(csr_csv, "w") as f:
+                f.write("csr_register,scratch,0x00000100,2,rw\n")
+                f.write("constant,config_csr_data_width,8,,\n")
+            async def run():
+                client = AsyncRemoteClient(port=self.port, csr_csv=csr_csv)
+                await client.open()
+                try:
+                    await client.regs.scratch.write(0x1234)
+                    return await client.regs.scratch.read(), await client.read_register("scratch")
+                finally:
+                    await client.close()
+            self.assertEqual(run_async(run()), (0x1234, 0x1234))
+        self.assertEqual((self.comm.mem[0x100], self.comm.mem[0x104]), (0x12, 0x34))
+
+    def test_async_client_close(self):
+        # a server that never replies: pending reads fail when the client is
+        # closed, including after a read was cancelled
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("localhost", 0))
+        listener.listen(1)
+        self.addCleanup(listener.close)
+        async def run():
+            client = AsyncRemoteClient(port=listener.getsockname()[1], csr_csv=None,
+                                       csr_data_width=32)
+            await client.open()
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.read(0x0), 0.05)
+            read = asyncio.ensure_future(client.read(0x4))
+            await asyncio.sleep(0.05)
+            await client.close()
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(read, 1.0)
+        run_async(run())
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from litex.build.tools import generated_banner
+from litex.build.sim.verilator import _build_sim, _compile_sim
+
+
+# Logs its arguments to $STUB_LOG and leaves a model and a module in obj_dir
+_fake_make = """#!/bin/sh
+echo "$@" >> "$STUB_LOG"
+mkdir -p obj_dir
+touch obj_dir/Vdut obj_dir/serial2console.so
+"""
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        bin_dir = os.path.join(self.tmp, "bin")
+        os.mkdir(bin_dir)
+        with open(os.path.join(bin_dir, "make"), "w") as f:
+            f.write(_fake_make)
+        os.chmod(os.path.join(bin_dir, "make"), 0o755)
+        environ = dict(os.environ)
+        self.addCleanup(os.environ.update, environ)
+        self.addCleanup(os.environ.clear)
+        os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+        os.environ["STUB_LOG"] = os.path.join(self.tmp, "log")
+        for filename in "dut_init.cpp", "dut_header.h", "variables.mak":
+            self.write(filename, filename)
+        self.write_dut("module dut();\nendmodule\n")
+
+    def write(self, filename, contents):
+        with open(filename, "w") as f:
+            f.write(contents)
+
+    def write_dut(self, contents):
+        self.write("dut.v", generated_banner() + contents)
+
+    def build(self, **kwargs):
+        sources = [(os.path.join(self.tmp, "dut.v"), "verilog", "work")]
+        _build_sim("dut", sources, threads=1, coverage=False, **kwargs)
+        _compile_sim("dut", verbose=False)
+        self.assertTrue(os.path.exists(os.path.join("modules", "serial2console.so")))
+        if not os.path.exists(os.environ["STUB_LOG"]):
+            return []
+        with open(os.environ["STUB_LOG"]) as f:
+            return [line.split() for line in f]
+
+    def test_incremental(self):
+        self.assertEqual(len(self.build(incremental=True)), 1)
+        # only the date of the banner changed
+        self.write_dut("module dut();\nendmodule\n")
+        self.assertEqual(len(self.build(incremental=True)), 1)
+        self.write_dut("module dut(input a);\nendmodule\n")
+        self.assertEqual(len(self.build(incremental=True)), 2)
+        self.write("dut_init.cpp", "changed")
+        self.assertEqual(len(self.build(incremental=True)), 3)
+        self.assertEqual(len(self.build(incremental=True, opt_level="O0")), 4)
+        self.assertEqual(len(self.build(incremental=True, opt_level="O0")), 4)
+
+    def test_full(self):
+        self.build()
+        os.mkdir(os.path.join("obj_dir", "stale"))
+        self.assertEqual(len(self.build()), 2)
+        self.assertFalse(os.path.exists(os.path.join("obj_dir", "stale")))
+
+    def test_ccache_jobs(self):
+        run, = self.build(incremental=True, ccache=True, jobs=6)
+        self.assertIn("-j6", run)
+        self.assertIn("CCACHE=ccache", run)
+        self.assertIn("JOBS=6", run)
@@ -61,7 +61,17 @@ def value_bits_sign(v):
     """
     if isinstance(v, (f.Constant, f.Signal)):
         return v.nbits, v.signed
-    elif isinstance(v, (f.ClockSignal, f.ResetSignal)):
+    bits_sign = getattr(v, "_bits_sign", None)
+    if bits_sign is None:
+        bits_sign = _value_bits_sign(v)
+        # expression nodes are immutable, cache their width and signedness
+        if isinstance(v, (f._Operator, f._Slice, f._Part, f.Cat, f.Replicate, f._ArrayProxy)):
+            v._bits_sign = bits_sign
+    return bits_sign
+
+
+def _value_bits_sign(v):
+    if isinstance(v, (f.ClockSignal, f.ResetSignal)):
         return 1, False
     elif isinstance(v, f._Operator):
         obs = list(map(value_bits_sign, v.operands))
@@ -118,5 +128,8 @@ def value_bits_sign(v):
         bsc = list(map(value_bits_sign, v.choices))
         return max(bs[0] for bs in bsc), any(bs[1] for bs in bsc)
     else:
+        from migen.fhdl.specials import _MemoryLocation
+        if isinstance(v, _MemoryLocation):
+            return v.memory.width, False
         raise TypeError("Can not calculate bit length of {} {}".format(
             type(v), v))
@@ -1,13 +1,37 @@
+import os
 from operator import itemgetter
 
 
 class ConvOutput:
     def __init__(self):
-        self.main_source = ""
+        self._main_source = ""
+        self._main_filename = None
         self.data_files = dict()
 
     def set_main_source(self, src):
-        self.main_source = src
+        """Set the main source
+
+        ``src`` is either a string, or a function that generates the
+        source by passing it in chunks to the function it is called with.
+        Such a source is only generated when it is first needed, and is
+        streamed to the file by ``write``; data files are added as it is
+        generated.
+        """
+        self._main_source = src
+        self._main_filename = None
+
+    @property
+    def main_source(self):
+        if self._main_source is None:
+            if self._main_filename is None:
+                raise ValueError("Main source was streamed to a file object and not kept")
+            with open(self._main_filename) as f:
+                self._main_source = f.read()
+        elif callable(self._main_source):
+            chunks = []
+            self._main_source(chunks.append)
+            self._main_source = "".join(chunks)
+        return self._main_source
 
     def add_data_file(self, filename_base, content):
         filename = filename_base
@@ -27,9 +51,23 @@ class ConvOutput:
             r += filename + ":\n" + content
         return r
 
+    def write_main_source(self, f):
+        """Write the main source to the text file object ``f``
+
+        A streamed source is written as it is generated, without being
+        kept in memory.
+        """
+        if callable(self._main_source):
+            emit, self._main_source = self._main_source, None
+            emit(f.write)
+        else:
+            f.write(self.main_source)
+
     def write(self, main_filename):
         with open(main_filename, "w") as f:
-            f.write(self.main_source)
+            self.write_main_source(f)
+        if self._main_source is None:
+            self._main_filename = os.path.abspath(main_filename)
         for filename, content in self.data_files.items():
             with open(filename, "w") as f:
                 f.write(content)
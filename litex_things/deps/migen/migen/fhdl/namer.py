@@ -1,5 +1,4 @@
-from collections import OrderedDict
-from itertools import combinations
+from collections import OrderedDict, Counter
 
 from migen.fhdl.structure import *
 
@@ -10,6 +9,7 @@ class _Node:
         self.numbers = set()
         self.use_name = False
         self.use_number = False
+        self.number_index = None
         self.children = OrderedDict()
 
 
@@ -59,24 +59,33 @@ def _build_tree(signals, basic_tree=None):
                 current = new
             current.numbers.add(number)
             if use_number:
-                current.all_numbers = sorted(current_b.numbers)
+                if current_b.number_index is None:
+                    # position of each number among those of the basic tree node
+                    current_b.number_index = {n: i for i, n in enumerate(sorted(current_b.numbers))}
+                current.number_index = current_b.number_index
             current.signal_count += 1
     return root
 
 
 def _set_use_name(node, node_name=""):
     cnames = [(k, _set_use_name(v, k)) for k, v in node.children.items()]
-    for (c1_prefix, c1_names), (c2_prefix, c2_names) in combinations(cnames, 2):
-        if not c1_names.isdisjoint(c2_names):
-            node.children[c1_prefix].use_name = True
-            node.children[c2_prefix].use_name = True
-    r = set()
+    # children sharing a name with another child need their own name
+    counts = Counter()
+    for c_prefix, c_names in cnames:
+        counts.update(c_names)
+    for c_prefix, c_names in cnames:
+        if any(counts[c_name] > 1 for c_name in c_names):
+            node.children[c_prefix].use_name = True
+    # merge into the largest set of the children, which are not used anymore
+    unnamed = [c_names for c_prefix, c_names in cnames if not node.children[c_prefix].use_name]
+    r = max(unnamed, key=len) if unnamed else set()
+    for c_names in unnamed:
+        if c_names is not r:
+            r |= c_names
     for c_prefix, c_names in cnames:
         if node.children[c_prefix].use_name:
             for c_name in c_names:
                 r.add((c_prefix, ) + c_name)
-        else:
-            r |= c_names
 
     if node.signal_count > sum(c.signal_count for c in node.children.values()):
         node.use_name = True
@@ -98,7 +107,7 @@ def _name_signal(tree, signal):
         if treepos.use_name:
             elname = step_name
             if use_number:
-                elname += str(treepos.all_numbers.index(step_n))
+                elname += str(treepos.number_index[step_n])
             elements.append(elname)
     return "_".join(elements)
 
@@ -91,9 +91,15 @@ class _Value(DUID):
     def __ge__(self, other):
         return _Operator(">=", [self, other])
 
+    # width and signedness of expression nodes, set by value_bits_sign
+    _bits_sign = None
+
     def __len__(self):
-        from migen.fhdl.bitcontainer import value_bits_sign
-        return value_bits_sign(self)[0]
+        bits_sign = self._bits_sign
+        if bits_sign is None:
+            from migen.fhdl.bitcontainer import value_bits_sign
+            bits_sign = value_bits_sign(self)
+        return bits_sign[0]
 
     def __getitem__(self, key):
         n = len(self)
@@ -295,6 +301,9 @@ class Constant(_Value):
         if not isinstance(self.nbits, int) or self.nbits <= 0:
             raise TypeError("Width must be a strictly positive integer")
 
+    def __len__(self):
+        return self.nbits
+
     def __hash__(self):
         return self.value
 
@@ -392,7 +401,7 @@ class Signal(_Value):
         self.reset = reset
         self.reset_less = reset_less
         self.name_override = name_override
-        self.backtrace = _tracer.trace_back(name)
+        self.backtrace = _tracer.Backtrace(name)
         self.related = related
         self.attr = attr
 
@@ -401,6 +410,17 @@ class Signal(_Value):
             v = wrap(v)
         _Value.__setattr__(self, k, v)
 
+    @property
+    def backtrace(self):
+        backtrace = self._backtrace
+        if isinstance(backtrace, _tracer.Backtrace):
+            backtrace = self._backtrace = backtrace.get()
+        return backtrace
+
+    @backtrace.setter
+    def backtrace(self, backtrace):
+        self._backtrace = backtrace
+
     def __repr__(self):
         return "<Signal " + (self.backtrace[-1][0] or "anonymous") + " at " + hex(id(self)) + ">"
 
@@ -424,6 +444,9 @@ class Signal(_Value):
         kw.update(kwargs)
         return cls(**kw)
 
+    def __len__(self):
+        return self.nbits
+
     def __hash__(self):
         return self.duid
 
@@ -31,17 +31,40 @@ class _TargetLister(NodeVisitor):
         for choice in node.choices:
             self.visit(choice)
 
+    def visit_Part(self, node):
+        self.visit(node.value)
+
 
 class _InputLister(NodeVisitor):
     def __init__(self):
         self.output_list = set()
+        self.target_context = False
 
     def visit_Signal(self, node):
-        self.output_list.add(node)
+        if not self.target_context:
+            self.output_list.add(node)
 
     def visit_Assign(self, node):
+        self.target_context = True
+        self.visit(node.l)
+        self.target_context = False
         self.visit(node.r)
 
+    # indices used to select a target are inputs
+
+    def visit_ArrayProxy(self, node):
+        for choice in node.choices:
+            self.visit(choice)
+        target_context, self.target_context = self.target_context, False
+        self.visit(node.key)
+        self.target_context = target_context
+
+    def visit_Part(self, node):
+        self.visit(node.value)
+        target_context, self.target_context = self.target_context, False
+        self.visit(node.offset)
+        self.target_context = target_context
+
 
 def list_signals(node):
     lister = _SignalLister()
@@ -61,30 +84,42 @@ def list_inputs(node):
     return lister.output_list
 
 
-def _resort_statements(ol):
-    return [statement for i, statement in
-            sorted(ol, key=lambda x: x[0])]
+def _find_group(parent, i):
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
 
 
 def group_by_targets(sl):
-    groups = []
-    seen = set()
+    # Union-find over statements. A group is always renamed to its latest
+    # statement, so sorting the roots gives the order in which groups were
+    # last extended. Target sets are merged in that order as well, so that
+    # they iterate in the same order as when groups were merged pairwise.
+    statements = []
+    parent = []
+    owner = dict()
+    group_targets = dict()
     for order, stmt in enumerate(flat_iteration(sl)):
         targets = set(list_targets(stmt))
-        group = [(order, stmt)]
-        disjoint = targets.isdisjoint(seen)
-        seen |= targets
-        if not disjoint:
-            groups, old_groups = [], groups
-            for old_targets, old_group in old_groups:
-                if targets.isdisjoint(old_targets):
-                    groups.append((old_targets, old_group))
-                else:
-                    targets |= old_targets
-                    group += old_group
-        groups.append((targets, group))
-    return [(targets, _resort_statements(stmts))
-        for targets, stmts in groups]
+        statements.append(stmt)
+        parent.append(order)
+        roots = set()
+        for t in targets:
+            if t in owner:
+                roots.add(_find_group(parent, owner[t]))
+            else:
+                owner[t] = order
+        for root in sorted(roots):
+            targets |= group_targets.pop(root)
+            parent[root] = order
+        group_targets[order] = targets
+    groups = dict()
+    for order, stmt in enumerate(statements):
+        groups.setdefault(_find_group(parent, order), []).append(stmt)
+    return [(group_targets[root], groups[root]) for root in sorted(groups)]
 
 
 def list_special_ios(f, ins, outs, inouts):
@@ -1,58 +1,46 @@
-import inspect
-from sys import version_info
-from opcode import opname
+import sys
+import dis
+import copy
 from collections import defaultdict
 
-# All opcodes are 2 bytes in length in Python 3.6
-def _bytecode_length_version_guard(old_len):
-    return old_len if version_info[1] < 6 else 2
 
-_call_opcodes = {
-    "CALL_FUNCTION" : _bytecode_length_version_guard(3),
-    "CALL_FUNCTION_KW" : _bytecode_length_version_guard(3),
+# Instructions that may come between a call and the store of its result:
+# loading the object of an attribute, duplicating the result of chained
+# assignments, or building a list of results.
+_skip_opnames = {
+    "LOAD_GLOBAL", "LOAD_ATTR", "LOAD_FAST", "LOAD_FAST_CHECK", "LOAD_DEREF",
+    "DUP_TOP", "COPY", "BUILD_LIST", "EXTENDED_ARG",
 }
+_store_opnames = {"STORE_NAME", "STORE_ATTR", "STORE_FAST", "STORE_DEREF"}
 
-if version_info[1] < 6:
-    _call_opcodes["CALL_FUNCTION_VAR"] = 3
-    _call_opcodes["CALL_FUNCTION_VAR_KW"] = 3
-elif version_info[1] < 7:
-    _call_opcodes["CALL_FUNCTION_EX"] = 2
-else:
-    _call_opcodes["CALL_FUNCTION_EX"] = 2
-    _call_opcodes["CALL_METHOD"] = 2
-
-_load_build_opcodes = {
-    "LOAD_GLOBAL" : _bytecode_length_version_guard(3),
-    "LOAD_ATTR" : _bytecode_length_version_guard(3),
-    "LOAD_FAST" : _bytecode_length_version_guard(3),
-    "LOAD_DEREF" : _bytecode_length_version_guard(3),
-    "DUP_TOP" : _bytecode_length_version_guard(1),
-    "BUILD_LIST" : _bytecode_length_version_guard(3),
-}
+# Variable names by (code object, offset of the call)
+_var_names = dict()
 
 
-def get_var_name(frame):
-    code = frame.f_code
-    call_index = frame.f_lasti
-    call_opc = opname[code.co_code[call_index]]
-    if call_opc not in _call_opcodes:
+def _find_var_name(code, call_offset):
+    instructions = dis.get_instructions(code)
+    for instruction in instructions:
+        if instruction.offset == call_offset:
+            break
+    else:
         return None
-    index = call_index+_call_opcodes[call_opc]
-    while True:
-        opc = opname[code.co_code[index]]
-        if opc == "STORE_NAME" or opc == "STORE_ATTR":
-            name_index = int(code.co_code[index+1])
-            return code.co_names[name_index]
-        elif opc == "STORE_FAST":
-            name_index = int(code.co_code[index+1])
-            return code.co_varnames[name_index]
-        elif opc == "STORE_DEREF":
-            name_index = int(code.co_code[index+1])
-            return code.co_cellvars[name_index]
-        elif opc in _load_build_opcodes:
-            index += _load_build_opcodes[opc]
-        else:
+    if not instruction.opname.startswith("CALL"):
+        return None
+    for instruction in instructions:
+        if instruction.opname in _store_opnames:
+            return instruction.argval
+        elif instruction.opname not in _skip_opnames:
             return None
+    return None
+
+
+def get_var_name(frame):
+    key = (frame.f_code, frame.f_lasti)
+    try:
+        return _var_names[key]
+    except KeyError:
+        name = _var_names[key] = _find_var_name(*key)
+        return name
 
 
 def remove_underscore(s):
@@ -65,7 +53,7 @@ def get_obj_var_name(override=None, default=None):
     if override:
         return override
 
-    frame = inspect.currentframe().f_back
+    frame = sys._getframe(1)
     # We can be called via derived classes. Go back the stack frames
     # until we reach the first class that does not inherit from us.
     ourclass = frame.f_locals["self"].__class__
@@ -81,59 +69,115 @@ def get_obj_var_name(override=None, default=None):
 
 name_to_idx = defaultdict(int)
 classname_to_objs = dict()
+# Index of each object in classname_to_objs, by id. The lists keep the
+# objects alive, so their ids are not reused.
+_obj_to_idx = dict()
+
+# Backtraces are only resolved when lazy is False, or when one of them is
+# used. Pending ones are resolved in the order they were taken, so they
+# are numbered the same either way.
+lazy = False
+_pending = []
+
+
+def _has_self(code, _cache={}):
+    try:
+        return _cache[code]
+    except KeyError:
+        # only function frames have locals that can not contain "self"
+        r = _cache[code] = (not code.co_flags & 1
+                            or "self" in code.co_varnames
+                            or "self" in code.co_cellvars
+                            or "self" in code.co_freevars)
+        return r
+
+
+def _capture(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        obj = frame.f_locals.get("self") if _has_self(code) else None
+        if code.co_name == "<module>":
+            coname = frame.f_globals["__name__"].split(".")[-1]
+        else:
+            coname = code.co_name
+        frames.append((get_var_name(frame), obj, coname))
+        frame = frame.f_back
+    return frames
 
 
-def index_id(l, obj):
-    for n, e in enumerate(l):
-        if id(e) == id(obj):
-            return n
-    raise ValueError
+def _object_index(obj):
+    classname = obj.__class__.__name__.lower()
+    try:
+        by_id = _obj_to_idx[classname]
+    except KeyError:
+        classname_to_objs[classname] = [obj]
+        _obj_to_idx[classname] = {id(obj): 0}
+        idx = 0
+    else:
+        try:
+            idx = by_id[id(obj)]
+        except KeyError:
+            objs = classname_to_objs[classname]
+            idx = by_id[id(obj)] = len(objs)
+            objs.append(obj)
+    return classname, idx
 
 
-def trace_back(varname=None):
+def _resolve(varname, frames):
     l = []
-    frame = inspect.currentframe().f_back.f_back
-    while frame is not None:
+    for frame_varname, obj, coname in frames:
         if varname is None:
-            varname = get_var_name(frame)
+            varname = frame_varname
         if varname is not None:
             varname = remove_underscore(varname)
-            l.insert(0, (varname, name_to_idx[varname]))
+            l.append((varname, name_to_idx[varname]))
             name_to_idx[varname] += 1
 
-        try:
-            obj = frame.f_locals["self"]
-        except KeyError:
-            obj = None
         if hasattr(obj, "__del__"):
             obj = None
 
         if obj is None:
             if varname is not None:
-                coname = frame.f_code.co_name
-                if coname == "<module>":
-                    modules = frame.f_globals["__name__"]
-                    modules = modules.split(".")
-                    coname = modules[len(modules)-1]
                 coname = remove_underscore(coname)
-                l.insert(0, (coname, name_to_idx[coname]))
+                l.append((coname, name_to_idx[coname]))
                 name_to_idx[coname] += 1
         else:
-            classname = obj.__class__.__name__.lower()
-            try:
-                objs = classname_to_objs[classname]
-            except KeyError:
-                classname_to_objs[classname] = [obj]
-                idx = 0
-            else:
-                try:
-                    idx = index_id(objs, obj)
-                except ValueError:
-                    idx = len(objs)
-                    objs.append(obj)
+            classname, idx = _object_index(obj)
             classname = remove_underscore(classname)
-            l.insert(0, (classname, idx))
+            l.append((classname, idx))
 
         varname = None
-        frame = frame.f_back
+    l.reverse()
     return l
+
+
+def trace_back(varname=None):
+    return _resolve(varname, _capture(sys._getframe(2)))
+
+
+class Backtrace:
+    """Backtrace taken by trace_back, resolved when ``get`` is first called
+
+    With ``lazy`` False, it is resolved right away.
+    """
+    def __init__(self, varname=None, depth=2):
+        self._value = None
+        _pending.append((self, varname, _capture(sys._getframe(depth))))
+        if not lazy:
+            resolve_pending()
+
+    def get(self):
+        if self._value is None:
+            resolve_pending()
+        return self._value
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.get(), memo)
+
+
+def resolve_pending():
+    global _pending
+    pending, _pending = _pending, []
+    for backtrace, varname, frames in pending:
+        backtrace._value = _resolve(varname, frames)
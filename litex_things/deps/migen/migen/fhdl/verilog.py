@@ -1,4 +1,3 @@
-from functools import partial
 from operator import itemgetter
 import collections.abc
 import logging
@@ -120,7 +119,7 @@ def _printexpr(ns, node):
 (_AT_BLOCKING, _AT_NONBLOCKING, _AT_SIGNAL) = range(3)
 
 
-def _printnode(ns, at, level, node):
+def _printnode(ns, at, level, node, write):
     if isinstance(node, _Assign):
         if at == _AT_BLOCKING:
             assignment = " = "
@@ -130,34 +129,31 @@ def _printnode(ns, at, level, node):
             assignment = " = "
         else:
             assignment = " <= "
-        return "\t"*level + _printexpr(ns, node.l)[0] + assignment + _printexpr(ns, node.r)[0] + ";\n"
+        write("\t"*level + _printexpr(ns, node.l)[0] + assignment + _printexpr(ns, node.r)[0] + ";\n")
     elif isinstance(node, collections.abc.Iterable):
-        return "".join(list(map(partial(_printnode, ns, at, level), node)))
+        for n in node:
+            _printnode(ns, at, level, n, write)
     elif isinstance(node, If):
-        r = "\t"*level + "if (" + _printexpr(ns, node.cond)[0] + ") begin\n"
-        r += _printnode(ns, at, level + 1, node.t)
+        write("\t"*level + "if (" + _printexpr(ns, node.cond)[0] + ") begin\n")
+        _printnode(ns, at, level + 1, node.t, write)
         if node.f:
-            r += "\t"*level + "end else begin\n"
-            r += _printnode(ns, at, level + 1, node.f)
-        r += "\t"*level + "end\n"
-        return r
+            write("\t"*level + "end else begin\n")
+            _printnode(ns, at, level + 1, node.f, write)
+        write("\t"*level + "end\n")
     elif isinstance(node, Case):
         if node.cases:
-            r = "\t"*level + "case (" + _printexpr(ns, node.test)[0] + ")\n"
+            write("\t"*level + "case (" + _printexpr(ns, node.test)[0] + ")\n")
             css = [(k, v) for k, v in node.cases.items() if isinstance(k, Constant)]
             css = sorted(css, key=lambda x: x[0].value)
             for choice, statements in css:
-                r += "\t"*(level + 1) + _printexpr(ns, choice)[0] + ": begin\n"
-                r += _printnode(ns, at, level + 2, statements)
-                r += "\t"*(level + 1) + "end\n"
+                write("\t"*(level + 1) + _printexpr(ns, choice)[0] + ": begin\n")
+                _printnode(ns, at, level + 2, statements, write)
+                write("\t"*(level + 1) + "end\n")
             if "default" in node.cases:
-                r += "\t"*(level + 1) + "default: begin\n"
-                r += _printnode(ns, at, level + 2, node.cases["default"])
-                r += "\t"*(level + 1) + "end\n"
-            r += "\t"*level + "endcase\n"
-            return r
-        else:
-            return ""
+                write("\t"*(level + 1) + "default: begin\n")
+                _printnode(ns, at, level + 2, node.cases["default"], write)
+                write("\t"*(level + 1) + "end\n")
+            write("\t"*level + "endcase\n")
     elif isinstance(node, Display):
         s = "\"" + node.s + "\""
         for arg in node.args:
@@ -166,9 +162,9 @@ def _printnode(ns, at, level, node):
                 s += ns.get_name(arg)
             else:
                 s += str(arg)
-        return "\t"*level + "$display(" + s + ");\n"
+        write("\t"*level + "$display(" + s + ");\n")
     elif isinstance(node, Finish):
-        return "\t"*level + "$finish;\n"
+        write("\t"*level + "$finish;\n")
     else:
         raise TypeError("Node of unrecognized type: "+str(type(node)))
 
@@ -207,108 +203,102 @@ def _printattr(attr, attr_translate):
     return r
 
 
-def _printheader(f, ios, name, ns, attr_translate):
+def _printheader(f, ios, name, ns, attr_translate, write):
     sigs = list_signals(f) | list_special_ios(f, True, True, True)
     special_outs = list_special_ios(f, False, True, True)
     inouts = list_special_ios(f, False, False, True)
     targets = list_targets(f) | special_outs
     wires, comb_regs = _list_comb_wires_regs(f)
     wires |= special_outs
-    r = "module " + name + "(\n"
+    write("module " + name + "(\n")
     firstp = True
     for sig in sorted(ios, key=lambda x: x.duid):
         if not firstp:
-            r += ",\n"
+            write(",\n")
         firstp = False
         attr = _printattr(sig.attr, attr_translate)
         if attr:
-            r += "\t" + attr
+            write("\t" + attr)
         if sig in inouts:
-            r += "\tinout " + _printsig(ns, sig)
+            write("\tinout " + _printsig(ns, sig))
         elif sig in targets:
             if sig in wires:
-                r += "\toutput " + _printsig(ns, sig)
+                write("\toutput " + _printsig(ns, sig))
             else:
-                r += "\toutput reg " + _printsig(ns, sig)
+                write("\toutput reg " + _printsig(ns, sig))
         else:
-            r += "\tinput " + _printsig(ns, sig)
-    r += "\n);\n\n"
+            write("\tinput " + _printsig(ns, sig))
+    write("\n);\n\n")
     for sig in sorted(sigs - ios, key=lambda x: x.duid):
         attr = _printattr(sig.attr, attr_translate)
         if attr:
-            r += attr + " "
+            write(attr + " ")
         if sig in wires:
-            r += "wire " + _printsig(ns, sig) + ";\n"
+            write("wire " + _printsig(ns, sig) + ";\n")
         else:
             if sig not in comb_regs:
-                r += "reg " + _printsig(ns, sig) + " = " + _printexpr(ns, sig.reset)[0] + ";\n"
+                write("reg " + _printsig(ns, sig) + " = " + _printexpr(ns, sig.reset)[0] + ";\n")
             else:
-                r += "reg " + _printsig(ns, sig) + ";\n"
-    r += "\n"
-    return r
+                write("reg " + _printsig(ns, sig) + ";\n")
+    write("\n")
 
 
-def _printcomb(f, ns, display_run):
-    r = ""
+def _printcomb(f, ns, display_run, write):
     if f.comb:
         # Add a dummy event (using a dummy signal 'dummy_s') to get the simulator
         # to run the combinatorial process once at the beginning.
         syn_off = "// synthesis translate_off\n"
         syn_on = "// synthesis translate_on\n"
         dummy_s = Signal(name_override="dummy_s")
-        r += syn_off
-        r += "reg " + _printsig(ns, dummy_s) + ";\n"
-        r += "initial " + ns.get_name(dummy_s) + " <= 1'd0;\n"
-        r += syn_on
-        r += "\n"
+        write(syn_off)
+        write("reg " + _printsig(ns, dummy_s) + ";\n")
+        write("initial " + ns.get_name(dummy_s) + " <= 1'd0;\n")
+        write(syn_on)
+        write("\n")
 
         groups = group_by_targets(f.comb)
 
         for n, g in enumerate(groups):
             if len(g[1]) == 1 and isinstance(g[1][0], _Assign):
-                r += "assign " + _printnode(ns, _AT_BLOCKING, 0, g[1][0])
+                write("assign ")
+                _printnode(ns, _AT_BLOCKING, 0, g[1][0], write)
             else:
                 dummy_d = Signal(name_override="dummy_d")
-                r += "\n" + syn_off
-                r += "reg " + _printsig(ns, dummy_d) + ";\n"
-                r += syn_on
+                write("\n" + syn_off)
+                write("reg " + _printsig(ns, dummy_d) + ";\n")
+                write(syn_on)
 
-                r += "always @(*) begin\n"
+                write("always @(*) begin\n")
                 if display_run:
-                    r += "\t$display(\"Running comb block #" + str(n) + "\");\n"
+                    write("\t$display(\"Running comb block #" + str(n) + "\");\n")
                 for t in sorted(g[0], key=lambda x: x.duid):
-                    r += "\t" + ns.get_name(t) + " <= " + _printexpr(ns, t.reset)[0] + ";\n"
-                r += _printnode(ns, _AT_NONBLOCKING, 1, g[1])
-
-                r += syn_off
-                r += "\t" + ns.get_name(dummy_d) + " <= " + ns.get_name(dummy_s) + ";\n"
-                r += syn_on
-                r += "end\n"
-    r += "\n"
-    return r
+                    write("\t" + ns.get_name(t) + " <= " + _printexpr(ns, t.reset)[0] + ";\n")
+                _printnode(ns, _AT_NONBLOCKING, 1, g[1], write)
 
+                write(syn_off)
+                write("\t" + ns.get_name(dummy_d) + " <= " + ns.get_name(dummy_s) + ";\n")
+                write(syn_on)
+                write("end\n")
+    write("\n")
 
-def _printsync(f, ns):
-    r = ""
+
+def _printsync(f, ns, write):
     for k, v in sorted(f.sync.items(), key=itemgetter(0)):
-        r += "always @(posedge " + ns.get_name(f.clock_domains[k].clk) + ") begin\n"
-        r += _printnode(ns, _AT_SIGNAL, 1, v)
-        r += "end\n\n"
-    return r
+        write("always @(posedge " + ns.get_name(f.clock_domains[k].clk) + ") begin\n")
+        _printnode(ns, _AT_SIGNAL, 1, v, write)
+        write("end\n\n")
 
 
-def _printspecials(overrides, specials, ns, add_data_file, attr_translate):
-    r = ""
+def _printspecials(overrides, specials, ns, add_data_file, attr_translate, write):
     for special in sorted(specials, key=lambda x: x.duid):
         if hasattr(special, "attr"):
             attr = _printattr(special.attr, attr_translate)
             if attr:
-                r += attr + " "
+                write(attr + " ")
         pr = call_special_classmethod(overrides, special, "emit_verilog", ns, add_data_file)
         if pr is None:
             raise NotImplementedError("Special " + str(special) + " failed to implement emit_verilog")
-        r += pr
-    return r
+        write(pr)
 
 
 class DummyAttrTranslate:
@@ -320,7 +310,8 @@ def convert(fi, ios=None, name="top",
   special_overrides=dict(),
   attr_translate=DummyAttrTranslate(),
   create_clock_domains=True,
-  display_run=False):
+  display_run=False,
+  streaming=False):
     r = ConvOutput()
     f = _Fragment()
     if not isinstance(fi, _Fragment):
@@ -361,13 +352,20 @@ def convert(fi, ios=None, name="top",
     ns.clock_domains = f.clock_domains
     r.ns = ns
 
-    src = "/* Machine-generated using Migen */\n"
-    src += _printheader(f, ios, name, ns, attr_translate)
-    src += _printcomb(f, ns, display_run=display_run)
-    src += _printsync(f, ns)
-    src += _printspecials(special_overrides, f.specials - lowered_specials,
-        ns, r.add_data_file, attr_translate)
-    src += "endmodule\n"
-    r.set_main_source(src)
+    def emit(write):
+        write("/* Machine-generated using Migen */\n")
+        _printheader(f, ios, name, ns, attr_translate, write)
+        _printcomb(f, ns, display_run, write)
+        _printsync(f, ns, write)
+        _printspecials(special_overrides, f.specials - lowered_specials,
+            ns, r.add_data_file, attr_translate, write)
+        write("endmodule\n")
+
+    if streaming:
+        r.set_main_source(emit)
+    else:
+        chunks = []
+        emit(chunks.append)
+        r.set_main_source("".join(chunks))
 
     return r
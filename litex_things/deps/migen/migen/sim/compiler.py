@@ -0,0 +1,461 @@
+import re
+import collections.abc
+from functools import partial
+
+from migen.fhdl.structure import *
+from migen.fhdl.structure import _Operator, _Slice, _Part, _ArrayProxy, _Assign
+from migen.fhdl.bitcontainer import value_bits_sign
+from migen.fhdl.specials import _MemoryLocation
+
+
+__all__ = ["StatementCompiler"]
+
+
+_binops = {
+    "+": "+",
+    "-": "-",
+    "*": "*",
+
+    ">>>": ">>",
+    "<<<": "<<",
+
+    "&": "&",
+    "^": "^",
+    "|": "|",
+
+    "<": "<",
+    "<=": "<=",
+    "==": "==",
+    "!=": "!=",
+    ">": ">",
+    ">=": ">=",
+}
+
+_comparisons = {"<", "<=", "==", "!=", ">", ">="}
+
+_int_re = re.compile(r"^(-?[0-9]+|\(-[0-9]+\))$")
+_simple_re = re.compile(r"^(-?[0-9]+|\(-[0-9]+\)|[A-Za-z_][A-Za-z0-9_]*)$")
+
+
+def _const(value):
+    if value < 0:
+        return "(" + str(value) + ")"
+    else:
+        return str(value)
+
+
+def _truncate_expr(expr, nbits, signed):
+    if _int_re.match(expr):
+        value = int(expr.strip("()")) & (2**nbits - 1)
+        if signed and value & 2**(nbits - 1):
+            value -= 2**nbits
+        return _const(value)
+    if signed:
+        half = 2**(nbits - 1)
+        return "((({} + {}) & {}) - {})".format(expr, half, 2**nbits - 1, half)
+    else:
+        return "({} & {})".format(expr, 2**nbits - 1)
+
+
+def _in_range(node):
+    # True when the value of node is known to be a non-negative integer
+    # that fits in len(node) bits, so that masking it is a no-op.
+    if isinstance(node, Signal):
+        return not node.signed and 0 <= node.reset.value < 2**node.nbits
+    elif isinstance(node, Constant):
+        return 0 <= node.value < 2**node.nbits
+    else:
+        return isinstance(node, (_Slice, _Part, Cat, Replicate))
+
+
+def _is_comparison(node):
+    return isinstance(node, _Operator) and node.op in _comparisons
+
+
+class _Function:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.lines = []
+        self.indent = 1
+        self.ntemps = 0
+
+    def source(self):
+        lines = self.lines or ["    pass"]
+        return "def {}({}):\n{}\n".format(self.name, self.args, "\n".join(lines))
+
+
+class StatementCompiler:
+    """Translate FHDL statements into Python functions
+
+    ``compile`` turns a statement list into a function taking no
+    arguments that has the same effect as ``Evaluator.execute`` on that
+    list. Signals are read from and written to the evaluator state, so
+    compiled functions and the interpreter can be freely mixed.
+    """
+    max_indent = 32
+    max_expr_depth = 32
+    max_if_chain = 8
+
+    def __init__(self, evaluator):
+        self.evaluator = evaluator
+        self.namespace = {
+            "_cur": evaluator.state.current,
+            "_nxt": evaluator.state.next,
+            "_mark": evaluator.state.dirty.append,
+            "_min": min,
+        }
+        self.nobjects = 0
+        self.nfunctions = 0
+        self.stack = []
+        self.sources = []
+        self.function_tables = []
+
+    def compile(self, statements):
+        return self.compile_many([statements])[0]
+
+    def compile_many(self, statement_lists):
+        names = [self._function(statements) for statements in statement_lists]
+        code = compile("\n".join(self.sources), "<migen.sim.compiler>", "exec")
+        self.sources = []
+        exec(code, self.namespace)
+        for table, functions in self.function_tables:
+            if isinstance(functions, dict):
+                self.namespace[table] = dict((k, self.namespace[name])
+                                             for k, name in functions.items())
+            else:
+                self.namespace[table] = tuple(self.namespace[name] for name in functions)
+        self.function_tables = []
+        return [self.namespace[name] for name in names]
+
+    # code generation helpers
+
+    def _emit(self, line):
+        fn = self.stack[-1]
+        fn.lines.append("    "*fn.indent + line)
+
+    def _temp(self, expr):
+        fn = self.stack[-1]
+        name = "_t{}".format(fn.ntemps)
+        fn.ntemps += 1
+        self._emit(name + " = " + expr)
+        return name
+
+    def _simple(self, expr):
+        if _simple_re.match(expr):
+            return expr
+        else:
+            return self._temp(expr)
+
+    def _bind(self, obj, prefix="_o"):
+        name = "{}{}".format(prefix, self.nobjects)
+        self.nobjects += 1
+        self.namespace[name] = obj
+        return name
+
+    def _push(self, args=""):
+        fn = _Function("_f{}".format(self.nfunctions), args)
+        self.nfunctions += 1
+        self.stack.append(fn)
+
+    def _pop(self):
+        fn = self.stack.pop()
+        self.sources.append(fn.source())
+        return fn.name
+
+    def _function(self, statements, args=""):
+        self._push(args)
+        self._statements(statements)
+        return self._pop()
+
+    # signal state access
+
+    def _signal(self, signal):
+        return str(self.evaluator.state.get_index(signal))
+
+    def _signal_table(self, signals):
+        get_index = self.evaluator.state.get_index
+        return self._bind(tuple(get_index(signal) for signal in signals), "_a")
+
+    def _read(self, signal, postcommit):
+        if postcommit:
+            return "_nxt[" + self._signal(signal) + "]"
+        else:
+            return "_cur[" + self._signal(signal) + "]"
+
+    def _read_table(self, table, index):
+        return "_cur[{}[{}]]".format(table, index)
+
+    def _write(self, signal, expr):
+        n = self._signal(signal)
+        self._emit("_nxt[{}] = {}".format(n, expr))
+        self._emit("_mark({})".format(n))
+
+    def _write_table(self, table, index, expr):
+        n = self._temp("{}[{}]".format(table, index))
+        self._emit("_nxt[{}] = {}".format(n, expr))
+        self._emit("_mark({})".format(n))
+
+    # expressions
+
+    def _expr(self, node, postcommit=False, depth=0):
+        if depth > self.max_expr_depth:
+            # keep the generated source within the limits of the Python parser
+            return self._temp(self._expr(node, postcommit))
+        depth += 1
+        if isinstance(node, Constant):
+            return _const(node.value)
+        elif isinstance(node, Signal):
+            return self._read(node, postcommit)
+        elif isinstance(node, _Operator):
+            operands = [self._expr(o, postcommit, depth) for o in node.operands]
+            if len(operands) == 1:
+                if node.op == "-":
+                    return "(-" + operands[0] + ")"
+                elif node.op == "~":
+                    return "(~" + operands[0] + ")"
+            elif len(operands) == 2 and node.op in _binops:
+                return "({} {} {})".format(operands[0], _binops[node.op], operands[1])
+            elif len(operands) == 3 and node.op == "m":
+                return "({1} if {0} else {2})".format(*operands)
+            return self._fallback_expr(node, postcommit)
+        elif isinstance(node, _Slice):
+            v = self._expr(node.value, postcommit, depth)
+            mask = 2**(node.stop - node.start) - 1
+            if node.start:
+                return "(({} >> {}) & {})".format(v, node.start, mask)
+            else:
+                return "({} & {})".format(v, mask)
+        elif isinstance(node, _Part):
+            v = self._expr(node.value, postcommit, depth)
+            offset = self._expr(node.offset, postcommit, depth)
+            return "(({} >> {}) & {})".format(v, offset, 2**node.width - 1)
+        elif isinstance(node, Cat):
+            terms = []
+            shift = 0
+            for element in node.l:
+                nbits = len(element)
+                term = self._expr(element, postcommit, depth)
+                if not _in_range(element):
+                    term = "({} & {})".format(term, 2**nbits - 1)
+                if shift:
+                    term = "({} << {})".format(term, shift)
+                terms.append(term)
+                shift += nbits
+            if not terms:
+                return "0"
+            return "(" + " | ".join(terms) + ")"
+        elif isinstance(node, Replicate):
+            nbits = len(node.v)
+            v = self._expr(node.v, postcommit, depth)
+            if not _in_range(node.v):
+                v = "({} & {})".format(v, 2**nbits - 1)
+            factor = sum(1 << i*nbits for i in range(node.n))
+            return "({} * {})".format(v, factor)
+        elif isinstance(node, _ArrayProxy):
+            key = self._expr(node.key, postcommit, depth)
+            index = "_min({}, {})".format(len(node.choices) - 1, key)
+            return self._choose(node.choices, index, postcommit)
+        elif isinstance(node, _MemoryLocation):
+            memory = self.evaluator.memories[node.memory]
+            index = self._expr(node.index, postcommit, depth)
+            address = "_min({}, {})".format(memory.last, index)
+            if postcommit:
+                return "{}({})".format(self._bind(memory.read_next, "_m"), address)
+            else:
+                # contents are only ever modified in place
+                return "{}({}, 0)".format(self._bind(memory.current.get, "_m"), address)
+        elif isinstance(node, ClockSignal):
+            return self._expr(self.evaluator.clock_domains[node.cd].clk,
+                              postcommit, depth)
+        elif isinstance(node, ResetSignal):
+            rst = self.evaluator.clock_domains[node.cd].rst
+            if rst is None:
+                if node.allow_reset_less:
+                    return "0"
+                else:
+                    raise ValueError("Attempted to get reset signal of resetless"
+                                     " domain '{}'".format(node.cd))
+            else:
+                return self._expr(rst, postcommit, depth)
+        else:
+            return self._fallback_expr(node, postcommit)
+
+    def _choose(self, choices, index, postcommit):
+        if not postcommit and all(isinstance(c, Signal) for c in choices):
+            return self._read_table(self._signal_table(choices), index)
+        elif all(isinstance(c, Constant) for c in choices):
+            table = self._bind(tuple(c.value for c in choices), "_a")
+            return "{}[{}]".format(table, index)
+        else:
+            readers = []
+            for choice in choices:
+                self._push()
+                self._emit("return " + self._expr(choice, postcommit))
+                readers.append(self._pop())
+            return "{}[{}]()".format(self._function_table(readers), index)
+
+    def _function_table(self, names):
+        # functions only exist once the generated source has been executed
+        table = self._bind(None, "_a")
+        self.function_tables.append((table, names))
+        return table
+
+    def _fallback_expr(self, node, postcommit):
+        return self._bind(partial(self.evaluator.eval, node, postcommit)) + "()"
+
+    # statements
+
+    def _statements(self, statements):
+        for s in statements:
+            if isinstance(s, _Assign):
+                value = self._expr(s.r)
+                if (isinstance(s.l, Signal) and not s.l.signed
+                        and _in_range(s.r) and len(s.r) <= s.l.nbits):
+                    # no truncation needed
+                    assert not s.l.variable
+                    self._write(s.l, value)
+                else:
+                    self._assign(s.l, value)
+            elif isinstance(s, If):
+                self._if(s)
+            elif isinstance(s, Case):
+                self._case(s)
+            elif isinstance(s, collections.abc.Iterable):
+                self._statements(s)
+            else:
+                # Display and friends are rare: leave them to the interpreter
+                self._emit(self._bind(partial(self.evaluator.execute, [s])) + "()")
+
+    def _body(self, statements):
+        fn = self.stack[-1]
+        fn.indent += 1
+        mark = len(fn.lines)
+        if fn.indent > self.max_indent:
+            self._emit(self._function(statements) + "()")
+        else:
+            self._statements(statements)
+        if len(fn.lines) == mark:
+            self._emit("pass")
+        fn.indent -= 1
+
+    def _cond(self, s):
+        cond = self._expr(s.cond)
+        if not _in_range(s.cond) and not _is_comparison(s.cond):
+            cond = "({} & {})".format(cond, 2**len(s.cond) - 1)
+        return cond
+
+    def _if(self, s):
+        fn = self.stack[-1]
+        self._emit("if " + self._cond(s) + ":")
+        self._body(s.t)
+        f = s.f
+        # flatten Elif chains so that they do not nest
+        while len(f) == 1 and isinstance(f[0], If):
+            mark = len(fn.lines)
+            cond = self._cond(f[0])
+            if len(fn.lines) != mark:
+                del fn.lines[mark:]
+                break
+            self._emit("elif " + cond + ":")
+            self._body(f[0].t)
+            f = f[0].f
+        if f:
+            self._emit("else:")
+            self._body(f)
+
+    def _case(self, s):
+        nbits, signed = value_bits_sign(s.test)
+        test = self._expr(s.test)
+        if signed or not _in_range(s.test):
+            test = _truncate_expr(test, nbits, signed)
+        test = self._simple(test)
+
+        cases = collections.OrderedDict()
+        default = None
+        for k, v in s.cases.items():
+            if isinstance(k, Constant):
+                # the interpreter executes the first matching case
+                cases.setdefault(k.value, v)
+            elif k == "default":
+                default = v
+
+        if len(cases) <= self.max_if_chain:
+            keyword = "if "
+            for value, statements in cases.items():
+                self._emit("{}{} == {}:".format(keyword, test, _const(value)))
+                self._body(statements)
+                keyword = "elif "
+            if default is not None:
+                if cases:
+                    self._emit("else:")
+                    self._body(default)
+                else:
+                    self._statements(default)
+        else:
+            table = dict((value, self._function(statements))
+                         for value, statements in cases.items())
+            if default is None:
+                default = []
+            default = self._function(default)
+            dispatch = self._bind(None, "_d")
+            self.function_tables.append((dispatch, table))
+            self._emit("{}.get({}, {})()".format(dispatch, test, default))
+
+    def _assign(self, node, value):
+        if isinstance(node, Signal):
+            assert not node.variable
+            self._write(node, _truncate_expr(value, node.nbits, node.signed))
+        elif isinstance(node, Cat):
+            value = self._simple(value)
+            shift = 0
+            for element in node.l:
+                nbits = len(element)
+                if shift:
+                    element_value = "(({} >> {}) & {})".format(value, shift, 2**nbits - 1)
+                else:
+                    element_value = "({} & {})".format(value, 2**nbits - 1)
+                self._assign(element, element_value)
+                shift += nbits
+        elif isinstance(node, _Slice):
+            full_value = self._expr(node.value, True)
+            # clear bits assigned to by the slice, then set them to the new value
+            keep = ~((2**node.stop - 1) - (2**node.start - 1))
+            value = "(({} & {}) | (({} & {}) << {}))".format(
+                full_value, _const(keep),
+                value, 2**(node.stop - node.start) - 1, node.start)
+            self._assign(node.value, value)
+        elif isinstance(node, _Part):
+            full_value = self._expr(node.value, True)
+            offset = self._simple(self._expr(node.offset, True))
+            value = "(({0} & ~((1 << ({1} + {2})) - (1 << {1}))) | (({3} & {4}) << {1}))".format(
+                full_value, offset, node.width, value, 2**node.width - 1)
+            self._assign(node.value, value)
+        elif isinstance(node, _ArrayProxy):
+            key = self._expr(node.key)
+            index = "_min({}, {})".format(len(node.choices) - 1, key)
+            self._assign_choice(node.choices, index, value)
+        elif isinstance(node, _MemoryLocation):
+            memory = self.evaluator.memories[node.memory]
+            self._emit("{}(_min({}, {}), {})".format(
+                self._bind(memory.write, "_m"), memory.last,
+                self._expr(node.index), value))
+        else:
+            self._emit("{}({})".format(
+                self._bind(partial(self.evaluator.assign, node)), value))
+
+    def _assign_choice(self, choices, index, value):
+        value = self._simple(value)
+        shapes = set((c.nbits, c.signed) if isinstance(c, Signal) else None
+                     for c in choices)
+        if len(shapes) == 1 and None not in shapes:
+            nbits, signed = shapes.pop()
+            self._write_table(self._signal_table(choices), index,
+                              _truncate_expr(value, nbits, signed))
+        else:
+            writers = []
+            for choice in choices:
+                self._push("value")
+                self._assign(choice, "value")
+                writers.append(self._pop())
+            self._emit("{}[{}]({})".format(self._function_table(writers), index, value))
@@ -1,20 +1,73 @@
+import os
 import operator
 import collections.abc
 import inspect
-from functools import wraps
+import heapq
+from functools import wraps, partial
 
 from migen.fhdl.structure import *
 from migen.fhdl.structure import (_Value, _Statement,
                                   _Operator, _Slice, _Part, _ArrayProxy,
                                   _Assign, _Fragment)
 from migen.fhdl.bitcontainer import value_bits_sign
-from migen.fhdl.tools import (list_targets, list_signals,
+from migen.fhdl.tools import (list_targets, list_signals, list_inputs,
+                              list_clock_domains_expr, group_by_targets,
                               insert_resets, lower_specials)
-from migen.fhdl.simplify import MemoryToArray
 from migen.fhdl.specials import _MemoryLocation
 from migen.fhdl.module import Module
 from migen.genlib.resetsync import AsyncResetSynchronizer
 from migen.sim.vcd import VCDWriter, DummyVCDWriter
+from migen.sim.memory import MemoryState, lower_memories, list_memory_reads
+from migen.sim.compiler import StatementCompiler
+
+
+def _strongly_connected_components(successors):
+    # Tarjan's algorithm, without recursion so that long chains of
+    # combinatorial logic do not hit the Python stack limit.
+    # Components are returned in topological order.
+    index = [None]*len(successors)
+    lowlink = [0]*len(successors)
+    on_stack = [False]*len(successors)
+    stack = []
+    components = []
+    counter = 0
+    for root in range(len(successors)):
+        if index[root] is not None:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work[-1]
+            if i == 0:
+                index[v] = lowlink[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            succ = successors[v]
+            while i < len(succ):
+                w = succ[i]
+                i += 1
+                if index[w] is None:
+                    work[-1] = (v, i)
+                    work.append((w, 0))
+                    break
+                elif on_stack[w]:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                work.pop()
+                if lowlink[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(component)
+                if work:
+                    u = work[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+    components.reverse()
+    return components
 
 
 class ClockState:
@@ -88,35 +141,73 @@ def _truncate(value, nbits, signed):
     return value
 
 
+class SignalState:
+    """Values of the simulated signals
+
+    Each signal is given a dense index, in the order in which it is added.
+    ``current`` holds the committed values and ``next`` the values they
+    take at the next commit. Writes record the index in ``dirty`` so that
+    committing only looks at the signals that have been written to.
+    ``current`` and ``next`` are only ever modified in place.
+    """
+    def __init__(self):
+        self.index = dict()
+        self.signals = []
+        self.current = []
+        self.next = []
+        self.dirty = []
+
+    def add(self, signal):
+        n = len(self.signals)
+        self.index[signal] = n
+        self.signals.append(signal)
+        self.current.append(signal.reset.value)
+        self.next.append(signal.reset.value)
+        return n
+
+    def get_index(self, signal):
+        try:
+            return self.index[signal]
+        except KeyError:
+            return self.add(signal)
+
+    def commit(self):
+        current, next = self.current, self.next
+        r = []
+        for n in self.dirty:
+            value = next[n]
+            if current[n] != value:
+                current[n] = value
+                r.append(n)
+        del self.dirty[:]
+        return r
+
+
 class Evaluator:
-    def __init__(self, clock_domains, replaced_memories):
+    def __init__(self, clock_domains, memories):
         self.clock_domains = clock_domains
-        self.replaced_memories = replaced_memories
-        self.signal_values = dict()
-        self.modifications = dict()
+        self.state = SignalState()
+        self.dirty_memories = []
+        self.memories = dict((memory, MemoryState(memory, self.dirty_memories))
+                             for memory in memories)
 
     def commit(self):
-        r = set()
-        for k, v in self.modifications.items():
-            if k not in self.signal_values or self.signal_values[k] != v:
-                self.signal_values[k] = v
-                r.add(k)
-        self.modifications.clear()
+        return self.state.commit()
+
+    def commit_memories(self):
+        r = [memory.memory for memory in self.dirty_memories if memory.commit()]
+        del self.dirty_memories[:]
         return r
 
     def eval(self, node, postcommit=False):
         if isinstance(node, Constant):
             return node.value
         elif isinstance(node, Signal):
+            n = self.state.get_index(node)
             if postcommit:
-                try:
-                    return self.modifications[node]
-                except KeyError:
-                    pass
-            try:
-                return self.signal_values[node]
-            except KeyError:
-                return node.reset.value
+                return self.state.next[n]
+            else:
+                return self.state.current[n]
         elif isinstance(node, _Operator):
             operands = [self.eval(o, postcommit) for o in node.operands]
             if node.op == "-":
@@ -154,8 +245,12 @@ class Evaluator:
             idx = min(len(node.choices) - 1, self.eval(node.key, postcommit))
             return self.eval(node.choices[idx], postcommit)
         elif isinstance(node, _MemoryLocation):
-            array = self.replaced_memories[node.memory]
-            return self.eval(array[self.eval(node.index, postcommit)], postcommit)
+            memory = self.memories[node.memory]
+            address = memory.address(self.eval(node.index, postcommit))
+            if postcommit:
+                return memory.read_next(address)
+            else:
+                return memory.read(address)
         elif isinstance(node, ClockSignal):
             return self.eval(self.clock_domains[node.cd].clk, postcommit)
         elif isinstance(node, ResetSignal):
@@ -174,8 +269,9 @@ class Evaluator:
     def assign(self, node, value):
         if isinstance(node, Signal):
             assert not node.variable
-            self.modifications[node] = _truncate(value,
-                                                 node.nbits, node.signed)
+            n = self.state.get_index(node)
+            self.state.next[n] = _truncate(value, node.nbits, node.signed)
+            self.state.dirty.append(n)
         elif isinstance(node, Cat):
             for element in node.l:
                 nbits = len(element)
@@ -202,11 +298,18 @@ class Evaluator:
             idx = min(len(node.choices) - 1, self.eval(node.key))
             self.assign(node.choices[idx], value)
         elif isinstance(node, _MemoryLocation):
-            array = self.replaced_memories[node.memory]
-            self.assign(array[self.eval(node.index)], value)
+            memory = self.memories[node.memory]
+            memory.write(memory.address(self.eval(node.index)), value)
         else:
             raise NotImplementedError(node)
 
+    def compile(self, statements):
+        return self.compile_many([statements])[0]
+
+    def compile_many(self, statement_lists):
+        return [partial(self.execute, statements)
+                for statements in statement_lists]
+
     def execute(self, statements):
         for s in statements:
             if isinstance(s, _Assign):
@@ -234,7 +337,7 @@ class Evaluator:
                 for arg in s.args:
                     assert isinstance(arg, _Value)
                     try:
-                        args.append(self.signal_values[arg])
+                        args.append(self.state.current[self.state.index[arg]])
                     except: # not yet evaluated
                         args.append(arg.reset.value)
                 print(s.s %(*args,))
@@ -242,6 +345,28 @@ class Evaluator:
                 raise NotImplementedError
 
 
+class CompiledEvaluator(Evaluator):
+    """Evaluator that translates statement lists into Python functions
+
+    ``compile`` returns a function equivalent to calling ``execute`` on the
+    statement list, without walking the FHDL tree every time it runs.
+    Single evaluations and assignments requested by generators still go
+    through the interpreter.
+    """
+    def __init__(self, clock_domains, memories):
+        Evaluator.__init__(self, clock_domains, memories)
+        self.compiler = StatementCompiler(self)
+
+    def compile_many(self, statement_lists):
+        return self.compiler.compile_many(statement_lists)
+
+
+engines = {
+    "interpreted": Evaluator,
+    "compiled": CompiledEvaluator,
+}
+
+
 class DummyAsyncResetSynchronizerImpl(Module):
     def __init__(self, cd, async_reset):
         # TODO: asynchronous set
@@ -259,14 +384,14 @@ class DummyAsyncResetSynchronizer:
 # TODO: instances via Iverilog/VPI
 class Simulator:
     def __init__(self, fragment_or_module, generators, clocks={"sys": 10}, vcd_name=None,
-                 special_overrides={}):
+                 special_overrides={}, engine=None, vcd_memory_depth=0):
         if isinstance(fragment_or_module, _Fragment):
             self.fragment = fragment_or_module
         else:
             self.fragment = fragment_or_module.get_fragment()
 
-        mta = MemoryToArray()
-        mta.transform_fragment(None, self.fragment)
+        # memories are simulated natively, without a signal per word
+        memories = lower_memories(self.fragment)
 
         overrides = {AsyncResetSynchronizer: DummyAsyncResetSynchronizer}
         overrides.update(special_overrides)
@@ -298,23 +423,51 @@ class Simulator:
         # comb signals return to their reset value if nothing assigns them
         self.fragment.comb[0:0] = [s.eq(s.reset)
                                    for s in list_targets(self.fragment.comb)]
-        self.evaluator = Evaluator(self.fragment.clock_domains,
-                                   mta.replacements)
+        if engine is None:
+            engine = os.environ.get("MIGEN_SIM_ENGINE", "interpreted")
+        try:
+            evaluator_cls = engines[engine]
+        except KeyError:
+            raise ValueError("Unknown simulator engine: '{}'".format(engine))
+        self.evaluator = evaluator_cls(self.fragment.clock_domains, memories)
+        self.memories = self.evaluator.memories
+
+        signals = list_signals(self.fragment)
+        for cd in self.fragment.clock_domains:
+            signals.add(cd.clk)
+            if cd.rst is not None:
+                signals.add(cd.rst)
+        signals = sorted(signals, key=lambda x: x.duid)
+        for signal in signals:
+            self.evaluator.state.add(signal)
+
+        self._build_comb_groups()
+        self.sync = dict((cd, self.evaluator.compile(statements))
+                         for cd, statements in self.fragment.sync.items())
 
         if vcd_name is None:
             self.vcd = DummyVCDWriter()
         else:
-            self.vcd = VCDWriter(vcd_name)
-
-            signals = list_signals(self.fragment)
-            for cd in self.fragment.clock_domains:
-                signals.add(cd.clk)
-                if cd.rst is not None:
-                    signals.add(cd.rst)
-            for memory_array in mta.replacements.values():
-                signals |= set(memory_array)
-            for signal in sorted(signals, key=lambda x: x.duid):
+            if isinstance(vcd_name, str):
+                self.vcd = VCDWriter(vcd_name)
+            else:
+                # a writer object, e.g. VCDWriter with filtering options
+                self.vcd = vcd_name
+            for signal in signals:
                 self.vcd.set(signal, signal.reset.value)
+            for memory in self.memories.values():
+                if memory.memory.depth <= vcd_memory_depth:
+                    self._trace_memory(memory)
+
+    def _trace_memory(self, memory):
+        # signals only seen by the VCD writer, one per word, with the names
+        # MemoryToArray gives them
+        mem = memory.memory
+        words = [Signal(mem.width, name_override="{}_data_{}".format(mem.name_override, i))
+                 for i in range(mem.depth)]
+        for address, value in enumerate(memory.dump()):
+            self.vcd.set(words[address], value)
+        memory.trace = lambda address, value: self.vcd.set(words[address], value)
 
     def __enter__(self):
         return self
@@ -325,17 +478,105 @@ class Simulator:
     def close(self):
         self.vcd.close()
 
-    def _commit_and_comb_propagate(self):
-        # TODO: optimize
-        all_modified = set()
+    def _build_comb_groups(self):
+        # Statements are grouped by the signals they drive. A group only
+        # needs to run again when one of the signals it reads has changed,
+        # and groups are run in topological order of their dependencies.
+        groups = group_by_targets(self.fragment.comb)
+        drivers = dict()
+        for n, (targets, statements) in enumerate(groups):
+            for target in targets:
+                drivers[target] = n
+        inputs = []
+        memory_readers = dict()
+        successors = [set() for _ in groups]
+        for n, (targets, statements) in enumerate(groups):
+            group_inputs = list_inputs(statements)
+            memories, memory_inputs = list_memory_reads(statements)
+            group_inputs |= memory_inputs
+            for memory in memories:
+                memory_readers.setdefault(memory, set()).add(n)
+            for cd in list_clock_domains_expr(statements):
+                if cd in self.fragment.clock_domains:
+                    cd = self.fragment.clock_domains[cd]
+                    group_inputs.add(cd.clk)
+                    if cd.rst is not None:
+                        group_inputs.add(cd.rst)
+            inputs.append(group_inputs)
+            for signal in group_inputs:
+                if signal in drivers:
+                    successors[drivers[signal]].add(n)
+        components = _strongly_connected_components(
+            [sorted(succ) for succ in successors])
+
+        order = [n for component in components for n in component]
+        position = dict((n, i) for i, n in enumerate(order))
+        self.comb_groups = self.evaluator.compile_many(
+            [groups[n][1] for n in order])
+        # signals are referred to by their index in the evaluator state
+        get_index = self.evaluator.state.get_index
+        self.comb_drivers = dict((get_index(signal), position[n])
+                                 for signal, n in drivers.items())
+        self.comb_readers = dict()
+        for n in order:
+            for signal in inputs[n]:
+                self.comb_readers.setdefault(get_index(signal), []).append(position[n])
+        self.memory_readers = dict((memory, sorted(position[n] for n in readers))
+                                   for memory, readers in memory_readers.items())
+        # An acyclic group runs at most once per propagation. Groups that
+        # (seemingly) depend on themselves are allowed to iterate, but a
+        # loop that has not settled after each of its bits had a chance
+        # to change is reported instead of spinning forever.
+        self.comb_limits = [1]*len(order)
+        self.comb_loops = dict()
+        for component in components:
+            if len(component) == 1 and component[0] not in successors[component[0]]:
+                continue
+            targets = set()
+            for n in component:
+                targets |= groups[n][0]
+            limit = sum(len(target) for target in targets) + 2
+            for n in component:
+                self.comb_limits[position[n]] = limit
+                self.comb_loops[position[n]] = targets
+
+    def _commit_and_comb_propagate(self, everything=False):
         modified = self.evaluator.commit()
-        all_modified |= modified
-        while modified:
-            self.evaluator.execute(self.fragment.comb)
+        modified_memories = self.evaluator.commit_memories()
+        all_modified = set(modified)
+        if everything:
+            pending = set(range(len(self.comb_groups)))
+        else:
+            pending = set()
+            for m in modified:
+                pending.update(self.comb_readers.get(m, ()))
+                # a comb signal written from outside returns to the value
+                # its driving statements give it
+                if m in self.comb_drivers:
+                    pending.add(self.comb_drivers[m])
+            for memory in modified_memories:
+                pending.update(self.memory_readers.get(memory, ()))
+        queue = list(pending)
+        heapq.heapify(queue)
+        runs = dict()
+        while queue:
+            n = heapq.heappop(queue)
+            pending.remove(n)
+            runs[n] = runs.get(n, 0) + 1
+            if runs[n] > self.comb_limits[n]:
+                raise ValueError("Combinatorial loop does not settle",
+                                 sorted(self.comb_loops[n], key=lambda x: x.duid))
+            self.comb_groups[n]()
             modified = self.evaluator.commit()
-            all_modified |= modified
-        for signal in all_modified:
-            self.vcd.set(signal, self.evaluator.signal_values[signal])
+            all_modified.update(modified)
+            for m in modified:
+                for reader in self.comb_readers.get(m, ()):
+                    if reader not in pending:
+                        pending.add(reader)
+                        heapq.heappush(queue, reader)
+        state = self.evaluator.state
+        for m in all_modified:
+            self.vcd.set(state.signals[m], state.current[m])
 
     def _evalexec_nested_lists(self, x):
         if isinstance(x, list):
@@ -389,16 +630,15 @@ class Simulator:
         return False
 
     def run(self):
-        self.evaluator.execute(self.fragment.comb)
-        self._commit_and_comb_propagate()
+        self._commit_and_comb_propagate(everything=True)
 
         while True:
             dt, rising, falling = self.time.tick()
             self.vcd.delay(dt)
             for cd in rising:
                 self.evaluator.assign(self.fragment.clock_domains[cd].clk, 1)
-                if cd in self.fragment.sync:
-                    self.evaluator.execute(self.fragment.sync[cd])
+                if cd in self.sync:
+                    self.sync[cd]()
                 if cd in self.generators:
                     self._process_generators(cd)
             for cd in falling:
@@ -0,0 +1,156 @@
+from migen.fhdl.structure import *
+from migen.fhdl.specials import (Memory, _MemoryLocation, WRITE_FIRST,
+                                 NO_CHANGE)
+from migen.fhdl.visit import NodeVisitor
+from migen.fhdl.tools import list_inputs
+
+
+__all__ = ["MemoryState", "lower_memories", "list_memory_reads"]
+
+
+class MemoryState:
+    """Contents of a simulated memory
+
+    Only the words that are not zero are stored, in the ``current``
+    dictionary indexed by address. Like signals, words written during a
+    cycle are kept in ``next`` and only become visible at the next commit.
+    Addresses past the end of the memory select its last word.
+
+    ``load`` and ``dump`` let testbenches access the contents in bulk.
+    If ``trace`` is set, it is called with the address and new value of
+    each word that changes at a commit.
+    """
+    def __init__(self, memory, dirty):
+        self.memory = memory
+        self.mask = 2**memory.width - 1
+        self.last = memory.depth - 1
+        self.current = dict()
+        self.next = dict()
+        self.dirty = dirty
+        self.trace = None
+        if memory.init is not None:
+            for address, value in enumerate(memory.init):
+                value &= self.mask
+                if value:
+                    self.current[address] = value
+
+    def address(self, index):
+        return min(self.last, index)
+
+    def read(self, address):
+        return self.current.get(address, 0)
+
+    def read_next(self, address):
+        try:
+            return self.next[address]
+        except KeyError:
+            return self.current.get(address, 0)
+
+    def write(self, address, value):
+        if not self.next:
+            self.dirty.append(self)
+        self.next[address] = value & self.mask
+
+    def commit(self):
+        current = self.current
+        changed = False
+        for address, value in self.next.items():
+            if current.get(address, 0) != value:
+                changed = True
+                if value:
+                    current[address] = value
+                else:
+                    del current[address]
+                if self.trace is not None:
+                    self.trace(address, value)
+        self.next.clear()
+        return changed
+
+    def load(self, values, offset=0):
+        """Write ``values`` to consecutive words, starting at ``offset``"""
+        if offset + len(values) > self.memory.depth:
+            raise ValueError("Data does not fit in memory '{}'"
+                             .format(self.memory.name_override))
+        for address, value in enumerate(values, offset):
+            self.write(address, value)
+
+    def dump(self, start=0, stop=None):
+        """Words from ``start`` (included) to ``stop`` (excluded)"""
+        if stop is None:
+            stop = self.memory.depth
+        get = self.current.get
+        return [get(address, 0) for address in range(start, stop)]
+
+
+def lower_memories(f):
+    """Replace the memories of a fragment by statements on memory locations
+
+    The ports are translated into statements that read and write
+    ``memory[address]`` directly, with the same behavior as the ports of
+    a ``Memory`` in synthesis. Memories and their ports are removed from
+    the specials of the fragment, and the list of memories is returned.
+    """
+    memories = []
+    processed_ports = set()
+    for mem in f.specials:
+        if not isinstance(mem, Memory):
+            continue
+        memories.append(mem)
+        for port in mem.ports:
+            sync = f.sync.setdefault(port.clock.cd, [])
+
+            # read
+            if port.async_read:
+                f.comb.append(port.dat_r.eq(mem[port.adr]))
+            else:
+                if port.mode == WRITE_FIRST:
+                    adr_reg = Signal.like(port.adr)
+                    rd_stmt = adr_reg.eq(port.adr)
+                    f.comb.append(port.dat_r.eq(mem[adr_reg]))
+                elif port.mode == NO_CHANGE and port.we is not None:
+                    rd_stmt = If(~port.we, port.dat_r.eq(mem[port.adr]))
+                else: # NO_CHANGE without write capability reduces to READ_FIRST
+                    rd_stmt = port.dat_r.eq(mem[port.adr])
+                if port.re is None:
+                    sync.append(rd_stmt)
+                else:
+                    sync.append(If(port.re, rd_stmt))
+
+            # write
+            if port.we is not None:
+                if port.we_granularity:
+                    n = mem.width//port.we_granularity
+                    for i in range(n):
+                        m = i*port.we_granularity
+                        M = (i+1)*port.we_granularity
+                        sync.append(If(port.we[i],
+                                    mem[port.adr][m:M].eq(port.dat_w[m:M])))
+                else:
+                    sync.append(If(port.we,
+                                   mem[port.adr].eq(port.dat_w)))
+
+            processed_ports.add(port)
+
+    f.specials -= set(memories)
+    f.specials -= processed_ports
+    return memories
+
+
+class _MemoryReadLister(NodeVisitor):
+    def __init__(self):
+        self.memories = set()
+        self.inputs = set()
+
+    def visit_unknown(self, node):
+        if isinstance(node, _MemoryLocation):
+            self.memories.add(node.memory)
+            self.inputs |= list_inputs(node.index)
+            self.visit(node.index)
+
+
+def list_memory_reads(node):
+    """Memories accessed by ``node``, and the signals their addresses
+    depend on"""
+    lister = _MemoryReadLister()
+    lister.visit(node)
+    return lister.memories, lister.inputs
@@ -1,8 +1,5 @@
 from itertools import count
-import tempfile
-import os
-from collections import OrderedDict
-import shutil
+from fnmatch import fnmatchcase
 
 from migen.fhdl.namer import build_namespace
 
@@ -19,79 +16,153 @@ def vcd_codes():
 
 
 class VCDWriter:
-    def __init__(self, filename):
+    """Write signal value changes to a VCD file
+
+    Signals are registered by setting their initial value before the first
+    call to ``delay``. At that point the header is written, and value
+    changes are then streamed to the file, grouped by timestep, through a
+    write buffer of ``buffer_size`` characters.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the VCD file.
+    include : list of str or None
+        Only dump signals whose name matches one of these glob patterns
+        (all signals by default).
+    exclude : list of str or None
+        Do not dump signals whose name matches one of these glob patterns.
+    start : int or None
+        Only dump value changes from this simulation time on. The values
+        of all signals at that time are dumped first.
+    stop : int or None
+        Do not dump value changes after this simulation time.
+
+    Times are in the units of the simulator clock periods: with the
+    default ``{"sys": 10}`` clock, cycle ``n`` starts at time ``10*n``.
+    """
+    def __init__(self, filename, include=None, exclude=None,
+                 start=None, stop=None, buffer_size=2**20):
         self.filename = filename
-        self.buffer_file = tempfile.TemporaryFile(
-            dir=os.path.dirname(filename), mode="w+")
-        self.codegen = vcd_codes()
-        self.codes = OrderedDict()
+        self.include = include
+        self.exclude = exclude
+        self.start = start
+        self.stop = stop
+        self.buffer_size = buffer_size
+
+        self.out = open(filename, "w")
+        self.buffer = []
+        self.buffered = 0
+        self.initial_values = dict()
+        self.codes = None
         self.signal_values = dict()
+        self.changes = []
+        self.dumping = False
         self.t = 0
 
-    def _get_code(self, signal):
-        try:
-            code = self.codes[signal]
-        except KeyError:
-            code = next(self.codegen)
-            self.codes[signal] = code
-        return code
+    def _selected(self, name):
+        if self.include is not None:
+            if not any(fnmatchcase(name, pattern) for pattern in self.include):
+                return False
+        if self.exclude is not None:
+            if any(fnmatchcase(name, pattern) for pattern in self.exclude):
+                return False
+        return True
 
-    def _write_primitive_value(self, f, signal, value):
+    def _format_value(self, signal, code, value):
+        if hasattr(signal, "_enumeration"):
+            val = "b"
+            for c in signal._enumeration[value].encode():
+                val += "{:08b}".format(c)
+            return val + " " + code + "\n"
         l = len(signal)
         if value < 0:
             value += 2**l
         if l > 1:
-            fmtstr = "b{:0" + str(l) + "b} {}\n"
-        else:
-            fmtstr = "{}{}\n"
-        code = self._get_code(signal)
-        f.write(fmtstr.format(value, code))
-
-    def _write_enum_value(self, f, signal, value):
-        val = "b"
-        for c in signal._enumeration[value].encode():
-            val += "{:08b}".format(c)
-        code = self._get_code(signal)
-        f.write("{} {}\n".format(val, code))
-
-    def _write_value(self, f, signal, value):
-        if hasattr(signal, "_enumeration"):
-            self._write_enum_value(self.buffer_file, signal, value)
+            return "b" + format(value, "b") + " " + code + "\n"
         else:
-            self._write_primitive_value(self.buffer_file, signal, value)
+            return str(value) + code + "\n"
+
+    def _write_header(self):
+        signals = list(self.initial_values.keys())
+        ns = build_namespace(signals)
+        codegen = vcd_codes()
+        self.codes = dict()
+        header = []
+        for signal in signals:
+            name = ns.get_name(signal)
+            if not self._selected(name):
+                continue
+            code = next(codegen)
+            self.codes[signal] = code
+            if hasattr(signal, "_enumeration"):
+                size = max([len(v) for v in signal._enumeration.values()])*8
+            else:
+                size = len(signal)
+            header.append("$var wire {size} {code} {name} $end\n"
+                          .format(name=name, code=code, size=size))
+        header.append("$enddefinitions $end\n")
+        self._write("".join(header))
+        for signal in self.codes.keys():
+            self.signal_values[signal] = self.initial_values[signal]
+        self.initial_values = None
+
+    def _dumpvars(self):
+        r = ["#{}\n".format(self.t), "$dumpvars\n"]
+        for signal, code in self.codes.items():
+            r.append(self._format_value(signal, code, self.signal_values[signal]))
+        r.append("$end\n")
+        self._write("".join(r))
+
+    def _write(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        self.out.write("".join(self.buffer))
+        self.buffer = []
+        self.buffered = 0
+
+    def _end_timestep(self):
+        if self.codes is None:
+            self._write_header()
+        if not self.dumping:
+            if ((self.start is None or self.t >= self.start)
+                    and (self.stop is None or self.t <= self.stop)):
+                self._dumpvars()
+                self.dumping = True
+        elif self.changes:
+            if self.stop is None or self.t <= self.stop:
+                self._write("#{}\n".format(self.t) + "".join(self.changes))
+            else:
+                self.dumping = False
+        self.changes = []
 
     def set(self, signal, value):
-        if signal not in self.signal_values or self.signal_values[signal] != value:
-            self._write_value(self.buffer_file, signal, value)
+        if self.codes is None:
+            self.initial_values[signal] = value
+            return
+        code = self.codes.get(signal)
+        if code is None:
+            # not selected, or not registered before the header was written
+            return
+        if self.signal_values[signal] != value:
             self.signal_values[signal] = value
+            if self.dumping:
+                self.changes.append(self._format_value(signal, code, value))
 
     def delay(self, delay):
+        self._end_timestep()
         self.t += delay
-        self.buffer_file.write("#{}\n".format(self.t))
 
     def close(self):
-        out = open(self.filename, "w")
         try:
-            ns = build_namespace(self.codes.keys())
-            for signal, code in self.codes.items():
-                name = ns.get_name(signal)
-                if hasattr(signal, "_enumeration"):
-                    size = max([len(v) for v in signal._enumeration.values()])*8
-                else:
-                    size = len(signal)
-                out.write("$var wire {size} {code} {name} $end\n"
-                          .format(name=name, code=code, size=size))
-            out.write("$dumpvars\n")
-            for signal in self.codes.keys():
-                self._write_value(out, signal, signal.reset.value)
-            out.write("$end\n")
-            out.write("#0\n")
-
-            self.buffer_file.seek(0)
-            shutil.copyfileobj(self.buffer_file, out)
-            self.buffer_file.close()
+            self._end_timestep()
+            self._flush()
         finally:
-            out.close()
+            self.out.close()
 
 
 class DummyVCDWriter:
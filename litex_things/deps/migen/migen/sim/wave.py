@@ -0,0 +1,377 @@
+"""Compact binary waveform files
+
+A waveform file stores the value changes of a set of signals in blocks
+covering consecutive time ranges. Within a block, the changes of each
+signal are compressed separately, and an index at the end of the file
+records where they are. A reader can therefore extract some signals over
+a time range without decompressing the rest of the file.
+
+Layout (integers are little-endian, varints are unsigned LEB128)::
+
+    magic         b"MWAV"
+    version       u8, 1
+    compression   u8, 0: none, 1: zlib, 2: lzma
+    reserved      u16
+    header length u32
+    header        UTF-8 JSON: {"timescale": str, "signals": [[name, width], ...]}
+    chunks        compressed value changes, one per signal and block
+    index         compressed varints: time at closing, number of blocks,
+                  then for each block its start time, end time - start
+                  time, number of chunks, and for each chunk its signal
+                  number, file offset, compressed length, number of
+                  changes and last value
+    index offset  u64
+    index length  u32
+    magic         b"MWAV"
+
+Once decompressed, a chunk is a sequence of varint pairs: the time elapsed
+since the previous change (since the block start time for the first one)
+and the new value, as an unsigned integer of the signal width.
+"""
+
+import json
+import struct
+import zlib
+from collections import OrderedDict
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+from migen.fhdl.namer import build_namespace
+
+
+__all__ = ["WaveFileWriter", "WaveFileReader", "WaveWriter"]
+
+
+_magic = b"MWAV"
+_version = 1
+_preamble = struct.Struct("<4sBBHI")
+_footer = struct.Struct("<QI4s")
+
+_compressions = {
+    "none": 0,
+    "zlib": 1,
+    "lzma": 2,
+}
+
+
+def _compressor(compression):
+    if compression == 0:
+        return lambda data: bytes(data), lambda data: data
+    elif compression == 1:
+        return zlib.compress, zlib.decompress
+    elif compression == 2:
+        if lzma is None:
+            raise ValueError("lzma compression is not available")
+        return lzma.compress, lzma.decompress
+    else:
+        raise ValueError("Unknown compression: {}".format(compression))
+
+
+def _write_varint(buf, value):
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varints(data):
+    r = []
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            r.append(value)
+            value = 0
+            shift = 0
+    return r
+
+
+class _Chunk:
+    def __init__(self, time):
+        self.data = bytearray()
+        self.time = time
+        self.count = 0
+        self.last = None
+
+
+class WaveFileWriter:
+    """Write value changes to a waveform file
+
+    Parameters
+    ----------
+    filename : str
+    signals : list of (str, int)
+        Name and width of each signal. Signals are referred to by their
+        position in this list.
+    timescale : str
+        Unit of the times, recorded in the header.
+    compression : str
+        ``"zlib"`` (default), ``"lzma"`` or ``"none"``.
+    block_size : int
+        Number of value changes after which a block is closed.
+    """
+    def __init__(self, filename, signals, timescale="1ps", compression="zlib",
+                 block_size=2**16):
+        try:
+            self.compression = _compressions[compression]
+        except KeyError:
+            raise ValueError("Unknown compression: '{}'".format(compression))
+        self.compress, _ = _compressor(self.compression)
+        self.masks = [2**width - 1 for name, width in signals]
+        self.block_size = block_size
+
+        self.out = open(filename, "wb")
+        header = json.dumps({
+            "timescale": timescale,
+            "signals": [[name, width] for name, width in signals]
+        }).encode("utf-8")
+        self.out.write(_preamble.pack(_magic, _version, self.compression, 0,
+                                      len(header)))
+        self.out.write(header)
+        self.offset = _preamble.size + len(header)
+
+        self.index = bytearray()
+        self.nblocks = 0
+        self.t = 0
+        self.block_start = None
+        self.block_end = None
+        self.block_changes = 0
+        self.chunks = dict()
+
+    def change(self, n, value):
+        """Record that signal ``n`` takes ``value`` at the current time"""
+        value &= self.masks[n]
+        try:
+            chunk = self.chunks[n]
+        except KeyError:
+            if self.block_start is None:
+                self.block_start = self.t
+            chunk = self.chunks[n] = _Chunk(self.block_start)
+        _write_varint(chunk.data, self.t - chunk.time)
+        _write_varint(chunk.data, value)
+        chunk.time = self.t
+        chunk.count += 1
+        chunk.last = value
+        self.block_end = self.t
+        self.block_changes += 1
+
+    def advance(self, t):
+        """Move the current time to ``t``"""
+        if t < self.t:
+            raise ValueError("Time cannot go backwards")
+        if t != self.t and self.block_changes >= self.block_size:
+            self._write_block()
+        self.t = t
+
+    def _write_block(self):
+        if not self.chunks:
+            return
+        _write_varint(self.index, self.block_start)
+        _write_varint(self.index, self.block_end - self.block_start)
+        _write_varint(self.index, len(self.chunks))
+        for n, chunk in sorted(self.chunks.items()):
+            data = self.compress(chunk.data)
+            self.out.write(data)
+            for value in n, self.offset, len(data), chunk.count, chunk.last:
+                _write_varint(self.index, value)
+            self.offset += len(data)
+        self.nblocks += 1
+        self.block_start = None
+        self.block_end = None
+        self.block_changes = 0
+        self.chunks = dict()
+
+    def close(self):
+        try:
+            self._write_block()
+            index = bytearray()
+            _write_varint(index, self.t)
+            _write_varint(index, self.nblocks)
+            index = self.compress(index + self.index)
+            self.out.write(index)
+            self.out.write(_footer.pack(self.offset, len(index), _magic))
+        finally:
+            self.out.close()
+
+
+class WaveFileReader:
+    """Read value changes from a waveform file
+
+    Only the header and the index are read when the file is opened. Value
+    changes are decompressed on demand, for the requested signals and the
+    blocks overlapping the requested time range.
+
+    Attributes
+    ----------
+    timescale : str
+    signals : list of (str, int)
+        Name and width of each signal.
+    start_time : int or None
+        Time of the first recorded change.
+    end_time : int
+        Time at which the file was closed.
+    """
+    def __init__(self, filename):
+        self.f = open(filename, "rb")
+        try:
+            self._read_index()
+        except:
+            self.f.close()
+            raise
+
+    def _read_index(self):
+        preamble = self.f.read(_preamble.size)
+        magic, version, compression, _, header_len = _preamble.unpack(preamble)
+        if magic != _magic:
+            raise ValueError("Not a waveform file")
+        if version != _version:
+            raise ValueError("Unsupported waveform file version {}".format(version))
+        _, self.decompress = _compressor(compression)
+        header = json.loads(self.f.read(header_len).decode("utf-8"))
+        self.timescale = header["timescale"]
+        self.signals = [(name, width) for name, width in header["signals"]]
+        self.names = dict((name, n) for n, (name, width) in enumerate(self.signals))
+
+        self.f.seek(-_footer.size, 2)
+        index_offset, index_len, magic = _footer.unpack(self.f.read(_footer.size))
+        if magic != _magic:
+            raise ValueError("Truncated waveform file")
+        self.f.seek(index_offset)
+        index = _read_varints(self.decompress(self.f.read(index_len)))
+
+        # blocks: (start, end, {signal: (offset, length, count, last)})
+        self.blocks = []
+        self.end_time, nblocks = index[:2]
+        i = 2
+        for _ in range(nblocks):
+            start, duration, nchunks = index[i:i+3]
+            i += 3
+            chunks = dict()
+            for _ in range(nchunks):
+                n, offset, length, count, last = index[i:i+5]
+                i += 5
+                chunks[n] = (offset, length, count, last)
+            self.blocks.append((start, start + duration, chunks))
+        self.start_time = self.blocks[0][0] if self.blocks else None
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _read_chunk(self, block_start, offset, length):
+        self.f.seek(offset)
+        values = _read_varints(self.decompress(self.f.read(length)))
+        t = block_start
+        r = []
+        for i in range(0, len(values), 2):
+            t += values[i]
+            r.append((t, values[i+1]))
+        return r
+
+    def read(self, names=None, start=None, stop=None):
+        """Value changes of some signals over a time range
+
+        Parameters
+        ----------
+        names : list of str or None
+            Signals to read (all signals by default).
+        start, stop : int or None
+            Time range, inclusive. When ``start`` is given, the value each
+            signal has at that time is reported as a change at ``start``.
+
+        Returns
+        -------
+        OrderedDict
+            List of ``(time, value)`` pairs, for each signal name.
+        """
+        if names is None:
+            names = [name for name, width in self.signals]
+        selected = [self.names[name] for name in names]
+        last = dict()
+        changes = dict((n, []) for n in selected)
+        for block_start, block_end, chunks in self.blocks:
+            if stop is not None and block_start > stop:
+                break
+            if start is not None and block_end < start:
+                # entirely before the range: the index has all we need
+                for n in selected:
+                    if n in chunks:
+                        last[n] = chunks[n][3]
+                continue
+            for n in selected:
+                if n not in chunks:
+                    continue
+                offset, length, count, _ = chunks[n]
+                for t, value in self._read_chunk(block_start, offset, length):
+                    if start is not None and t <= start:
+                        last[n] = value
+                    elif stop is None or t <= stop:
+                        changes[n].append((t, value))
+        r = OrderedDict()
+        for name, n in zip(names, selected):
+            if start is not None and n in last:
+                r[name] = [(start, last[n])] + changes[n]
+            else:
+                r[name] = changes[n]
+        return r
+
+
+class WaveWriter:
+    """Simulator output to a waveform file
+
+    Can be passed as ``vcd_name`` to ``Simulator``/``run_simulation`` in
+    place of a VCD file name. Like ``VCDWriter``, signals are registered by
+    setting their initial value before the first call to ``delay``.
+    Keyword arguments are passed to ``WaveFileWriter``.
+    """
+    def __init__(self, filename, **kwargs):
+        self.filename = filename
+        self.kwargs = kwargs
+        self.initial_values = OrderedDict()
+        self.writer = None
+        self.numbers = None
+        self.signal_values = dict()
+        self.t = 0
+
+    def _start(self):
+        signals = list(self.initial_values.keys())
+        ns = build_namespace(signals)
+        self.writer = WaveFileWriter(self.filename,
+            [(ns.get_name(signal), len(signal)) for signal in signals],
+            **self.kwargs)
+        self.numbers = dict((signal, n) for n, signal in enumerate(signals))
+        for n, (signal, value) in enumerate(self.initial_values.items()):
+            self.writer.change(n, value)
+            self.signal_values[signal] = value
+        self.initial_values = None
+
+    def set(self, signal, value):
+        if self.writer is None:
+            self.initial_values[signal] = value
+            return
+        n = self.numbers.get(signal)
+        if n is not None and self.signal_values[signal] != value:
+            self.signal_values[signal] = value
+            self.writer.change(n, value)
+
+    def delay(self, delay):
+        if self.writer is None:
+            self._start()
+        self.t += delay
+        self.writer.advance(self.t)
+
+    def close(self):
+        if self.writer is None:
+            self._start()
+        self.writer.close()
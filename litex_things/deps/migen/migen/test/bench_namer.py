@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# Namer run time: python3 -m migen.test.bench_namer [--signals N] [--reference]
+#
+# Names a synthetic SoC-like hierarchy: a top level with many module
+# types, a few instances of each, and the same signal names in all of
+# them, so that both the basic and the split-by-number trees are built.
+
+import argparse
+import time
+from unittest import mock
+
+from migen import *
+from migen.fhdl import namer
+from migen.fhdl.namer import build_namespace
+
+
+def hierarchy(n_signals, instances=4, leaves=("sink_valid", "sink_ready", "source_data", "sig")):
+    per_module = instances*len(leaves)*2
+    signals = []
+    for m in range(n_signals//per_module):
+        for i in range(instances):
+            for sub in "fifo", "converter":
+                for leaf in leaves:
+                    s = Signal()
+                    s.backtrace = [("soc", 0), ("module{}".format(m), i), (sub, 0), (leaf, 0)]
+                    signals.append(s)
+    return signals
+
+
+def run(signals):
+    start = time.perf_counter()
+    ns = build_namespace(signals)
+    names = [ns.get_name(s) for s in signals]
+    return time.perf_counter() - start, names
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signals", default=100000, type=int, help="number of signals")
+    parser.add_argument("--reference", action="store_true",
+                        help="also run the pairwise conflict detection (slow)")
+    args = parser.parse_args()
+
+    signals = hierarchy(args.signals)
+    elapsed, names = run(signals)
+    print("{} signals: {:.2f}s".format(len(signals), elapsed))
+    assert len(set(names)) == len(names)
+    if args.reference:
+        from migen.test.test_namer import _pairwise_set_use_name
+        with mock.patch.object(namer, "_set_use_name", _pairwise_set_use_name):
+            elapsed, reference_names = run(signals)
+        print("pairwise: {:.2f}s".format(elapsed))
+        assert names == reference_names
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Elaboration time: python3 -m migen.test.bench_tracer [--modules N]
+#
+# Builds a tree of modules creating signals the usual ways (attributes,
+# locals, lists, Records), then names all of them as the Verilog backend
+# does, so that backtraces are resolved.
+
+import argparse
+import time
+
+from migen import *
+from migen.fhdl.namer import build_namespace
+
+
+_layout = [("valid", 1), ("ready", 1), ("data", 32), ("first", 1), ("last", 1)]
+
+
+class Leaf(Module):
+    def __init__(self, n):
+        self.sink = Record(_layout)
+        self.source = Record(_layout)
+        self.regs = [Signal(8) for i in range(n)]
+        counter = Signal(16)
+        self.level = Signal(max=n + 1)
+        self.sync += counter.eq(counter + 1), self.level.eq(sum(self.regs))
+
+
+class Branch(Module):
+    def __init__(self, width, depth, n):
+        for i in range(width):
+            if depth > 1:
+                setattr(self.submodules, "branch{}".format(i), Branch(width, depth - 1, n))
+            else:
+                setattr(self.submodules, "leaf{}".format(i), Leaf(n))
+
+
+def signals(module):
+    r = []
+    for k, v in sorted(module.__dict__.items()):
+        if isinstance(v, Signal):
+            r.append(v)
+        elif isinstance(v, Record):
+            r += v.flatten()
+        elif isinstance(v, list):
+            r += [s for s in v if isinstance(s, Signal)]
+    for name, submodule in module._submodules:
+        r += signals(submodule)
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", default=8, type=int, help="submodules per module")
+    parser.add_argument("--depth", default=3, type=int, help="depth of the hierarchy")
+    parser.add_argument("--regs", default=16, type=int, help="register signals per leaf")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    top = Branch(args.width, args.depth, args.regs)
+    elaborated = time.perf_counter()
+    sigs = signals(top)
+    build_namespace(sigs)
+    named = time.perf_counter()
+    print("{} signals: elaboration {:.2f}s, naming {:.2f}s".format(
+        len(sigs), elaborated - start, named - elaborated))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Verilog generation time: python3 -m migen.test.bench_verilog [--blocks N] [--reference] [--write]
+#
+# Builds an SoC-like comb list: plain assignments, CSR-style read muxes
+# and bus decoders where many statements share targets, then times
+# group_by_targets alone and the whole conversion. With --write, also
+# compares the time and peak memory of converting and writing the design
+# to a file, with and without streaming.
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+from migen import *
+from migen.fhdl import verilog
+from migen.fhdl.tools import group_by_targets
+
+
+class Block(Module):
+    def __init__(self, n_regs=16):
+        self.adr = Signal(8)
+        self.dat_r = Signal(32)
+        self.we = Signal()
+        self.regs = [Signal(32) for i in range(n_regs)]
+        self.sel = Signal(n_regs)
+
+        ###
+
+        self.comb += [self.sel[i].eq(self.adr == i) for i in range(n_regs)]
+        self.comb += Case(self.adr, {i: self.dat_r.eq(r) for i, r in enumerate(self.regs)})
+        for i, r in enumerate(self.regs):
+            self.comb += If(self.we & self.sel[i], self.dat_r.eq(0))
+
+
+class SoC(Module):
+    def __init__(self, n_blocks):
+        self.dat_r = Signal(32)
+        for i in range(n_blocks):
+            block = Block()
+            setattr(self.submodules, "block{}".format(i), block)
+            self.comb += If(block.sel != 0, self.dat_r.eq(block.dat_r))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", default=200, type=int, help="number of register blocks")
+    parser.add_argument("--reference", action="store_true",
+                        help="also run the pairwise grouping")
+    parser.add_argument("--write", action="store_true",
+                        help="also convert to a file, with and without streaming")
+    args = parser.parse_args()
+
+    soc = SoC(args.blocks)
+    fragment = soc.get_fragment()
+    comb = fragment.comb
+    start = time.perf_counter()
+    groups = group_by_targets(comb)
+    print("{} statements, {} groups: {:.2f}s".format(
+        len(comb), len(groups), time.perf_counter() - start))
+    if args.reference:
+        from migen.test.test_tools import _pairwise_group_by_targets
+        start = time.perf_counter()
+        reference = _pairwise_group_by_targets(comb)
+        print("pairwise: {:.2f}s".format(time.perf_counter() - start))
+        assert [(list(t), s) for t, s in groups] == [(list(t), s) for t, s in reference]
+
+    start = time.perf_counter()
+    output = str(verilog.convert(fragment, ios={soc.dat_r}))
+    print("conversion: {:.2f}s".format(time.perf_counter() - start))
+    if args.reference:
+        with mock.patch.object(verilog, "group_by_targets", _pairwise_group_by_targets):
+            start = time.perf_counter()
+            reference_output = str(verilog.convert(fragment, ios={soc.dat_r}))
+            print("conversion, pairwise: {:.2f}s".format(time.perf_counter() - start))
+        assert output == reference_output
+
+    if args.write:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "top.v")
+            for streaming in False, True:
+                soc = SoC(args.blocks)
+                start = time.perf_counter()
+                verilog.convert(soc, ios=set(), streaming=streaming).write(filename)
+                elapsed = time.perf_counter() - start
+                soc = SoC(args.blocks)
+                tracemalloc.start()
+                verilog.convert(soc, ios=set(), streaming=streaming).write(filename)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print("convert and write{}: {:.2f}s, peak {:.1f} MB, {:.1f} MB written".format(
+                    ", streaming" if streaming else "", elapsed, peak/1e6,
+                    os.path.getsize(filename)/1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import unittest
+
+from migen import *
+
+
+class CombPropagationCase(unittest.TestCase):
+    def test_chain(self):
+        # statements are listed in the reverse order of their dependencies
+        dut = Module()
+        a = Signal(8)
+        stages = [Signal(8) for _ in range(10)]
+        for i in reversed(range(1, len(stages))):
+            dut.comb += stages[i].eq(stages[i-1] + 1)
+        dut.comb += stages[0].eq(a)
+
+        def gen():
+            for i in range(5):
+                yield a.eq(i)
+                yield
+                self.assertEqual((yield stages[-1]), i + 9)
+        run_simulation(dut, gen())
+
+    def test_settling_self_dependency(self):
+        # bits of a signal depending on other bits of the same signal
+        # form a loop at signal level, but settle
+        dut = Module()
+        a = Signal()
+        x = Signal(4)
+        dut.comb += [
+            x[0].eq(a),
+            x[1].eq(x[0]),
+            x[2].eq(~x[1]),
+            x[3].eq(x[2])
+        ]
+
+        def gen():
+            for i in range(4):
+                yield a.eq(i & 1)
+                yield
+                self.assertEqual((yield x), 0b0011 if i & 1 else 0b1100)
+        run_simulation(dut, gen())
+
+    def test_loop_detected(self):
+        dut = Module()
+        a = Signal()
+        b = Signal()
+        en = Signal()
+        dut.comb += [
+            a.eq(~b & en),
+            b.eq(a)
+        ]
+
+        def gen():
+            yield en.eq(1)
+            yield
+            yield
+        with self.assertRaises(ValueError):
+            run_simulation(dut, gen())
+
+    def test_comb_driver_wins(self):
+        dut = Module()
+        a = Signal(4)
+        b = Signal(4)
+        dut.comb += b.eq(a + 1)
+
+        def gen():
+            yield b.eq(7)
+            yield
+            self.assertEqual((yield b), 1)
+        run_simulation(dut, gen())
@@ -0,0 +1,70 @@
+import random
+import unittest
+from itertools import combinations
+from unittest import mock
+
+from migen import *
+from migen.fhdl import namer
+from migen.fhdl.namer import build_namespace
+
+
+def _pairwise_set_use_name(node, node_name=""):
+    # the original quadratic version, as a reference
+    cnames = [(k, _pairwise_set_use_name(v, k)) for k, v in node.children.items()]
+    for (c1_prefix, c1_names), (c2_prefix, c2_names) in combinations(cnames, 2):
+        if not c1_names.isdisjoint(c2_names):
+            node.children[c1_prefix].use_name = True
+            node.children[c2_prefix].use_name = True
+    r = set()
+    for c_prefix, c_names in cnames:
+        if node.children[c_prefix].use_name:
+            for c_name in c_names:
+                r.add((c_prefix, ) + c_name)
+        else:
+            r |= c_names
+    if node.signal_count > sum(c.signal_count for c in node.children.values()):
+        node.use_name = True
+        r.add((node_name, ))
+    return r
+
+
+def random_signals(seed, n):
+    rng = random.Random(seed)
+    signals = []
+    for i in range(n):
+        s = Signal()
+        s.backtrace = [(rng.choice(["core", "bus", "fifo", "ctrl"]), rng.randrange(4))
+                       for _ in range(rng.randrange(1, 5))]
+        s.backtrace.append((rng.choice(["data", "valid", "ready", "sig"]), 0))
+        if signals and rng.random() < 0.1:
+            s.related = rng.choice(signals)
+        signals.append(s)
+    return signals
+
+
+class NamerCase(unittest.TestCase):
+    def names(self, signals):
+        ns = build_namespace(signals)
+        return [ns.get_name(s) for s in signals]
+
+    def test_names(self):
+        signals = []
+        for path in [[("top", 0), ("a", 0), ("x", 0)],
+                     [("top", 0), ("b", 0), ("x", 0)],
+                     [("top", 0), ("b", 0), ("y", 0)],
+                     [("top", 0), ("fifo", 1), ("level", 0)],
+                     [("top", 0), ("fifo", 1), ("count", 0)],
+                     [("top", 0), ("fifo", 2), ("level", 0)],
+                     [("top", 0), ("fifo", 2), ("count", 0)]]:
+            s = Signal()
+            s.backtrace = path
+            signals.append(s)
+        self.assertEqual(self.names(signals), ["a_x", "b_x", "b_y", "fifo0_level", "fifo0_count",
+                                               "fifo1_level", "fifo1_count"])
+
+    def test_same_as_pairwise(self):
+        for seed in range(20):
+            signals = random_signals(seed, 300)
+            names = self.names(signals)
+            with mock.patch.object(namer, "_set_use_name", _pairwise_set_use_name):
+                self.assertEqual(names, self.names(signals))
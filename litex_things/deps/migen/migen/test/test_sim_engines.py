@@ -0,0 +1,107 @@
+import unittest
+from functools import reduce
+from operator import or_
+
+from migen import *
+
+
+class EngineTestBench(Module):
+    def __init__(self):
+        self.counter = Signal(8)
+        self.sync += self.counter.eq(self.counter + 1)
+
+        # signed arithmetic and comparisons
+        self.a = Signal((5, True))
+        self.b = Signal((7, True))
+        self.sum = Signal((8, True))
+        self.prod = Signal((12, True))
+        self.lt = Signal()
+        self.comb += [
+            self.a.eq(self.counter[:5]),
+            self.b.eq(-self.counter[2:]),
+            self.sum.eq(self.a + self.b),
+            self.prod.eq(self.a*self.b),
+            self.lt.eq(self.a < self.b)
+        ]
+
+        # slices, parts and concatenations as targets
+        self.word = Signal(16)
+        self.lo = Signal(4)
+        self.hi = Signal(4)
+        self.sync += [
+            self.word[4:12].eq(self.counter),
+            self.word.part(self.counter[:2], 3).eq(self.counter[5:]),
+            Cat(self.lo, self.hi).eq(Replicate(self.counter[0], 3) ^ self.counter)
+        ]
+
+        # arrays on both sides of assignments
+        self.regs = Array(Signal(8) for _ in range(5))
+        self.mixed = Array([Signal(3), Signal((4, True)), self.word[:6]])
+        self.sel = Signal(3)
+        self.rd = Signal(8)
+        self.rd_mixed = Signal(8)
+        self.comb += [
+            self.sel.eq(self.counter[3:6]),
+            self.rd.eq(self.regs[self.sel]),
+            self.rd_mixed.eq(self.mixed[self.sel])
+        ]
+        self.sync += [
+            self.regs[self.counter[:3]].eq(self.counter ^ 0x5a),
+            self.mixed[self.counter[1:3]].eq(self.counter)
+        ]
+
+        # large case statement and long Elif chain
+        self.case_out = Signal(8)
+        self.comb += Case(self.counter, dict(
+            [(i, self.case_out.eq(3*i)) for i in range(0, 64, 3)] +
+            [("default", self.case_out.eq(self.counter))]))
+        self.elif_out = Signal(8)
+        chain = If(self.counter == 0, self.elif_out.eq(1))
+        for i in range(1, 60):
+            chain = chain.Elif(self.counter == i, self.elif_out.eq(i ^ 0x3c))
+        self.comb += chain
+
+        # deep expression tree
+        self.wide_or = Signal(8)
+        self.comb += self.wide_or.eq(reduce(or_,
+            [Mux(self.counter == i, i, 0) for i in range(100)]))
+
+        # memory with synchronous and asynchronous read ports
+        self.specials.mem = Memory(16, 8, init=[1, 2, 3])
+        self.specials.wrport = self.mem.get_port(write_capable=True, we_granularity=8)
+        self.specials.rdport = self.mem.get_port(async_read=True)
+        self.comb += [
+            self.wrport.adr.eq(self.counter[1:4]),
+            self.wrport.dat_w.eq(Cat(self.counter, ~self.counter)),
+            self.wrport.we.eq(self.counter[4:6]),
+            self.rdport.adr.eq(self.counter[2:5])
+        ]
+
+        self.probes = [self.counter, self.a, self.b, self.sum, self.prod,
+                       self.lt, self.word, self.lo, self.hi, self.rd,
+                       self.rd_mixed, self.case_out, self.elif_out,
+                       self.wide_or, self.wrport.dat_r, self.rdport.dat_r]
+        self.probes += list(self.regs)
+
+
+class EngineCase(unittest.TestCase):
+    def trace(self, engine):
+        dut = EngineTestBench()
+        values = []
+        def gen():
+            for i in range(300):
+                values.append((yield dut.probes))
+                yield
+        run_simulation(dut, gen(), engine=engine)
+        return values
+
+    def test_compiled_matches_interpreted(self):
+        compiled = self.trace("compiled")
+        self.assertEqual(compiled, self.trace("interpreted"))
+        for values in compiled:
+            for value in values:
+                self.assertIs(type(value), int)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            run_simulation(Module(), [], engine="nonexistent")
@@ -0,0 +1,114 @@
+import os
+import re
+import tempfile
+import unittest
+
+from migen import *
+from migen.sim.core import Simulator
+from migen.sim.memory import MemoryState
+
+
+class MemoryStateCase(unittest.TestCase):
+    def test_commit(self):
+        mem = Memory(8, 16, init=[1, 0, 0x1ff])
+        dirty = []
+        state = MemoryState(mem, dirty)
+        self.assertEqual(state.current, {0: 1, 2: 0xff})
+        self.assertEqual(state.address(100), 15)
+
+        state.write(0, 0)
+        state.write(5, 0x105)
+        self.assertEqual(dirty, [state])
+        self.assertEqual(state.read(5), 0)
+        self.assertEqual(state.read_next(5), 5)
+        self.assertTrue(state.commit())
+        self.assertEqual(state.current, {2: 0xff, 5: 5})
+        self.assertEqual(state.next, {})
+
+        state.write(5, 5)
+        self.assertFalse(state.commit())
+
+    def test_load_dump(self):
+        mem = Memory(16, 8)
+        state = MemoryState(mem, [])
+        state.load([1, 2, 3], 4)
+        state.commit()
+        self.assertEqual(state.dump(), [0, 0, 0, 0, 1, 2, 3, 0])
+        self.assertEqual(state.dump(3, 6), [0, 1, 2])
+        with self.assertRaises(ValueError):
+            state.load([0]*4, 5)
+
+
+class MemoryDUT(Module):
+    def __init__(self, depth):
+        self.specials.mem = Memory(32, depth)
+        self.specials.wrport = self.mem.get_port(write_capable=True)
+        self.specials.rdport = self.mem.get_port(async_read=True)
+
+
+class SimulatedMemoryCase(unittest.TestCase):
+    def test_large_memory(self):
+        # no signal is created for the words of the memory
+        dut = MemoryDUT(2**24)
+
+        def gen():
+            yield dut.wrport.adr.eq(0xabcdef)
+            yield dut.wrport.dat_w.eq(0x12345678)
+            yield dut.wrport.we.eq(1)
+            yield
+            yield dut.wrport.we.eq(0)
+            yield dut.rdport.adr.eq(0xabcdef)
+            yield
+            self.assertEqual((yield dut.rdport.dat_r), 0x12345678)
+            self.assertEqual((yield dut.mem[0xabcdef]), 0x12345678)
+
+        with Simulator(dut, gen()) as sim:
+            sim.run()
+            self.assertEqual(sim.memories[dut.mem].current, {0xabcdef: 0x12345678})
+
+    def test_preload(self):
+        for engine in "interpreted", "compiled":
+            dut = MemoryDUT(64)
+
+            def gen():
+                for i in range(8):
+                    yield dut.rdport.adr.eq(i)
+                    yield
+                    self.assertEqual((yield dut.rdport.dat_r), 10*i)
+                yield dut.mem[3].eq(7)
+                yield
+                yield dut.rdport.adr.eq(3)
+                yield
+                self.assertEqual((yield dut.rdport.dat_r), 7)
+
+            with Simulator(dut, gen(), engine=engine) as sim:
+                sim.memories[dut.mem].load([10*i for i in range(8)])
+                sim.run()
+                self.assertEqual(sim.memories[dut.mem].dump(0, 5), [0, 10, 20, 7, 40])
+
+    def test_vcd(self):
+        def gen(dut):
+            yield dut.wrport.adr.eq(2)
+            yield dut.wrport.dat_w.eq(5)
+            yield dut.wrport.we.eq(1)
+            yield
+            yield dut.wrport.we.eq(0)
+            yield
+            yield
+
+        def dump(**kwargs):
+            dut = MemoryDUT(4)
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, "test.vcd")
+                run_simulation(dut, gen(dut), vcd_name=filename, **kwargs)
+                with open(filename) as f:
+                    return f.read()
+
+        self.assertNotIn("mem_data", dump())
+        self.assertNotIn("mem_data", dump(vcd_memory_depth=3))
+        header, body = dump(vcd_memory_depth=4).split("$enddefinitions $end\n")
+        codes = dict(re.findall(r"\$var wire 32 (\S+) (mem_data_\d) \$end", header))
+        self.assertEqual(sorted(codes.values()), ["mem_data_{}".format(i) for i in range(4)])
+        code = next(c for c, name in codes.items() if name == "mem_data_2")
+        self.assertIn("b0 " + code + "\n", body.split("$end\n")[0])
+        self.assertIn("b101 " + code + "\n", body.split("$end\n")[1])
@@ -0,0 +1,39 @@
+import unittest
+
+from migen import *
+from migen.sim.core import SignalState
+
+
+class SignalStateCase(unittest.TestCase):
+    def test_commit(self):
+        a = Signal(8, reset=3)
+        b = Signal(8)
+        state = SignalState()
+        self.assertEqual(state.add(a), 0)
+        self.assertEqual(state.get_index(b), 1)
+        self.assertEqual(state.get_index(a), 0)
+        self.assertEqual(state.current, [3, 0])
+
+        state.next[0] = 3
+        state.dirty.append(0)
+        state.next[1] = 5
+        state.dirty.append(1)
+        state.next[1] = 6
+        state.dirty.append(1)
+        self.assertEqual(state.commit(), [1])
+        self.assertEqual(state.current, [3, 6])
+        self.assertEqual(state.next, [3, 6])
+        self.assertEqual(state.dirty, [])
+        self.assertEqual(state.commit(), [])
+
+    def test_signal_outside_design(self):
+        # signals that are not part of the design can still be accessed
+        dut = Module()
+        a = Signal(4, reset=9)
+
+        def gen():
+            self.assertEqual((yield a), 9)
+            yield a.eq(2)
+            yield
+            self.assertEqual((yield a), 2)
+        run_simulation(dut, gen())
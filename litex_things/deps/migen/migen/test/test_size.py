@@ -1,6 +1,9 @@
 import unittest
+from unittest import mock
 
 from migen import *
+from migen.fhdl import bitcontainer
+from migen.fhdl.bitcontainer import value_bits_sign
 
 
 def _same_slices(a, b):
@@ -17,3 +20,28 @@ class SignalSizeCase(unittest.TestCase):
         self.assertEqual(len(self.s), 13)
         self.assertEqual(len(self.i), 8)
         self.assertEqual(len(self.j), 8)
+
+    def test_expressions(self):
+        a = Signal(8)
+        b = Signal((4, True))
+        self.assertEqual(value_bits_sign(a + b), (10, True))
+        self.assertEqual(value_bits_sign(a[2:5]), (3, False))
+        self.assertEqual(value_bits_sign(Cat(a, b, self.i)), (20, False))
+        self.assertEqual(value_bits_sign(Replicate(b, 3)), (12, False))
+        self.assertEqual(value_bits_sign(Array([a, b])[a]), (8, True))
+        self.assertEqual(value_bits_sign(Mux(a, a, b)), (9, True))
+
+    def test_cached(self):
+        a = Signal(8)
+        e = a
+        width = 8
+        for i in range(20):
+            # each level refers three times to the previous one
+            e = Cat(e + a, Replicate(e, 2) & e)
+            width = 3*width + 1
+        with mock.patch.object(bitcontainer, "_value_bits_sign",
+                               wraps=bitcontainer._value_bits_sign) as compute:
+            self.assertEqual(len(e), width)
+            self.assertEqual(compute.call_count, 4*20)
+            self.assertEqual(value_bits_sign(e), (width, False))
+            self.assertEqual(compute.call_count, 4*20)
@@ -0,0 +1,68 @@
+import random
+import unittest
+
+from migen import *
+from migen.fhdl.tools import group_by_targets, list_targets
+from migen.util.misc import flat_iteration
+
+
+def _pairwise_group_by_targets(sl):
+    # the original version, rebuilding the list of groups on each overlap
+    groups = []
+    seen = set()
+    for order, stmt in enumerate(flat_iteration(sl)):
+        targets = set(list_targets(stmt))
+        group = [(order, stmt)]
+        disjoint = targets.isdisjoint(seen)
+        seen |= targets
+        if not disjoint:
+            groups, old_groups = [], groups
+            for old_targets, old_group in old_groups:
+                if targets.isdisjoint(old_targets):
+                    groups.append((old_targets, old_group))
+                else:
+                    targets |= old_targets
+                    group += old_group
+        groups.append((targets, group))
+    return [(targets, [stmt for order, stmt in sorted(stmts, key=lambda x: x[0])])
+            for targets, stmts in groups]
+
+
+def random_comb(seed, n_statements, n_signals):
+    rng = random.Random(seed)
+    signals = [Signal(8) for i in range(n_signals)]
+    comb = []
+    for i in range(n_statements):
+        targets = rng.sample(signals, rng.randrange(0, 4))
+        stmts = [t.eq(rng.choice(signals)) for t in targets]
+        kind = rng.randrange(3)
+        if kind == 0 or not stmts:
+            comb += stmts
+        elif kind == 1:
+            comb.append(If(rng.choice(signals), *stmts))
+        else:
+            comb.append(Case(rng.choice(signals), {j: s for j, s in enumerate(stmts)}))
+    return comb
+
+
+class GroupByTargetsCase(unittest.TestCase):
+    def assertSameGroups(self, comb):
+        groups = group_by_targets(comb)
+        reference = _pairwise_group_by_targets(comb)
+        self.assertEqual([(list(targets), stmts) for targets, stmts in groups],
+                         [(list(targets), stmts) for targets, stmts in reference])
+
+    def test_groups(self):
+        a, b, c, d = [Signal() for i in range(4)]
+        comb = [a.eq(1), b.eq(a), If(c, d.eq(1)), If(a, c.eq(1), a.eq(0)), d.eq(0),
+                Case(b, {0: []}), If(b, c.eq(0), d.eq(1))]
+        groups = [(targets, [comb.index(stmt) for stmt in stmts])
+                  for targets, stmts in group_by_targets(comb)]
+        self.assertEqual(groups, [({b}, [1]), (set(), [5]), ({a, c, d}, [0, 2, 3, 4, 6])])
+
+    def test_same_as_pairwise(self):
+        for seed in range(20):
+            self.assertSameGroups(random_comb(seed, 200, 100))
+        # few large groups, with collisions in the target sets
+        for seed in range(5):
+            self.assertSameGroups(random_comb(seed, 500, 20))
@@ -0,0 +1,72 @@
+import copy
+import unittest
+
+from migen import *
+from migen.fhdl import tracer
+
+
+class Leaf(Module):
+    def __init__(self):
+        self.attribute = Signal()
+        local = Signal()
+        self.chained = chained = Signal()
+        self.signals = [local, Signal(name="named")]
+
+
+class Top(Module):
+    def __init__(self):
+        self.submodules.first = Leaf()
+        self.submodules.second = Leaf()
+
+
+class TracerCase(unittest.TestCase):
+    def tearDown(self):
+        tracer.lazy = False
+        tracer.resolve_pending()
+
+    def test_var_names(self):
+        leaf = Leaf()
+        self.assertEqual(leaf.attribute.backtrace[-1][0], "attribute")
+        self.assertEqual(leaf.signals[0].backtrace[-1][0], "local")
+        self.assertEqual(leaf.chained.backtrace[-1][0], "chained")
+        self.assertEqual(leaf.signals[1].backtrace[-1][0], "named")
+        cd_por = ClockDomain()
+        self.assertEqual(cd_por.name, "por")
+
+    def test_object_index(self):
+        tops = [Top() for i in range(3)]
+        indexes = [[s.backtrace[-2] for s in (top.first.attribute, top.second.attribute)]
+                   for top in tops]
+        first = indexes[0][0][1]
+        self.assertEqual(indexes, [[("leaf", first + 2*i), ("leaf", first + 2*i + 1)]
+                                   for i in range(3)])
+
+    def test_lazy(self):
+        def numbers(top):
+            return [[n for name, n in s.backtrace]
+                    for leaf in (top.first, top.second)
+                    for s in [leaf.attribute, leaf.chained] + leaf.signals]
+
+        def offsets(first, second):
+            return [[n2 - n1 for n1, n2 in zip(a, b)]
+                    for a, b in zip(numbers(first), numbers(second))]
+
+        def designs():
+            first = Top()
+            second = Top()
+            return first, second
+
+        eager = designs()
+        tracer.lazy = True
+        lazy = designs()
+        self.assertEqual(len(tracer._pending), 16)
+        # the second design is used first, but still numbered after the first one
+        second = numbers(lazy[1])
+        self.assertEqual(tracer._pending, [])
+        self.assertEqual(offsets(*lazy), offsets(*eager))
+        self.assertEqual(second, numbers(lazy[1]))
+
+    def test_copy(self):
+        tracer.lazy = True
+        s = Signal()
+        self.assertEqual(copy.deepcopy(s).backtrace, s.backtrace)
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from migen import *
+from migen.sim.vcd import VCDWriter
+
+
+class VCDTestBench(Module):
+    def __init__(self):
+        self.counter = Signal(4, name_override="counter")
+        self.parity = Signal(name_override="parity")
+        self.sync += self.counter.eq(self.counter + 1)
+        self.comb += self.parity.eq(self.counter[0])
+
+
+class VCDCase(unittest.TestCase):
+    def dump(self, **kwargs):
+        def gen():
+            for i in range(8):
+                yield
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, "test.vcd")
+            if kwargs:
+                vcd = VCDWriter(filename, **kwargs)
+            else:
+                vcd = filename
+            run_simulation(VCDTestBench(), gen(), vcd_name=vcd)
+            with open(filename) as f:
+                return f.read()
+
+    def test_header_and_changes(self):
+        vcd = self.dump()
+        header, body = vcd.split("$enddefinitions $end\n")
+        self.assertIn("$var wire 4 ! counter $end", header)
+        self.assertIn("$var wire 1 \" parity $end", header)
+        self.assertTrue(body.startswith("#0\n$dumpvars\nb0 !\n0\"\n"))
+        self.assertIn("#35\nb100 !\n0\"\n", body)
+
+    def test_filter(self):
+        vcd = self.dump(include=["c*", "p*", "sys_*"], exclude=["par*"])
+        self.assertIn("counter", vcd)
+        self.assertIn("sys_clk", vcd)
+        self.assertNotIn("parity", vcd)
+
+    def test_window(self):
+        vcd = self.dump(start=20, stop=40)
+        body = vcd.split("$enddefinitions $end\n")[1]
+        times = [int(line[1:]) for line in body.splitlines() if line.startswith("#")]
+        self.assertEqual(times, [20, 25, 30, 35, 40])
+        self.assertTrue(body.startswith("#20\n$dumpvars\nb10 !\n0\"\n"))
@@ -0,0 +1,54 @@
+import io
+import os
+import tempfile
+import unittest
+
+from migen import *
+from migen.fhdl import verilog
+
+
+class Design(Module):
+    def __init__(self):
+        self.specials.mem = Memory(8, 16, init=list(range(16)))
+        port = self.mem.get_port(write_capable=True)
+        self.specials += port
+        self.o = Signal(8)
+        self.comb += If(port.adr == 3, self.o.eq(port.dat_r))
+        self.sync += port.adr.eq(port.adr + 1)
+
+
+class StreamingCase(unittest.TestCase):
+    def setUp(self):
+        self.reference = verilog.convert(Design())
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_write(self):
+        output = verilog.convert(Design(), streaming=True)
+        self.assertEqual(output.data_files, {})
+        output.write("top.v")
+        with open("top.v") as f:
+            self.assertEqual(f.read(), self.reference.main_source)
+        self.assertEqual(output.data_files, self.reference.data_files)
+        for filename, content in output.data_files.items():
+            with open(filename) as f:
+                self.assertEqual(f.read(), content)
+        # read back from the file it was streamed to
+        self.assertEqual(output.main_source, self.reference.main_source)
+
+    def test_main_source(self):
+        output = verilog.convert(Design(), streaming=True)
+        self.assertEqual(str(output), str(self.reference))
+
+    def test_file_object(self):
+        output = verilog.convert(Design(), streaming=True)
+        f = io.StringIO()
+        output.write_main_source(f)
+        self.assertEqual(f.getvalue(), self.reference.main_source)
+        with self.assertRaises(ValueError):
+            output.main_source
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from migen import *
+from migen.sim.wave import WaveFileWriter, WaveFileReader, WaveWriter
+
+
+class WaveTestBench(Module):
+    def __init__(self):
+        self.counter = Signal(4, name_override="counter")
+        self.parity = Signal(name_override="parity")
+        self.signed = Signal((6, True), name_override="signed")
+        self.sync += self.counter.eq(self.counter + 1)
+        self.comb += [
+            self.parity.eq(self.counter[0]),
+            self.signed.eq(-self.counter)
+        ]
+
+
+class WaveCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "test.mwav")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_simulation(self):
+        def gen():
+            for i in range(8):
+                yield
+        run_simulation(WaveTestBench(), gen(),
+                       vcd_name=WaveWriter(self.filename, block_size=4))
+        with WaveFileReader(self.filename) as reader:
+            self.assertGreater(len(reader.blocks), 1)
+            changes = reader.read(["counter", "parity", "signed"])
+            self.assertEqual(changes["counter"][:3], [(0, 0), (5, 1), (15, 2)])
+            self.assertEqual(changes["parity"][:3], [(0, 0), (5, 1), (15, 0)])
+            self.assertEqual(changes["signed"][:2], [(0, 0), (5, 63)])
+
+    def test_time_range(self):
+        writer = WaveFileWriter(self.filename, [("a", 8), ("b", 16)],
+                                block_size=10)
+        for t in range(1000):
+            writer.advance(t)
+            writer.change(0, t)
+            if t % 100 == 0:
+                writer.change(1, t)
+        writer.close()
+        with WaveFileReader(self.filename) as reader:
+            self.assertEqual(reader.signals, [("a", 8), ("b", 16)])
+            self.assertEqual((reader.start_time, reader.end_time), (0, 999))
+            decompressed = []
+            read_chunk = reader._read_chunk
+            def spy(*args):
+                decompressed.append(args)
+                return read_chunk(*args)
+            reader._read_chunk = spy
+            changes = reader.read(start=505, stop=520)
+            self.assertEqual(changes["a"], [(t, t & 0xff) for t in range(505, 521)])
+            self.assertEqual(changes["b"], [(505, 500)])
+            self.assertLessEqual(len(decompressed), 3)
+
+    def test_compressions(self):
+        for compression in "none", "zlib", "lzma":
+            writer = WaveFileWriter(self.filename, [("a", 3)],
+                                    compression=compression)
+            writer.change(0, -1)
+            writer.advance(4)
+            writer.change(0, 2)
+            writer.close()
+            with WaveFileReader(self.filename) as reader:
+                self.assertEqual(reader.read()["a"], [(0, 7), (4, 2)])
+        with self.assertRaises(ValueError):
+            WaveFileWriter(self.filename, [], compression="bogus")
@@ -161,6 +161,7 @@ class DummyUsb(Module):
         debug_sink_data = Signal(8)
         debug_sink_data_ready = Signal()
         debug_ack_response = Signal()
+        debug_dtb = Signal(reset=1)
 
         # Delay the "put" signal (and corresponding data) by one cycle, to allow
         # the debug system to inhibit this write.  In practice, this doesn't
@@ -181,11 +182,14 @@ class DummyUsb(Module):
                 debug_sink_data.eq(self.debug_bridge.sink_data),
                 debug_sink_data_ready.eq(self.debug_bridge.sink_valid),
                 debug_ack_response.eq(self.debug_bridge.send_ack | self.debug_bridge.sink_valid),
+                debug_dtb.eq(self.debug_bridge.dtb),
             ]
 
         self.comb += [
             usb_core.dtb.eq(1),
             If(debug_packet_detected,
+                # Multi-packet reads alternate DATA0/DATA1
+                usb_core.dtb.eq(debug_dtb),
                 usb_core.sta.eq(0),
                 usb_core.arm.eq(debug_ack_response),
                 usb_core.data_send_payload.eq(debug_sink_data),
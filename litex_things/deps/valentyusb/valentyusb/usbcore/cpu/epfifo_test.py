@@ -12,6 +12,7 @@ from ..utils.packet import crc16
 
 from ..test.common import BaseUsbTestCase, CommonUsbTestCase
 from ..test.clock import CommonTestMultiClockDomain
+from ..test.phy import UsbPhyModel
 
 from .epfifo import PerEndpointFifoInterface
 
@@ -52,6 +53,7 @@ class TestPerEndpointFifoInterface(
             debug = False
 
         self.iobuf = FakeIoBuf()
+        self.phy = UsbPhyModel(self.iobuf)
         self.endpoints = [EndpointType.BIDIR, EndpointType.IN, EndpointType.BIDIR]
         self.dut = PerEndpointFifoInterface(self.iobuf, self.endpoints, debug=debug)
 
@@ -94,7 +96,7 @@ class TestPerEndpointFifoInterface(
         CommonUsbTestCase.patch_csrs(self)
         run_simulation(
             self.dut,
-            padfront(),
+            {"sys": padfront(), "usb_48": self.phy.generator()},
             vcd_name=self.make_vcd_name(),
             #clocks={
             #    "sys": 12,
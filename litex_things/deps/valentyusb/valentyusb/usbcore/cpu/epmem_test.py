@@ -11,6 +11,7 @@ from ..io_test import FakeIoBuf
 from .epmem import MemInterface
 from ..endpoint import EndpointType, EndpointResponse
 from ..test.clock import CommonTestMultiClockDomain
+from ..test.phy import UsbPhyModel
 from ..utils.bits import get_bit, set_bit
 
 class TestMemInterface(
@@ -32,6 +33,7 @@ class TestMemInterface(
     def setUp(self):
         CommonTestMultiClockDomain.setUp(self, ("usb_12", "usb_48"))
         self.iobuf = FakeIoBuf()
+        self.phy = UsbPhyModel(self.iobuf)
         self.dut = MemInterface(self.iobuf, num_endpoints=3)
 
         self.packet_h2d = Signal(1)
@@ -57,7 +59,7 @@ class TestMemInterface(
         CommonUsbTestCase.patch_csrs(self)
         run_simulation(
             self.dut,
-            padfront(),
+            {"sys": padfront(), "usb_48": self.phy.generator()},
             vcd_name=self.make_vcd_name(),
             clocks={
                 "sys": 2,
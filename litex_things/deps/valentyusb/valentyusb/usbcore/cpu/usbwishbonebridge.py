@@ -10,13 +10,24 @@ from litex.soc.interconnect import stream
 from ..pid import PID, PIDTypes
 
 class USBWishboneBridge(Module):
+    """Wishbone master driven by vendor requests on EP0
 
-    def __init__(self, usb_core, clk_freq=12000000, magic_packet=0x43):
+    The address of the first word comes from wValue and wIndex, and
+    wLength gives the number of bytes to transfer: consecutive words are
+    accessed with an auto-incremented address. The data stage is split in
+    packets of up to ``max_packet_size`` bytes, which are buffered so that
+    Wishbone accesses never have to keep up with the USB byte rate. Hosts
+    that only transfer one word at a time (wLength of 4) are unaffected.
+    """
+
+    def __init__(self, usb_core, clk_freq=12000000, magic_packet=0x43, max_packet_size=64):
         self.wishbone = wishbone.Interface()
 
         # # #
 
-        byte_counter = Signal(3, reset_less=True)
+        max_packet_words = max_packet_size//4
+
+        byte_counter = Signal(max=max_packet_size + 1, reset_less=True)
         byte_counter_reset = Signal()
         byte_counter_ce = Signal()
         self.sync += \
@@ -43,26 +54,44 @@ class USBWishboneBridge(Module):
 
         self.send_ack = Signal()
 
+        # Data toggle bit of the packets sent to the host
+        self.dtb = Signal(reset=1)
+
         # Indicates whether a "debug" packet is currently being processed
         self.n_debug_in_progress = Signal()
 
         address = Signal(32, reset_less=True)
         address_ce = Signal()
+        address_inc = Signal()
+
+        length = Signal(16, reset_less=True)
+        length_ce = Signal()
 
         data = Signal(32, reset_less=True)
         rx_data_ce = Signal()
-        tx_data_ce = Signal()
 
         self.sync += [
             If(cmd_ce, cmd.eq(usb_core.data_recv_payload[7:8])),
-            If(address_ce, address.eq(Cat(address[8:32], usb_core.data_recv_payload))),
-            If(rx_data_ce,
-                data.eq(Cat(data[8:32], usb_core.data_recv_payload))
-            ).Elif(tx_data_ce,
-                data.eq(self.wishbone.dat_r)
-            )
+            If(address_ce,
+                address.eq(Cat(address[8:32], usb_core.data_recv_payload))
+            ).Elif(address_inc,
+                address.eq(address + 4)
+            ),
+            If(length_ce, length.eq(Cat(length[8:16], usb_core.data_recv_payload))),
+            If(rx_data_ce, data.eq(Cat(data[8:32], usb_core.data_recv_payload)))
         ]
 
+        # Words left to transfer, words of the current packet, and position
+        # of the next Wishbone access in the packet buffer
+        remaining = Signal(14, reset_less=True)
+        packet_words = Signal(max=max_packet_words + 1, reset_less=True)
+        word_index = Signal(max=max_packet_words + 1, reset_less=True)
+
+        buf = Memory(32, max_packet_words)
+        buf_wr = buf.get_port(write_capable=True)
+        buf_rd = buf.get_port()
+        self.specials += buf, buf_wr, buf_rd
+
 
         fsm = ResetInserter()(FSM(reset_state="IDLE"))
         self.submodules += fsm
@@ -75,6 +104,7 @@ class USBWishboneBridge(Module):
                         # going to this device, treat that as a DEBUG packet.
                         cmd_ce.eq(1),
                         byte_counter_reset.eq(1),
+                        NextValue(self.dtb, 1),
                         If(usb_core.data_recv_payload[0:7] == magic_packet,
                             NextState("RECEIVE_ADDRESS"),
                         ).Else(
@@ -97,6 +127,10 @@ class USBWishboneBridge(Module):
                         address_ce.eq(1),
                     ),
                 ),
+                # wLength, in bytes
+                If((byte_counter == 5) | (byte_counter == 6),
+                    length_ce.eq(1),
+                ),
             ),
             # We don't need to explicitly ACK the SETUP packet, because
             # they're always acknowledged implicitly.  Wait until the
@@ -104,6 +138,12 @@ class USBWishboneBridge(Module):
             # moving to the next state.
             If(usb_core.end,
                 byte_counter_reset.eq(1),
+                NextValue(word_index, 0),
+                If(length[2:] == 0,
+                    NextValue(remaining, 1),
+                ).Else(
+                    NextValue(remaining, length[2:]),
+                ),
                 If(cmd,
                     NextState("READ_DATA")
                 ).Else(
@@ -112,6 +152,8 @@ class USBWishboneBridge(Module):
             ),
         )
 
+        # Words received from the host are stored in the packet buffer,
+        # then written once the whole packet has been received.
         fsm.act("RECEIVE_DATA",
             # Set the "ACK" bit to 1, so we acknowledge the packet
             # once it comes in, and so that we're in a position to
@@ -121,22 +163,14 @@ class USBWishboneBridge(Module):
                 If(usb_core.data_recv_put,
                     rx_data_ce.eq(1),
                     byte_counter_ce.eq(1),
-                    If(byte_counter == 3,
-                        NextState("WAIT_RECEIVE_DATA_END"),
-                        byte_counter_reset.eq(1)
-                    ).Elif(usb_core.end,
-                        NextState("WRITE_DATA"),
-                        byte_counter_reset.eq(1)
-                    )
+                    buf_wr.we.eq(byte_counter[0:2] == 3),
                 )
-            )
-        )
-        fsm.act("WAIT_RECEIVE_DATA_END",
-            self.send_ack.eq(1),
-            # Wait for the end of the USB packet, if
-            # it hasn't come already.
-            If(usb_core.end,
-                NextState("WRITE_DATA")
+            ),
+            # A packet that was not acknowledged ends without any data
+            If(usb_core.end & (byte_counter[2:] != 0),
+                NextValue(packet_words, byte_counter[2:]),
+                NextValue(word_index, 0),
+                NextState("FETCH_DATA")
             )
         )
 
@@ -145,27 +179,58 @@ class USBWishboneBridge(Module):
             # are word-based, and a word is 32-bits.  Therefore, the last two bits
             # should always be zero.
             self.wishbone.adr.eq(address[2:]),
-            self.wishbone.dat_w.eq(data),
-            self.wishbone.sel.eq(2**len(self.wishbone.sel) - 1)
+            self.wishbone.dat_w.eq(buf_rd.dat_r),
+            self.wishbone.sel.eq(2**len(self.wishbone.sel) - 1),
+            If(cmd,
+                buf_wr.adr.eq(word_index),
+                buf_wr.dat_w.eq(self.wishbone.dat_r),
+                buf_rd.adr.eq(byte_counter[2:]),
+            ).Else(
+                buf_wr.adr.eq(byte_counter[2:]),
+                buf_wr.dat_w.eq(Cat(data[8:32], usb_core.data_recv_payload)),
+                buf_rd.adr.eq(word_index),
+            )
         ]
+
+        # The packet buffer has one cycle of read latency
+        fsm.act("FETCH_DATA",
+            NextState("WRITE_DATA")
+        )
         fsm.act("WRITE_DATA",
             byte_counter_reset.eq(1),
             self.wishbone.stb.eq(1),
             self.wishbone.we.eq(1),
             self.wishbone.cyc.eq(1),
             If(self.wishbone.ack | self.wishbone.err,
-                NextState("WAIT_SEND_ACK_START"),
+                address_inc.eq(1),
+                NextValue(word_index, word_index + 1),
+                NextValue(remaining, remaining - 1),
+                If(remaining == 1,
+                    NextState("WAIT_SEND_ACK_START"),
+                ).Elif(word_index == packet_words - 1,
+                    NextState("RECEIVE_DATA"),
+                ).Else(
+                    NextState("FETCH_DATA"),
+                )
             )
         )
 
+        # Words for the host are read into the packet buffer until it is
+        # full, then sent.
         fsm.act("READ_DATA",
             byte_counter_reset.eq(1),
             self.wishbone.stb.eq(1),
             self.wishbone.we.eq(0),
             self.wishbone.cyc.eq(1),
             If(self.wishbone.ack | self.wishbone.err,
-                tx_data_ce.eq(1),
-                NextState("SEND_DATA_WAIT_START")
+                buf_wr.we.eq(1),
+                address_inc.eq(1),
+                NextValue(word_index, word_index + 1),
+                NextValue(remaining, remaining - 1),
+                If((remaining == 1) | (word_index == max_packet_words - 1),
+                    NextValue(packet_words, word_index + 1),
+                    NextState("SEND_DATA_WAIT_START")
+                )
             )
         )
 
@@ -176,7 +241,7 @@ class USBWishboneBridge(Module):
             ),
         )
         self.comb += \
-            chooser(data, byte_counter, self.sink_data, n=4, reverse=False)
+            chooser(buf_rd.dat_r, byte_counter[0:2], self.sink_data, n=4, reverse=False)
         fsm.act("SEND_DATA",
             If(usb_core.endp != 0,
                 NextState("SEND_DATA_WAIT_START"),
@@ -188,11 +253,29 @@ class USBWishboneBridge(Module):
             If(usb_core.data_send_get,
                 byte_counter_ce.eq(1),
             ),
-            If(byte_counter == 4,
-                NextState("WAIT_SEND_ACK_START")
+            If(byte_counter == 4*packet_words,
+                NextState("SEND_DATA_END")
             ),
+            # The IN request was not acknowledged: wait for the next one
             If(usb_core.end,
-                NextState("WAIT_SEND_ACK_START")
+                NextState("SEND_DATA_WAIT_START")
+            )
+        )
+
+        # Wait for the host to acknowledge the packet. If it asks for the
+        # packet again instead, send it again.
+        fsm.act("SEND_DATA_END",
+            If(usb_core.retry,
+                byte_counter_reset.eq(1),
+                NextState("SEND_DATA")
+            ).Elif(usb_core.end,
+                NextValue(word_index, 0),
+                NextValue(self.dtb, ~self.dtb),
+                If(remaining == 0,
+                    NextState("WAIT_SEND_ACK_START")
+                ).Else(
+                    NextState("READ_DATA")
+                )
             )
         )
 
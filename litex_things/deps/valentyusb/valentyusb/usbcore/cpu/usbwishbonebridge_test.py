@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import struct
+import unittest
+
+from migen import *
+
+from litex.soc.interconnect import wishbone
+
+from ..pid import PID
+from .usbwishbonebridge import USBWishboneBridge
+
+
+class FakeUsbCore(Module):
+    """Transaction-level stand-in for UsbTransfer"""
+    def __init__(self):
+        self.data_recv_put = Signal()
+        self.data_recv_payload = Signal(8)
+        self.data_send_get = Signal()
+        self.tok = Signal(4)
+        self.endp = Signal(4)
+        self.start = Signal()
+        self.end = Signal()
+        self.retry = Signal()
+
+
+class DUT(Module):
+    def __init__(self, init):
+        self.submodules.usb_core = FakeUsbCore()
+        self.submodules.bridge = USBWishboneBridge(self.usb_core)
+        self.submodules.sram = wishbone.SRAM(1024, init=init)
+        self.comb += self.bridge.wishbone.connect(self.sram.bus)
+
+
+class TestUSBWishboneBridge(unittest.TestCase):
+    def setUp(self):
+        self.dut = DUT(init=[0x1000 + i for i in range(256)])
+        self.dtbs = []
+
+    def pulse(self, signal):
+        yield signal.eq(1)
+        yield
+        yield signal.eq(0)
+        yield
+
+    def token(self, pid):
+        usb_core = self.dut.usb_core
+        yield usb_core.tok.eq(pid)
+        yield from self.pulse(usb_core.start)
+
+    def setup(self, request, addr, length):
+        usb_core = self.dut.usb_core
+        yield from self.token(PID.SETUP)
+        data = struct.pack("<BBHHH", request, 0, addr & 0xffff, addr >> 16, length)
+        for byte in bytearray(data):
+            yield usb_core.data_recv_payload.eq(byte)
+            yield from self.pulse(usb_core.data_recv_put)
+        yield from self.pulse(usb_core.end)
+
+    def data_out(self, data):
+        # returns False when the packet is NAKed
+        usb_core = self.dut.usb_core
+        yield from self.token(PID.OUT)
+        if not (yield self.dut.bridge.send_ack):
+            yield from self.pulse(usb_core.end)
+            return False
+        for byte in bytearray(data):
+            yield usb_core.data_recv_payload.eq(byte)
+            yield from self.pulse(usb_core.data_recv_put)
+            yield
+        yield from self.pulse(usb_core.end)
+        return True
+
+    def data_in(self, retry=False):
+        # returns None when the packet is NAKed
+        usb_core = self.dut.usb_core
+        yield from self.token(PID.IN)
+        if not (yield self.dut.bridge.sink_valid):
+            yield from self.pulse(usb_core.end)
+            return None
+        self.dtbs.append((yield self.dut.bridge.dtb))
+        data = bytearray()
+        while (yield self.dut.bridge.sink_valid):
+            data.append((yield self.dut.bridge.sink_data))
+            yield from self.pulse(usb_core.data_send_get)
+            yield
+        if retry:
+            # the host asked for the packet again instead of acknowledging it
+            yield usb_core.retry.eq(1)
+        yield from self.pulse(usb_core.end)
+        yield usb_core.retry.eq(0)
+        return data
+
+    def status_in(self):
+        # returns False when the packet is NAKed
+        usb_core = self.dut.usb_core
+        yield from self.token(PID.IN)
+        acked = (yield self.dut.bridge.send_ack)
+        self.assertFalse((yield self.dut.bridge.sink_valid))
+        yield from self.pulse(usb_core.end)
+        return acked
+
+    def read(self, addr, length, retry_packet=None):
+        yield from self.setup(0xc3, addr, length)
+        data = bytearray()
+        packets = 0
+        while len(data) < length:
+            retry = packets == retry_packet
+            packet = yield from self.data_in(retry)
+            if packet is not None:
+                self.assertLessEqual(len(packet), 64)
+                packets += 1
+                if not retry:
+                    data += packet
+        # status stage
+        while not (yield from self.data_out(b"")):
+            pass
+        return data
+
+    def write(self, addr, data):
+        yield from self.setup(0x43, addr, len(data))
+        for offset in range(0, len(data), 64):
+            while not (yield from self.data_out(data[offset:offset + 64])):
+                pass
+        # status stage
+        while not (yield from self.status_in()):
+            pass
+
+    def run_bench(self, bench):
+        run_simulation(self.dut, bench())
+
+    def test_single_word(self):
+        def bench():
+            data = yield from self.read(0x10, 4)
+            self.assertEqual(struct.unpack("<I", data), (0x1004,))
+            yield from self.write(0x20, struct.pack("<I", 0xcafe))
+            self.assertEqual((yield self.dut.sram.mem[8]), 0xcafe)
+            self.assertEqual((yield self.dut.sram.mem[9]), 0x1009)
+        self.run_bench(bench)
+
+    def test_burst(self):
+        def bench():
+            data = yield from self.read(0x40, 4*20)
+            self.assertEqual(list(struct.unpack("<20I", data)), [0x1010 + i for i in range(20)])
+            # the data stage starts with DATA1
+            self.assertEqual(self.dtbs, [1, 0])
+
+            yield from self.write(0x100, struct.pack("<40I", *range(40)))
+            for i in range(41):
+                self.assertEqual((yield self.dut.sram.mem[0x40 + i]), i if i < 40 else 0x1040 + i)
+        self.run_bench(bench)
+
+    def test_retry(self):
+        def bench():
+            data = yield from self.read(0, 4*24, retry_packet=1)
+            self.assertEqual(list(struct.unpack("<24I", data)), [0x1000 + i for i in range(24)])
+            # the repeated packet keeps its data toggle
+            self.assertEqual(self.dtbs, [1, 0, 0])
+        self.run_bench(bench)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -61,6 +61,11 @@ class CommonUsbTestCase:
 
     maxDiff=None
 
+    # UsbPhyModel driving the USB lines of the iobuf, whose generator
+    # run_sim adds to the usb_48 clock domain. Without one, packets are
+    # sent and received a symbol at a time by the test stimulus.
+    phy = None
+
     ######################################################################
     # Interface subclasses need to implement.
     ######################################################################
@@ -156,11 +161,14 @@ class CommonUsbTestCase:
         yield from self.idle(4)
 
         yield self.packet_h2d.eq(1)
-        for v in packet:
-            yield from self.update_internal_signals()
-            yield from self.dut.iobuf.recv(v)
-            yield from self.update_internal_signals()
-            yield from self.tick_usb48()
+        if self.phy is not None:
+            yield from self.phy.send(packet)
+        else:
+            for v in packet:
+                yield from self.update_internal_signals()
+                yield from self.dut.iobuf.recv(v)
+                yield from self.update_internal_signals()
+                yield from self.tick_usb48()
         yield from self.update_internal_signals()
         yield self.packet_h2d.eq(0)
         eop = yield from self.dut.iobuf.current()
@@ -192,12 +200,8 @@ class CommonUsbTestCase:
         yield from self.send_handshake(PID.NAK)
 
     # Device->Host
-    def expect_packet(self, packet, msg=None):
-        """Except to receive the following USB packet."""
-        yield self.packet_d2h.eq(1)
-
-        # Wait for transmission to start
-        yield from self.dut.iobuf.recv('I')
+    def _receive_packet(self):
+        """Record a packet a symbol at a time, see UsbPhyModel.receive."""
         tx = 0
         bit_times = 0
         for i in range(0, 100):
@@ -207,15 +211,8 @@ class CommonUsbTestCase:
                 break
             yield from self.tick_usb48()
             bit_times = bit_times + 1
-        self.assertTrue(tx, "No packet started, "+msg)
-
-        # USB specifies that the turn-around time is 7.5 bit times for the device
-        bit_time_max = 12.5
-        bit_time_acceptable = 7.5
-        self.assertLessEqual(bit_times/4.0, bit_time_max,
-            msg="Response came in {} bit times, which is more than {}".format(bit_times / 4.0, bit_time_max))
-        if (bit_times/4.0) > bit_time_acceptable:
-            print("WARNING: Response came in {} bit times (> {})".format(bit_times / 4.0, bit_time_acceptable))
+        if not tx:
+            return None, "", False
 
         # Read in the transmission data
         result = ""
@@ -227,7 +224,29 @@ class CommonUsbTestCase:
             tx = yield self.dut.iobuf.usb_tx_en
             if not tx:
                 break
-        self.assertFalse(tx, "Packet didn't finish, "+msg)
+        return bit_times, result, not tx
+
+    def expect_packet(self, packet, msg=None):
+        """Except to receive the following USB packet."""
+        yield self.packet_d2h.eq(1)
+
+        # Wait for transmission to start
+        yield from self.dut.iobuf.recv('I')
+        if self.phy is not None:
+            bit_times, result, finished = yield from self.phy.receive()
+        else:
+            bit_times, result, finished = yield from self._receive_packet()
+        self.assertIsNotNone(bit_times, "No packet started, "+msg)
+
+        # USB specifies that the turn-around time is 7.5 bit times for the device
+        bit_time_max = 12.5
+        bit_time_acceptable = 7.5
+        self.assertLessEqual(bit_times/4.0, bit_time_max,
+            msg="Response came in {} bit times, which is more than {}".format(bit_times / 4.0, bit_time_max))
+        if (bit_times/4.0) > bit_time_acceptable:
+            print("WARNING: Response came in {} bit times (> {})".format(bit_times / 4.0, bit_time_acceptable))
+
+        self.assertTrue(finished, "Packet didn't finish, "+msg)
         yield self.packet_d2h.eq(0)
 
         # FIXME: Get the tx_en back into the USB12 clock domain...
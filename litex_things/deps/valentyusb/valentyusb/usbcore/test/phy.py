@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+from collections import deque
+
+from migen.sim import passive
+
+
+class UsbPhyModel:
+    """Host end of the USB lines of a FakeIoBuf.
+
+    generator() runs in the usb_48 clock domain, next to the test stimulus.
+    send() queues a whole NRZI encoded packet which the generator drives a
+    symbol per usb_48 cycle, and receive() hands back everything the device
+    transmitted, so the stimulus only has to wait for them.
+    """
+
+    levels = {
+        'J': (1, 0),
+        'K': (0, 1),
+        '_': (0, 0),
+        '0': (0, 0),
+        '1': (1, 1),
+        'I': (1, 0),
+        '-': (1, 0),
+    }
+    symbols = {v: k for k, v in levels.items() if k in "JK_1"}
+
+    def __init__(self, iobuf):
+        self.iobuf = iobuf
+        self.cycle = 0
+        self.tx = deque()
+        self.tx_level = None
+        self.rx = None
+        self.rx_start = None
+        self.rx_done = False
+
+    @passive
+    def generator(self):
+        iobuf = self.iobuf
+        while True:
+            if self.tx:
+                level = self.levels[self.tx.popleft()]
+                if level != self.tx_level:
+                    yield iobuf.usb_p_rx_io.eq(level[0])
+                    yield iobuf.usb_n_rx_io.eq(level[1])
+                    self.tx_level = level
+            if self.rx is not None and not self.rx_done:
+                tx_en = yield iobuf.usb_tx_en
+                if tx_en:
+                    if self.rx_start is None:
+                        self.rx_start = self.cycle
+                    self.rx.append(self.symbols[(yield iobuf.usb_p_tx), (yield iobuf.usb_n_tx)])
+                elif self.rx_start is not None:
+                    self.rx_done = True
+            self.cycle += 1
+            yield
+
+    def send(self, packet):
+        """Drive the symbols of packet and wait until they are all on the lines."""
+        tx_en = yield self.iobuf.usb_tx_en
+        assert not tx_en, "Currently transmitting!"
+        for v in packet:
+            assert v in self.levels, "Unknown value: %s" % v
+        # the lines may have been driven by FakeIoBuf.recv in the meantime
+        self.tx_level = None
+        self.tx.extend(packet)
+        while self.tx:
+            yield
+
+    def receive(self, timeout=100, max_length=512):
+        """Record the next packet transmitted by the device.
+
+        Returns the number of usb_48 cycles before it started (None if it did
+        not start within timeout), its symbols, and whether it finished
+        within max_length symbols.
+        """
+        armed = self.cycle
+        self.rx = []
+        self.rx_start = None
+        self.rx_done = False
+        while not self.rx_done and len(self.rx) < max_length:
+            if self.rx_start is None and self.cycle - armed > timeout:
+                break
+            yield
+        start = None if self.rx_start is None else self.rx_start - armed
+        result = "".join(self.rx)
+        done = self.rx_done
+        self.rx = None
+        return start, result, done
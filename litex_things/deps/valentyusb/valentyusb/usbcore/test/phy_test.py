@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from migen import *
+
+from ..io import FakeIoBuf
+from ..pid import PID
+from ..utils.packet import wrap_packet, token_packet, handshake_packet
+
+from .phy import UsbPhyModel
+
+
+class TestUsbPhyModel(unittest.TestCase):
+    def setUp(self):
+        self.dut = FakeIoBuf()
+        self.phy = UsbPhyModel(self.dut)
+
+    def run_sim(self, stim, device):
+        run_simulation(
+            self.dut,
+            {"sys": stim(), "usb_48": [self.phy.generator(), device()]},
+            clocks={"sys": 2, "usb_48": 8},
+        )
+
+    def test_send(self):
+        packet = wrap_packet(token_packet(PID.SETUP, 0, 0))
+        lines = []
+
+        def stim():
+            yield from self.phy.send(packet)
+            self.assertEqual((yield from self.dut.current()), 'J')
+            for i in range(8):
+                yield
+
+        @passive
+        def device():
+            while True:
+                lines.append((yield from self.dut.current()))
+                yield
+
+        self.run_sim(stim, device)
+        # a symbol per usb_48 cycle, from the cycle after it is queued
+        self.assertEqual("".join(lines[1:1 + len(packet)]), packet)
+
+    def test_receive(self):
+        packet = wrap_packet(handshake_packet(PID.ACK))
+        received = []
+
+        def stim():
+            received.append((yield from self.phy.receive()))
+            received.append((yield from self.phy.receive(timeout=10)))
+
+        def device():
+            for i in range(20):
+                yield
+            for v in packet:
+                yield self.dut.usb_tx_en.eq(1)
+                yield self.dut.usb_p_tx.eq(v == 'J')
+                yield self.dut.usb_n_tx.eq(v == 'K')
+                yield
+            yield self.dut.usb_tx_en.eq(0)
+
+        self.run_sim(stim, device)
+        (bit_times, result, finished), (no_start, nothing, _) = received
+        self.assertEqual(result, packet)
+        self.assertTrue(finished)
+        # the lines change the cycle after the device drives them
+        self.assertEqual(bit_times, 21)
+        self.assertIsNone(no_start)
+        self.assertEqual(nothing, "")
+
+    def test_unfinished(self):
+        received = []
+
+        def stim():
+            received.append((yield from self.phy.receive(max_length=16)))
+
+        @passive
+        def device():
+            yield self.dut.usb_tx_en.eq(1)
+            while True:
+                yield
+
+        self.run_sim(stim, device)
+        bit_times, result, finished = received[0]
+        self.assertEqual(result, "_"*16)
+        self.assertFalse(finished)
+
+
+if __name__ == "__main__":
+    unittest.main()
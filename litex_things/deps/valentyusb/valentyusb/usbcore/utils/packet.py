@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
+import re
+import functools
+
 from ..pid import PID
-from . import CrcMoose3 as crc
 
 
 def b(s):
@@ -17,16 +19,18 @@ def b(s):
     return int(s[::-1], 2)
 
 
+def _byte_bits(b):
+    return "{0:08b}".format(b)[::-1]
+
+
+_BYTE_BITS = [_byte_bits(b) for b in range(256)]
+
+
 def encode_data(data):
     """
     Converts array of 8-bit ints into string of 0s and 1s.
     """
-    output = ""
-
-    for b in data:
-        output += ("{0:08b}".format(b))[::-1]
-
-    return output
+    return "".join(_BYTE_BITS[b] if 0 <= b <= 0xff else _byte_bits(b) for b in data)
 
 
 def encode_pid(value):
@@ -36,6 +40,36 @@ def encode_pid(value):
     return encode_data([value.byte()])
 
 
+def _crc_table(poly, nbits):
+    """Update of a reflected CRC register for each nbits wide input."""
+    table = []
+    for i in range(1 << nbits):
+        reg = i
+        for _ in range(nbits):
+            reg = (reg >> 1) ^ (poly if reg & 1 else 0)
+        table.append(reg)
+    return table
+
+
+# Reflected polynomials of CRC-5/USB (0x05) and CRC-16/USB (0x8005)
+_CRC5_POLY = 0x14
+_CRC5_TABLE = _crc_table(_CRC5_POLY, 4)
+_CRC16_TABLE = _crc_table(0xa001, 8)
+
+
+def _crc5_bits(value, nbits):
+    """CRC5 of the nbits of value, sent LSB first."""
+    reg = 0x1f
+    while nbits >= 4:
+        reg = _CRC5_TABLE[(reg ^ value) & 0xf] ^ (reg >> 4)
+        value >>= 4
+        nbits -= 4
+    for _ in range(nbits):
+        reg = (reg >> 1) ^ (_CRC5_POLY if (reg ^ value) & 1 else 0)
+        value >>= 1
+    return reg ^ 0x1f
+
+
 # width=5 poly=0x05 init=0x1f refin=true refout=true xorout=0x1f check=0x19 residue=0x06 name="CRC-5/USB"
 def crc5(nibbles):
     """
@@ -44,10 +78,12 @@ def crc5(nibbles):
     >>> hex(crc5([3, 0]))
     '0x13'
     """
-    reg = crc.CrcRegister(crc.CRC5_USB)
+    value = 0
+    nbits = 0
     for n in nibbles:
-        reg.takeWord(n, 4)
-    return reg.getFinalValue() & 0x1f
+        value |= (n & 0xf) << nbits
+        nbits += 4
+    return _crc5_bits(value, nbits)
 
 
 def crc5_token(addr, ep):
@@ -61,10 +97,7 @@ def crc5_token(addr, ep):
     >>> hex(crc5_token(56, 4))
     '0xb'
     """
-    reg = crc.CrcRegister(crc.CRC5_USB)
-    reg.takeWord(addr, 7)
-    reg.takeWord(ep, 4)
-    return reg.getFinalValue()
+    return _crc5_bits((addr & 0x7f) | (ep & 0xf) << 7, 11)
 
 
 def crc5_sof(v):
@@ -74,20 +107,18 @@ def crc5_sof(v):
     >>> hex(crc5_sof(1013))
     '0x5'
     """
-    reg = crc.CrcRegister(crc.CRC5_USB)
-    reg.takeWord(v, 11)
-    return eval('0b' + bin(reg.getFinalValue() | 0x10000000)[::-1][:5])
+    return int("{0:05b}".format(_crc5_bits(v & 0x7ff, 11))[::-1], 2)
 
 
 def crc16(input_data):
     # width=16 poly=0x8005 init=0xffff refin=true refout=true xorout=0xffff check=0xb4c8 residue=0xb001 name="CRC-16/USB"
     # CRC appended low byte first.
-    reg = crc.CrcRegister(crc.CRC16_USB)
+    reg = 0xffff
     for d in input_data:
         assert d <= 0xff, input_data
-        reg.takeWord(d, 8)
-    crc16 = reg.getFinalValue()
-    return [crc16 & 0xff, (crc16 >> 8) & 0xff]
+        reg = _CRC16_TABLE[(reg ^ d) & 0xff] ^ (reg >> 8)
+    reg ^= 0xffff
+    return [reg & 0xff, (reg >> 8) & 0xff]
 
 
 def nrzi(data, cycles=4, init="J"):
@@ -112,45 +143,54 @@ def nrzi(data, cycles=4, init="J"):
     >>> nrzi("101", 4)
     'JJJJKKKKKKKK'
     """
-    def toggle_state(state):
-        if state == 'J':
-            return 'K'
-        if state == 'K':
-            return 'J'
-        return state
-
+    return _nrzi(data, cycles, init)
+
+
+_STUFF = re.compile("1{6}")
+_SEGMENTS = re.compile("([01]+)")
+_INVERT = str.maketrans("01", "10")
+_STATES = {
+    "J": str.maketrans("01", "JK"),
+    "K": str.maketrans("01", "KJ"),
+}
+
+
+def _nrzi_bits(bits, state):
+    """NRZI states of a string of 0s and 1s, and the final state."""
+    if state not in _STATES:
+        # no transitions out of SE0
+        return state*len(bits), state
+    # Bits toggling the line, first one in the MSB; the state is the xor of
+    # all the toggles up to each bit.
+    n = len(bits)
+    toggles = int(bits.translate(_INVERT), 2)
+    shift = 1
+    while shift < n:
+        toggles ^= toggles >> shift
+        shift <<= 1
+    states = "{0:0{1}b}".format(toggles, n).translate(_STATES[state])
+    return states, states[-1]
+
+
+@functools.lru_cache(maxsize=1024)
+def _nrzi(data, cycles, init):
     state = init
-    output = ""
-
-    stuffed = []
-    i = 0
-    for bit in data:
-        stuffed.append(bit)
-        if bit == '1':
-            i += 1
-        else:
-            i = 0
-        if i > 5:
-            stuffed.append('0')
-            i = 0
-
-    for bit in stuffed:
-        if bit == ' ':
-            output += bit
+    output = []
+    for i, segment in enumerate(_SEGMENTS.split(_STUFF.sub("1111110", data))):
+        # bits at odd indexes, pre-encoded symbols in between
+        if i % 2:
+            states, state = _nrzi_bits(segment, state)
+            output.append(states)
             continue
-
-        # only toggle the state on '0'
-        if bit == '0':
-            state = toggle_state(state)
-        elif bit == '1':
-            pass
-        elif bit in "jk_":
-            state = bit.upper()
-        else:
-            assert False, "Unknown bit %s in %r" % (bit, data)
-
-        output += (state * cycles)
-
+        for symbol in segment:
+            if symbol in "jk_":
+                state = symbol.upper()
+            elif symbol != ' ':
+                assert False, "Unknown bit %s in %r" % (symbol, data)
+            output.append(state if symbol != ' ' else symbol)
+    output = "".join(output)
+    if cycles != 1:
+        output = output.translate({ord(c): c*cycles for c in "JK_"})
     return output
 
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import random
+import unittest
+
+from . import CrcMoose3 as crc
+from .packet import crc5, crc5_token, crc5_sof, crc16, encode_data, nrzi
+
+
+def ref_nrzi(data, cycles=4, init="J"):
+    """Bit at a time NRZI encoding, with bit stuffing."""
+    stuffed = []
+    ones = 0
+    for bit in data:
+        stuffed.append(bit)
+        ones = ones + 1 if bit == '1' else 0
+        if ones > 5:
+            stuffed.append('0')
+            ones = 0
+    state = init
+    output = ""
+    for bit in stuffed:
+        if bit == ' ':
+            output += bit
+            continue
+        if bit == '0':
+            state = {'J': 'K', 'K': 'J'}.get(state, state)
+        elif bit in "jk_":
+            state = bit.upper()
+        output += state*cycles
+    return output
+
+
+class TestPacket(unittest.TestCase):
+    def test_crc5(self):
+        for value in range(2**11):
+            reg = crc.CrcRegister(crc.CRC5_USB)
+            reg.takeWord(value & 0x7f, 7)
+            reg.takeWord(value >> 7, 4)
+            self.assertEqual(crc5_token(value & 0x7f, value >> 7), reg.getFinalValue())
+            reg = crc.CrcRegister(crc.CRC5_USB)
+            reg.takeWord(value, 11)
+            self.assertEqual(crc5_sof(value), int("{0:05b}".format(reg.getFinalValue())[::-1], 2))
+        for nibbles in [], [0xf], [1, 2, 3, 4, 5]:
+            reg = crc.CrcRegister(crc.CRC5_USB)
+            for n in nibbles:
+                reg.takeWord(n, 4)
+            self.assertEqual(crc5(nibbles), reg.getFinalValue() & 0x1f)
+
+    def test_crc16(self):
+        rng = random.Random(0)
+        for length in range(70):
+            data = [rng.randrange(256) for _ in range(length)]
+            reg = crc.CrcRegister(crc.CRC16_USB)
+            for d in data:
+                reg.takeWord(d, 8)
+            self.assertEqual(crc16(data), [reg.getFinalValue() & 0xff, reg.getFinalValue() >> 8])
+
+    def test_nrzi(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            length = rng.randrange(1, 200)
+            # long runs of ones to exercise bit stuffing
+            bits = "".join(rng.choice("0111111111") for _ in range(length))
+            data = rng.choice(["kjkjkjkk", ""]) + bits + rng.choice(["__j", " __", "_0_1j"])
+            for cycles in 1, 4:
+                self.assertEqual(nrzi(data, cycles), ref_nrzi(data, cycles), data)
+        self.assertEqual(nrzi(encode_data(range(256))), ref_nrzi(encode_data(range(256))))
+
+
+if __name__ == "__main__":
+    unittest.main()